@@ -1,6 +1,5 @@
 import customtkinter as ctk
 from tkinter import filedialog, messagebox, ttk
-import requests
 import os
 from pathlib import Path
 import json
@@ -8,6 +7,8 @@ import tempfile
 import shutil
 import threading
 
+from api_client import ApiClient
+
 # Set appearance mode and color theme
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("blue")
@@ -23,10 +24,18 @@ class AdminApp:
         # Variables
         self.selected_file = None
         self.server_url = "http://185.92.181.112:8000/"
+        # Every backend call goes through this client's pooled session
+        self._api = ApiClient(self.server_url)
 
         # Create UI with tabs
         self.create_widgets()
 
+    @property
+    def api(self):
+        """Backend client pointed at the server URL from the URL field"""
+        self._api.base_url = self.url_entry.get().strip() or self.server_url
+        return self._api
+
     def create_widgets(self):
         # Main container
         main_container = ctk.CTkFrame(self.root, corner_radius=10)
@@ -324,7 +333,19 @@ class AdminApp:
             hover_color="#d32f2f",
             state="disabled",
         )
-        self.delete_selected_configs_btn.pack(side="left")
+        self.delete_selected_configs_btn.pack(side="left", padx=(0, 10))
+
+        delete_off_btn = ctk.CTkButton(
+            control_frame,
+            text="Delete Off Configs",
+            command=self.delete_off_configs,
+            font=ctk.CTkFont(size=12),
+            width=140,
+            height=32,
+            fg_color="#f44336",
+            hover_color="#d32f2f",
+        )
+        delete_off_btn.pack(side="left")
 
         # Treeview frame
         tree_frame = ctk.CTkFrame(main_frame, corner_radius=8)
@@ -583,27 +604,60 @@ class AdminApp:
         if not confirm:
             return
 
-        # Delete each selected configuration
-        success_count = 0
-        fail_count = 0
-
-        for item in selection:
-            values = self.config_tree.item(item)["values"]
-            config_id = values[0]
-
-            if self.delete_single_config(config_id, password):
-                success_count += 1
-            else:
-                fail_count += 1
+        # One request for the whole selection
+        config_ids = [
+            int(self.config_tree.item(item)["values"][0]) for item in selection
+        ]
+        result = self.bulk_delete(
+            "tickets/api/config/bulk-delete/", {"ids": config_ids}, password
+        )
+        if result is None:
+            return
 
-        # Refresh the list
-        self.load_configs()
+        # Only the deleted rows changed; no need to reload the list
+        self.config_tree.delete(*selection)
         self.delete_selected_configs_btn.configure(state="disabled")
 
         # Show result
         messagebox.showinfo(
             "Delete Results",
-            f"Successfully deleted: {success_count}\nFailed to delete: {fail_count}",
+            f"Deleted {result['deleted']} of {count} configuration(s)",
+        )
+
+    def delete_off_configs(self):
+        """Delete every listed configuration whose status is off"""
+        password = self.ask_for_password()
+        if not password:
+            return  # User cancelled
+
+        # The list shows the manually managed configs, not those extracted from files
+        selection = {"status": "off", "source_file": None}
+        matched = self.bulk_delete(
+            "tickets/api/config/bulk-delete/", {**selection, "dry_run": True}, password
+        )
+        if matched is None:
+            return
+        if not matched["matched"]:
+            messagebox.showinfo("Delete Results", "No configurations are off")
+            return
+
+        confirm = messagebox.askyesno(
+            "Confirm Delete",
+            f"Are you sure you want to delete all {matched['matched']} "
+            "configuration(s) that are off?",
+        )
+        if not confirm:
+            return
+
+        result = self.bulk_delete(
+            "tickets/api/config/bulk-delete/", selection, password
+        )
+        if result is None:
+            return
+
+        self.load_configs()
+        messagebox.showinfo(
+            "Delete Results", f"Deleted {result['deleted']} configuration(s)"
         )
 
     def delete_selected_files(self):
@@ -628,105 +682,47 @@ class AdminApp:
         if not confirm:
             return
 
-        # Delete each selected file
-        success_count = 0
-        fail_count = 0
-
-        for item in selection:
-            values = self.files_tree.item(item)["values"]
-            file_id = values[0]
-            file_name = values[1]
-
-            if self.delete_single_file(file_id, password):
-                success_count += 1
-            else:
-                fail_count += 1
+        # One request for the whole selection; configs extracted from the files go too
+        file_ids = [int(self.files_tree.item(item)["values"][0]) for item in selection]
+        result = self.bulk_delete(
+            "tickets/api/files/bulk-delete/", {"ids": file_ids}, password
+        )
+        if result is None:
+            return
 
-        # Refresh the list
-        self.load_files()
+        # Only the deleted rows changed; no need to reload the list
+        self.files_tree.delete(*selection)
         self.delete_selected_files_btn.configure(state="disabled")
 
         # Show result
         messagebox.showinfo(
             "Delete Results",
-            f"Successfully deleted: {success_count}\nFailed to delete: {fail_count}",
+            f"Deleted {result['deleted']} of {count} file(s) and "
+            f"{result['configs_deleted']} configuration(s) extracted from them",
         )
 
-    def delete_single_config(self, config_id, password):
-        """Delete a single configuration with the given password"""
-        server_url = self.url_entry.get().strip()
-        if not server_url:
-            server_url = self.server_url
-
-        if not server_url.endswith("/"):
-            server_url += "/"
-
-        api_url = server_url + f"tickets/api/config/{config_id}/"
-
+    def bulk_delete(self, path, selection, password):
+        """POST a selection to a bulk delete endpoint; returns the response data,
+        or None after showing the error"""
         try:
-            # Include password in the request headers
-            headers = {"X-Admin-Password": password}
-            response = requests.delete(api_url, headers=headers, timeout=30)
-
-            if response.status_code == 200:
-                return True
-            elif response.status_code == 401:
-                messagebox.showerror(
-                    "Authentication Error", "Invalid password. Deletion failed."
-                )
-                return False
-            else:
-                try:
-                    result = response.json()
-                    messagebox.showerror(
-                        "Error",
-                        f"Failed to delete configuration: {result.get('message', 'Unknown error')}",
-                    )
-                except:
-                    pass
-                return False
-
+            response = self.api.post(path, json=selection, admin_password=password)
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to delete configuration: {str(e)}")
-            return False
-
-    def delete_single_file(self, file_id, password):
-        """Delete a single file with the given password"""
-        server_url = self.url_entry.get().strip()
-        if not server_url:
-            server_url = self.server_url
-
-        if not server_url.endswith("/"):
-            server_url += "/"
-
-        api_url = server_url + f"tickets/api/files/{file_id}/"
-
+            messagebox.showerror("Error", f"Failed to delete: {str(e)}")
+            return None
+
+        if response.status_code == 200:
+            return response.json()
+        if response.status_code == 401:
+            messagebox.showerror(
+                "Authentication Error", "Invalid password. Deletion failed."
+            )
+            return None
         try:
-            # Include password in the request headers
-            headers = {"X-Admin-Password": password}
-            response = requests.delete(api_url, headers=headers, timeout=30)
-
-            if response.status_code == 200:
-                return True
-            elif response.status_code == 401:
-                messagebox.showerror(
-                    "Authentication Error", "Invalid password. Deletion failed."
-                )
-                return False
-            else:
-                try:
-                    result = response.json()
-                    messagebox.showerror(
-                        "Error",
-                        f"Failed to delete file: {result.get('message', 'Unknown error')}",
-                    )
-                except:
-                    pass
-                return False
-
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to delete file: {str(e)}")
-            return False
+            message = response.json().get("message", "Unknown error")
+        except ValueError:
+            message = f"Status code: {response.status_code}"
+        messagebox.showerror("Error", f"Failed to delete: {message}")
+        return None
 
     def select_file(self):
         file_path = filedialog.askopenfilename(
@@ -781,7 +777,7 @@ class AdminApp:
                 files = {
                     "file": (os.path.basename(self.selected_file), f, "text/plain")
                 }
-                response = requests.post(upload_url, files=files, timeout=30)
+                response = self.api.post("tickets/api/upload/", files=files)
 
             if response.status_code == 200:
                 result = response.json()
@@ -852,7 +848,7 @@ class AdminApp:
 
                 # If it's a URL, download the file content
                 if file_url.startswith("http"):
-                    response = requests.get(file_url, timeout=30)
+                    response = self.api.get(file_url)
                     response.raise_for_status()
                     temp_file.write(response.text)
                     temp_file.flush()
@@ -867,7 +863,7 @@ class AdminApp:
 
                 with open(temp_file_path, "rb") as f:
                     files = {"file": ("v2ray_configs.txt", f, "text/plain")}
-                    response = requests.post(upload_url, files=files, timeout=30)
+                    response = self.api.post("tickets/api/upload/", files=files)
 
                 if response.status_code == 200:
                     result = response.json()
@@ -926,15 +922,10 @@ class AdminApp:
             messagebox.showerror("Error", "Please enter the configuration text")
             return
 
-        if not server_url.endswith("/"):
-            server_url += "/"
-
-        api_url = server_url + "tickets/api/config/"
-
         try:
             data = {"title": title, "text": text, "status": status}
 
-            response = requests.post(api_url, json=data, timeout=30)
+            response = self.api.post("tickets/api/config/", json=data)
 
             if response.status_code == 200:
                 result = response.json()
@@ -960,14 +951,7 @@ class AdminApp:
             messagebox.showerror("Error", f"Failed to create configuration: {str(e)}")
 
     def load_configs(self):
-        server_url = self.url_entry.get().strip()
-        if not server_url:
-            server_url = self.server_url
-
-        if not server_url.endswith("/"):
-            server_url += "/"
-
-        api_url = server_url + "tickets/api/config/"
+        api = self.api
 
         def load_in_thread():
             try:
@@ -976,7 +960,7 @@ class AdminApp:
                 )
                 self.config_frame.update_idletasks()
 
-                response = requests.get(api_url, timeout=30)
+                response = api.get("tickets/api/config/")
 
                 if response.status_code == 200:
                     data = response.json()
@@ -1024,14 +1008,7 @@ class AdminApp:
 
     def load_files(self):
         """Load uploaded files from the server"""
-        server_url = self.url_entry.get().strip()
-        if not server_url:
-            server_url = self.server_url
-
-        if not server_url.endswith("/"):
-            server_url += "/"
-
-        api_url = server_url + "tickets/api/files/"
+        api = self.api
 
         def load_in_thread():
             try:
@@ -1040,7 +1017,7 @@ class AdminApp:
                 )
                 self.config_frame.update_idletasks()
 
-                response = requests.get(api_url, timeout=30)
+                response = api.get("tickets/api/files/")
 
                 if response.status_code == 200:
                     data = response.json()
@@ -0,0 +1,90 @@
+"""
+HTTP access to the Django backend for client.py, admin.py and tester_cli.py.
+
+ApiClient sends every request through one requests.Session, so calls reuse
+pooled keep-alive connections instead of opening a TCP (and TLS)
+connection each. Idempotent requests that fail to connect or get a
+502/503/504 are retried with exponential backoff; POSTs are not, since
+creating a config or uploading a file twice is not harmless. Responses are
+gzip-compressed where the server supports it.
+
+The base URL and the API token live on the client; the admin password is
+passed per request because the admin tools ask for it per action. Both are
+only sent to the base URL, never to absolute URLs elsewhere.
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_TIMEOUT = 30
+POOL_SIZE = 10
+RETRIES = 3
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = (502, 503, 504)
+RETRY_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+def create_session(pool_size=POOL_SIZE, retries=RETRIES):
+    """requests.Session with a connection pool and retries on transient failures"""
+    retry = Retry(
+        total=retries,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=RETRY_METHODS,
+        # Hand the last 5xx response back instead of raising RetryError
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Accept-Encoding"] = "gzip, deflate"
+    return session
+
+
+class ApiClient:
+    def __init__(self, base_url, token=None, session=None, timeout=DEFAULT_TIMEOUT):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.token = token
+        self.session = session or create_session()
+
+    @property
+    def base_url(self):
+        return self._base_url
+
+    @base_url.setter
+    def base_url(self, value):
+        self._base_url = value.strip().rstrip("/")
+
+    def url(self, path):
+        """Absolute URL for a path on the server; absolute URLs pass through"""
+        if path.startswith(("http://", "https://")):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method, path, admin_password=None, **kwargs):
+        url = self.url(path)
+        headers = dict(kwargs.pop("headers", None) or {})
+        if url.startswith(f"{self.base_url}/"):
+            if self.token:
+                headers["Authorization"] = f"Token {self.token}"
+            if admin_password is not None:
+                headers["X-Admin-Password"] = admin_password
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, url, headers=headers, **kwargs)
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request("DELETE", path, **kwargs)
+
+    def close(self):
+        self.session.close()
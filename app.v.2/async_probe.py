@@ -0,0 +1,342 @@
+"""
+Asyncio latency engine for the config tester.
+
+Testing is a two-stage pipeline on one event loop:
+
+1. Screening: every parsed config gets a non-blocking TCP connect to its
+   server, plus a TLS handshake for security=tls/reality, with as many in
+   flight as the probe semaphore allows. Failures are reported at once.
+2. Proxy test: survivors are packed into full batches as they pass, loaded
+   into v2ray and probed with a SOCKS5 handshake and an HTTP request.
+   Loading (starting a process or an `api ado` call) is the only blocking
+   step; it runs in a small thread pool sized so batch leases can never
+   starve each other.
+
+iter_latencies() is an async iterator of (config_id, latency_ms, status) in
+completion order and iter_screening() runs stage one alone; the run_*()
+helpers drive them from a worker thread. Status strings match
+OptimizedV2RayTester.test_config_latency_optimized.
+"""
+
+import asyncio
+import concurrent.futures
+import ssl
+import struct
+import subprocess
+import time
+
+PROBE_HOST = "www.google.com"
+PROBE_PORT = 80
+PROBE_PATH = "/generate_204"
+TCP_TIMEOUT = 3
+# Link security values whose servers must complete a TLS handshake to pass screening
+TLS_SECURITY = ("tls", "reality")
+
+# Failures of a single probe; anything else is a bug and propagates
+PROBE_ERRORS = (OSError, EOFError, asyncio.TimeoutError)
+LOAD_ERRORS = (RuntimeError, ValueError, OSError, subprocess.SubprocessError)
+
+
+async def _close(writer):
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+
+
+async def tcp_latency(host, port, timeout=TCP_TIMEOUT):
+    """Milliseconds to open a TCP connection to host:port, or None if it failed"""
+    start = time.monotonic()
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except PROBE_ERRORS:
+        return None
+    latency = int((time.monotonic() - start) * 1000)
+    await _close(writer)
+    return latency
+
+
+def _tls_context():
+    # Only the handshake is timed; certificates are the core's business
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+TLS_CONTEXT = _tls_context()
+
+
+async def tls_latency(host, port, server_name=None, timeout=TCP_TIMEOUT):
+    """Milliseconds for a TCP connect plus TLS handshake, or None if either failed"""
+    start = time.monotonic()
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                host, port, ssl=TLS_CONTEXT, server_hostname=server_name or host
+            ),
+            timeout,
+        )
+    except (*PROBE_ERRORS, ValueError):
+        return None
+    latency = int((time.monotonic() - start) * 1000)
+    # Skip the close_notify exchange; nothing was sent
+    writer.transport.abort()
+    return latency
+
+
+async def socks5_open(socks_port, host, port):
+    """Open a stream to host:port through the no-auth SOCKS5 proxy on socks_port"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", socks_port)
+    try:
+        writer.write(b"\x05\x01\x00")
+        if await reader.readexactly(2) != b"\x05\x00":
+            raise ConnectionError("SOCKS5 proxy refused no-auth")
+
+        name = host.encode("idna")
+        writer.write(
+            b"\x05\x01\x00\x03" + bytes([len(name)]) + name + struct.pack(">H", port)
+        )
+        _, reply, _, address_type = await reader.readexactly(4)
+        if reply != 0:
+            raise ConnectionError(f"SOCKS5 connect failed ({reply})")
+        # Skip the bound address and port
+        if address_type == 1:
+            await reader.readexactly(4 + 2)
+        elif address_type == 4:
+            await reader.readexactly(16 + 2)
+        else:
+            length = (await reader.readexactly(1))[0]
+            await reader.readexactly(length + 2)
+    except BaseException:
+        await _close(writer)
+        raise
+    return reader, writer
+
+
+async def http_status(reader, writer, host=PROBE_HOST, path=PROBE_PATH):
+    """Send a GET and return the response status code"""
+    writer.write(
+        f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode()
+    )
+    await writer.drain()
+    status_line = (await reader.readline()).split()
+    if len(status_line) < 2 or not status_line[0].startswith(b"HTTP/"):
+        raise ConnectionError("No HTTP response")
+    return int(status_line[1])
+
+
+async def _status_via_socks(socks_port):
+    reader, writer = await socks5_open(socks_port, PROBE_HOST, PROBE_PORT)
+    try:
+        return await http_status(reader, writer)
+    finally:
+        await _close(writer)
+
+
+async def proxy_latency(socks_port, tcp_latency_ms, timeout):
+    """Time the probe request through socks_port; same results as measure_proxy_latency"""
+    start = time.monotonic()
+    try:
+        await asyncio.wait_for(_status_via_socks(socks_port), timeout // 2)
+    except PROBE_ERRORS:
+        if tcp_latency_ms > 0:
+            return tcp_latency_ms, "Direct connection"
+        return -1, "Connection failed"
+    return int((time.monotonic() - start) * 1000), "Success"
+
+
+class _Screen:
+    """State shared by the coroutines of one screening run"""
+
+    def __init__(self, concurrency, tls=True, prescreened=None):
+        self.probes = asyncio.Semaphore(concurrency)
+        self.tls = tls
+        # config_id -> TCP latency of configs that already passed screening
+        self.prescreened = prescreened or {}
+        self.results = asyncio.Queue()
+
+    async def screen(self, item):
+        """Stage one for (config_id, server_info, outbound, config_text):
+        returns (item, tcp_ms, failure), failure None if the server passed"""
+        config_id, server = item[:2]
+        if config_id in self.prescreened:
+            return item, self.prescreened[config_id], None
+        try:
+            async with self.probes:
+                tcp_ms = await tcp_latency(server["address"], server["port"])
+                if tcp_ms is None:
+                    return item, None, "Server unreachable"
+                if self.tls and server.get("security") in TLS_SECURITY:
+                    handshake_ms = await tls_latency(
+                        server["address"], server["port"], server.get("sni")
+                    )
+                    if handshake_ms is None:
+                        return item, None, "TLS handshake failed"
+        except Exception as e:
+            return item, None, f"Error: {str(e)[:20]}"
+        return item, tcp_ms, None
+
+    async def screened(self, items):
+        for checked in asyncio.as_completed([self.screen(item) for item in items]):
+            yield await checked
+
+
+class _Run(_Screen):
+    """State shared by the coroutines of one iter_latencies() call"""
+
+    def __init__(self, tester, concurrency, timeout, tls=True, prescreened=None):
+        super().__init__(concurrency, tls, prescreened)
+        self.tester = tester
+        self.timeout = timeout
+        loaders = tester.batch_loaders()
+        # One thread per batch that may hold v2ray resources at once, so
+        # releasing a batch always finds a free thread
+        self.loading = asyncio.Semaphore(loaders)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=loaders)
+        self.tasks = []
+
+    async def in_thread(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, func, *args
+        )
+
+    def spawn(self, config_ids, test):
+        """Start test(report); configs it did not report get an error result"""
+        unreported = list(config_ids)
+
+        def report(config_id, latency, status):
+            unreported.remove(config_id)
+            self.results.put_nowait((config_id, latency, status))
+
+        async def guarded():
+            try:
+                await test(report)
+            except Exception as e:
+                for config_id in list(unreported):
+                    report(config_id, -1, f"Error: {str(e)[:20]}")
+
+        self.tasks.append(asyncio.ensure_future(guarded()))
+
+    def spawn_batch(self, batch):
+        self.spawn(
+            [item[0] for item, _ in batch],
+            lambda report: self.test_batch(batch, report),
+        )
+
+    def spawn_single(self, config_id, config_text):
+        self.spawn(
+            [config_id],
+            lambda report: self.test_single(config_id, config_text, report),
+        )
+
+    async def test_batch(self, batch, report):
+        """Stage two for screened [(item, tcp_ms)]"""
+
+        async def probe(entry, socks_port):
+            (config_id, *_), tcp_ms = entry
+            if socks_port is None:
+                report(config_id, -1, "Could not load config")
+                return
+            async with self.probes:
+                latency, status = await proxy_latency(socks_port, tcp_ms, self.timeout)
+            report(config_id, latency, status)
+
+        async with self.loading:
+            loaded = self.tester.load_batch([item[2] for item, _ in batch])
+            try:
+                ports = await self.in_thread(loaded.__enter__)
+            except LOAD_ERRORS as e:
+                for item, _ in batch:
+                    report(item[0], -1, f"Test error: {str(e)[:20]}")
+                return
+            try:
+                await asyncio.gather(
+                    *(probe(entry, port) for entry, port in zip(batch, ports))
+                )
+            finally:
+                await self.in_thread(loaded.__exit__, None, None, None)
+
+    async def test_single(self, config_id, config_text, report):
+        async with self.loading:
+            latency, status = await self.in_thread(
+                self.tester.test_config_latency_optimized, config_text, self.timeout
+            )
+        report(config_id, latency, status)
+
+    async def pipeline(self, items):
+        """Screen items and hand survivors to stage two in full batches"""
+        batch = []
+        async for item, tcp_ms, failure in self.screened(items):
+            if failure:
+                self.results.put_nowait((item[0], -1, failure))
+            elif item[2] is None:
+                # Full JSON config: tested in its own process
+                self.spawn_single(item[0], item[3])
+            else:
+                batch.append((item, tcp_ms))
+                if len(batch) == self.tester.batch_size:
+                    self.spawn_batch(batch)
+                    batch = []
+        if batch:
+            self.spawn_batch(batch)
+
+
+async def iter_latencies(
+    tester, configs, concurrency=500, timeout=8, tls=True, prescreened=None
+):
+    """
+    Test configs ({"title", "text"}) and yield (config_id, latency, status)
+    as each finishes; at most `concurrency` sockets are probing at once.
+    prescreened maps config ids that already passed iter_screening() to
+    their TCP latency so they are not screened again.
+    """
+    run = _Run(tester, concurrency, timeout, tls, prescreened)
+    items, unparsed = tester.split_screenable(configs)
+    for config in unparsed:
+        run.spawn_single(config.get("title", "Unknown"), config.get("text", ""))
+    screening = asyncio.ensure_future(run.pipeline(items))
+    try:
+        for _ in range(len(configs)):
+            yield await run.results.get()
+    finally:
+        screening.cancel()
+        for task in run.tasks:
+            task.cancel()
+        await asyncio.gather(screening, *run.tasks, return_exceptions=True)
+        run.executor.shutdown(wait=False)
+
+
+async def iter_screening(tester, configs, concurrency=500, tls=True):
+    """
+    Stage one alone: yield (config_id, tcp_ms, status) per config, status
+    "Reachable" for servers that passed and tcp_ms -1 for the rest.
+    """
+    screen = _Screen(concurrency, tls)
+    items, unparsed = tester.split_screenable(configs)
+    for config in unparsed:
+        yield config.get("title", "Unknown"), -1, "Could not parse config"
+    async for item, tcp_ms, failure in screen.screened(items):
+        if failure:
+            yield item[0], -1, failure
+        else:
+            yield item[0], tcp_ms, "Reachable"
+
+
+def _drive(results, on_result):
+    async def consume():
+        async for result in results:
+            on_result(*result)
+
+    asyncio.run(consume())
+
+
+def run_latencies(tester, configs, on_result, **options):
+    """Run iter_latencies() on a new event loop, calling on_result for each result"""
+    _drive(iter_latencies(tester, configs, **options), on_result)
+
+
+def run_screening(tester, configs, on_result, **options):
+    """Run iter_screening() on a new event loop, calling on_result for each result"""
+    _drive(iter_screening(tester, configs, **options), on_result)
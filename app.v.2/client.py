@@ -4,21 +4,15 @@ from tkinter import filedialog, messagebox, ttk, scrolledtext
 import requests
 import os
 from pathlib import Path
-import json
-import subprocess
-import tempfile
 import time
 import threading
-import re
-import base64
-from urllib.parse import urlparse, parse_qs, unquote
 import sys
-import platform
-import zipfile
-import socket
-import concurrent.futures
 from queue import Queue
 
+from api_client import ApiClient
+from config_scanner import decode_chunks, extract_configs, iter_configs
+from v2ray_tester import PROBE_REPORT_BATCH, OptimizedV2RayTester, probe_reports
+
 # Try to import pystray for system tray functionality
 try:
     import pystray
@@ -34,70 +28,14 @@ ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("blue")
 
 
-class OptimizedV2RayTester:
-    def __init__(self, root_tk=None):
-        """
-        Initializes the V2RayTester with optimizations for faster testing.
-        """
-        self.root_tk = root_tk
-        self.log_callback = None
-        self.v2ray_path = self.find_v2ray_executable()
+class TkV2RayTester(OptimizedV2RayTester):
+    """OptimizedV2RayTester that asks before downloading a missing V2Ray core"""
 
-        # Optimization: Reuse V2Ray processes with different ports
-        self.process_pool = []
-        self.max_concurrent_tests = (
-            500  # Reduced from unlimited to prevent resource exhaustion
-        )
-        self.base_socks_port = 10800  # Starting port for SOCKS proxies
-
-    def set_log_callback(self, callback):
-        """Set callback function for logging"""
-        self.log_callback = callback
-
-    def log(self, message):
-        """Log message to callback if available"""
-        if self.log_callback:
-            self.log_callback(message)
-        print(message)
-
-    def find_v2ray_executable(self):
-        """Find V2Ray executable in common locations or offer to download it."""
-        executable_name = "v2ray.exe" if platform.system() == "Windows" else "v2ray"
-        local_path = os.path.join("v2ray_core", executable_name)
-
-        common_paths = [
-            local_path,
-            "v2ray",
-            "./v2ray",
-            "./v2ray.exe",
-            "C:/Program Files/v2ray/v2ray.exe",
-            "/usr/bin/v2ray",
-            "/usr/local/bin/v2ray",
-        ]
-
-        for path in common_paths:
-            try:
-                result = subprocess.run(
-                    [path, "version"],
-                    capture_output=True,
-                    text=True,
-                    timeout=5,
-                    check=False,
-                )
-                if result.returncode == 0 and (
-                    "V2Ray" in result.stdout or "Xray" in result.stdout
-                ):
-                    self.log(f"Found V2Ray executable at: {path}")
-                    return path
-            except (subprocess.TimeoutExpired, FileNotFoundError, OSError):
-                continue
-
-        if self.root_tk:
-            return self._prompt_and_download_v2ray()
-
-        return None
+    def __init__(self, root_tk):
+        self.root_tk = root_tk
+        super().__init__()
 
-    def _prompt_and_download_v2ray(self):
+    def offer_download(self):
         """Ask user if they want to download V2Ray core and initiates download."""
         should_download = messagebox.askyesno(
             "V2Ray Not Found",
@@ -127,468 +65,6 @@ class OptimizedV2RayTester:
                 )
         return None
 
-    def _download_v2ray_core(self):
-        """Downloads and extracts the latest V2Ray core for the current OS."""
-        try:
-            system = platform.system()
-            machine = platform.machine().lower()
-
-            os_map = {"Windows": "windows", "Linux": "linux", "Darwin": "macos"}
-            if system not in os_map:
-                self.log(f"Unsupported OS: {system}")
-                return None
-            os_name = os_map[system]
-
-            if "amd64" in machine or "x86_64" in machine:
-                arch_name = "64"
-            elif "arm64" in machine or "aarch64" in machine:
-                arch_name = "arm64-v8a"
-            elif "arm" in machine:
-                arch_name = "arm32-v7a"
-            else:
-                arch_name = "32"
-
-            self.log("Fetching latest V2Ray release info from GitHub...")
-            api_url = "https://api.github.com/repos/v2fly/v2ray-core/releases/latest"
-            response = requests.get(api_url, timeout=30)
-            response.raise_for_status()
-            release_data = response.json()
-
-            asset_filename = f"v2ray-{os_name}-{arch_name}.zip"
-            download_url = None
-            for asset in release_data.get("assets", []):
-                if asset.get("name") == asset_filename:
-                    download_url = asset.get("browser_download_url")
-                    break
-
-            if not download_url:
-                messagebox.showerror(
-                    "Download Error",
-                    f"Could not find a compatible V2Ray version for your system ({asset_filename}).",
-                )
-                return None
-
-            download_dir = "v2ray_core"
-            os.makedirs(download_dir, exist_ok=True)
-            zip_path = os.path.join(download_dir, "v2ray.zip")
-
-            self.log(f"Downloading {download_url}...")
-            with requests.get(download_url, stream=True, timeout=60) as r:
-                r.raise_for_status()
-                with open(zip_path, "wb") as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        f.write(chunk)
-
-            self.log(f"Extracting {zip_path}...")
-            with zipfile.ZipFile(zip_path, "r") as zip_ref:
-                zip_ref.extractall(download_dir)
-
-            os.remove(zip_path)
-
-            executable_name = "v2ray.exe" if system == "Windows" else "v2ray"
-            executable_path = os.path.join(download_dir, executable_name)
-
-            if os.path.exists(executable_path):
-                if system != "Windows":
-                    os.chmod(executable_path, 0o755)
-
-                self.log(f"V2Ray executable is now at: {executable_path}")
-                return executable_path
-
-            self.log(f"Executable '{executable_name}' not found after extraction.")
-            return None
-
-        except Exception as e:
-            messagebox.showerror(
-                "Download Error", f"An error occurred during download:\n{e}"
-            )
-            self.log(f"An error occurred during V2Ray download: {e}")
-            return None
-
-    def parse_vmess_url(self, url):
-        """Parse vmess:// URL to extract server info"""
-        try:
-            if not url.startswith("vmess://"):
-                return None
-
-            encoded_part = url[8:]
-            decoded = base64.b64decode(
-                encoded_part + "=" * (-len(encoded_part) % 4)
-            ).decode("utf-8")
-            config = json.loads(decoded)
-
-            return {
-                "protocol": "vmess",
-                "address": config.get("add", ""),
-                "port": int(config.get("port", 443)),
-                "id": config.get("id", ""),
-                "name": config.get("ps", "Unknown"),
-            }
-        except Exception as e:
-            self.log(f"Error parsing vmess URL: {e}")
-            return None
-
-    def parse_vless_url(self, url):
-        """Parse vless:// URL to extract server info"""
-        try:
-            if not url.startswith("vless://"):
-                return None
-
-            parsed = urlparse(url)
-            query = parse_qs(parsed.query)
-
-            name = "Unknown"
-            if "remarks" in query:
-                name = unquote(query["remarks"][0])
-            elif parsed.fragment:
-                name = unquote(parsed.fragment)
-
-            return {
-                "protocol": "vless",
-                "address": parsed.hostname,
-                "port": parsed.port or 80,
-                "id": parsed.username,
-                "name": name,
-                "path": query.get("path", ["/"])[0],
-                "type": query.get("type", ["tcp"])[0],
-                "security": query.get("security", ["none"])[0],
-                "encryption": query.get("encryption", ["none"])[0],
-            }
-        except Exception as e:
-            self.log(f"Error parsing vless URL: {e}")
-            return None
-
-    def parse_config_text(self, config_text):
-        """Parse V2Ray config text to extract server information"""
-        try:
-            vmess_urls = re.findall(r"vmess://[A-Za-z0-9+/=]+", config_text)
-            if vmess_urls:
-                return self.parse_vmess_url(vmess_urls[0])
-
-            vless_urls = re.findall(r"vless://[^\s\n]+", config_text)
-            if vless_urls:
-                return self.parse_vless_url(vless_urls[0])
-
-            if config_text.strip().startswith("{"):
-                config = json.loads(config_text)
-                outbounds = config.get("outbounds", [])
-                if outbounds:
-                    outbound = outbounds[0]
-                    settings = outbound.get("settings", {})
-                    vnext = settings.get("vnext", [{}])
-                    if vnext:
-                        vnext = vnext[0]
-                        return {
-                            "protocol": outbound.get("protocol", "unknown"),
-                            "address": vnext.get("address", ""),
-                            "port": vnext.get("port", 443),
-                            "name": "V2Ray JSON Config",
-                        }
-
-            address_match = re.search(r'"address":\s*"([^"]+)"', config_text)
-            port_match = re.search(r'"port":\s*(\d+)', config_text)
-
-            if address_match and port_match:
-                return {
-                    "protocol": "unknown",
-                    "address": address_match.group(1),
-                    "port": int(port_match.group(1)),
-                    "name": "Parsed Config",
-                }
-
-        except Exception as e:
-            self.log(f"Error parsing config: {e}")
-
-        return None
-
-    def create_test_config_from_vless(self, server_info, socks_port):
-        """Create V2Ray config from vless server info with custom SOCKS port"""
-        config = {
-            "log": {"loglevel": "error"},  # Reduced logging for speed
-            "inbounds": [
-                {
-                    "tag": "socks-in",
-                    "port": socks_port,
-                    "listen": "127.0.0.1",
-                    "protocol": "socks",
-                    "settings": {
-                        "auth": "noauth",
-                        "udp": False,
-                    },  # Disable UDP for faster testing
-                }
-            ],
-            "outbounds": [
-                {
-                    "tag": "proxy",
-                    "protocol": "vless",
-                    "settings": {
-                        "vnext": [
-                            {
-                                "address": server_info["address"],
-                                "port": server_info["port"],
-                                "users": [
-                                    {
-                                        "id": server_info["id"],
-                                        "encryption": server_info.get(
-                                            "encryption", "none"
-                                        ),
-                                    }
-                                ],
-                            }
-                        ]
-                    },
-                    "streamSettings": {"network": server_info.get("type", "tcp")},
-                }
-            ],
-        }
-
-        if server_info.get("type") == "ws":
-            config["outbounds"][0]["streamSettings"]["wsSettings"] = {
-                "path": server_info.get("path", "/")
-            }
-
-        return config
-
-    def create_test_config_from_vmess(self, server_info, socks_port):
-        """Create V2Ray config from vmess server info with custom SOCKS port"""
-        config = {
-            "log": {"loglevel": "error"},  # Reduced logging for speed
-            "inbounds": [
-                {
-                    "tag": "socks-in",
-                    "port": socks_port,
-                    "listen": "127.0.0.1",
-                    "protocol": "socks",
-                    "settings": {
-                        "auth": "noauth",
-                        "udp": False,
-                    },  # Disable UDP for faster testing
-                }
-            ],
-            "outbounds": [
-                {
-                    "tag": "proxy",
-                    "protocol": "vmess",
-                    "settings": {
-                        "vnext": [
-                            {
-                                "address": server_info["address"],
-                                "port": server_info["port"],
-                                "users": [
-                                    {"id": server_info["id"], "security": "auto"}
-                                ],
-                            }
-                        ]
-                    },
-                }
-            ],
-        }
-
-        return config
-
-    def create_test_config(self, config_text, socks_port):
-        """Create a temporary V2Ray config for testing with custom SOCKS port"""
-        try:
-            if config_text.strip().startswith("{"):
-                base_config = json.loads(config_text)
-
-                if "inbounds" not in base_config:
-                    base_config["inbounds"] = []
-
-                # Replace existing SOCKS inbound with our custom port
-                base_config["inbounds"] = [
-                    ib
-                    for ib in base_config["inbounds"]
-                    if not (ib.get("protocol") == "socks" and ib.get("port") == 1080)
-                ]
-
-                base_config["inbounds"].append(
-                    {
-                        "tag": "socks-test",
-                        "port": socks_port,
-                        "listen": "127.0.0.1",
-                        "protocol": "socks",
-                        "settings": {"auth": "noauth", "udp": False},
-                    }
-                )
-
-                # Optimize logging
-                base_config["log"] = {"loglevel": "error"}
-
-                return base_config
-            else:
-                server_info = self.parse_config_text(config_text)
-                if not server_info:
-                    return None
-
-                if server_info["protocol"] == "vless":
-                    return self.create_test_config_from_vless(server_info, socks_port)
-                elif server_info["protocol"] == "vmess":
-                    return self.create_test_config_from_vmess(server_info, socks_port)
-                else:
-                    return None
-
-        except Exception as e:
-            self.log(f"Error creating test config: {e}")
-            return None
-
-    def fast_connectivity_check(self, server_info, timeout=3):
-        """Fast TCP connectivity check before full V2Ray test"""
-        try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(timeout)
-            start_time = time.time()
-            result = sock.connect_ex((server_info["address"], server_info["port"]))
-            end_time = time.time()
-            sock.close()
-
-            if result == 0:
-                latency = int((end_time - start_time) * 1000)
-                return latency, True
-            else:
-                return -1, False
-
-        except Exception:
-            return -1, False
-
-    def test_config_latency_optimized(self, config_text, timeout=8):
-        """Optimized V2Ray config testing with faster startup and reduced timeouts"""
-        if not self.v2ray_path:
-            return -1, "V2Ray executable not found"
-
-        server_info = self.parse_config_text(config_text)
-        if not server_info:
-            return -1, "Could not parse config"
-
-        # Quick connectivity pre-check
-        tcp_latency, is_reachable = self.fast_connectivity_check(server_info, timeout=3)
-        if not is_reachable:
-            return -1, "Server unreachable"
-
-        # Find available port for this test
-        socks_port = self.base_socks_port
-        while socks_port < self.base_socks_port + 100:  # Try up to 100 ports
-            try:
-                test_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                test_sock.bind(("127.0.0.1", socks_port))
-                test_sock.close()
-                break
-            except OSError:
-                socks_port += 1
-        else:
-            return -1, "No available ports"
-
-        test_config = self.create_test_config(config_text, socks_port)
-        if not test_config:
-            return -1, "Could not create test config"
-
-        process = None
-        config_file = ""
-        try:
-            # Write config to temporary file
-            with tempfile.NamedTemporaryFile(
-                mode="w", suffix=".json", delete=False
-            ) as f:
-                json.dump(test_config, f, separators=(",", ":"))  # Compact JSON
-                config_file = f.name
-
-            # Start V2Ray process with minimal startup time
-            cmd = [self.v2ray_path, "run", "-c", config_file]
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.DEVNULL,  # Ignore output for speed
-                stderr=subprocess.DEVNULL,
-                text=True,
-            )
-
-            # Reduced startup wait time
-            time.sleep(1.5)
-
-            if process.poll() is not None:
-                return -1, "V2Ray failed to start"
-
-            # Test with reduced timeout
-            proxies = {
-                "http": f"socks5://127.0.0.1:{socks_port}",
-                "https": f"socks5://127.0.0.1:{socks_port}",
-            }
-
-            start_time = time.time()
-            try:
-                # Use lightweight endpoint with shorter timeout
-                response = requests.get(
-                    "http://www.google.com/generate_204",
-                    proxies=proxies,
-                    timeout=timeout // 2,
-                )
-                end_time = time.time()
-
-                latency = int((end_time - start_time) * 1000)
-                return latency, "Success"
-
-            except requests.exceptions.RequestException:
-                # If proxy test fails, return the TCP connection latency
-                if tcp_latency > 0:
-                    return tcp_latency, "Direct connection"
-                else:
-                    return -1, "Connection failed"
-
-        except Exception as e:
-            return -1, f"Test error: {str(e)[:20]}"
-        finally:
-            # Quick cleanup
-            if process:
-                try:
-                    process.terminate()
-                    try:
-                        process.wait(timeout=2)
-                    except subprocess.TimeoutExpired:
-                        process.kill()
-                except:
-                    pass
-
-            if os.path.exists(config_file):
-                try:
-                    os.unlink(config_file)
-                except:
-                    pass
-
-    def test_multiple_configs_parallel(self, configs, progress_callback=None):
-        """Test multiple configs in parallel with limited concurrency"""
-        results = {}
-
-        def test_single_config(config_data):
-            config_id = config_data.get("title", "Unknown")
-            config_text = config_data.get("text", "")
-            latency, status = self.test_config_latency_optimized(config_text)
-            return config_id, latency, status
-
-        with concurrent.futures.ThreadPoolExecutor(
-            max_workers=self.max_concurrent_tests
-        ) as executor:
-            future_to_config = {
-                executor.submit(test_single_config, config): config
-                for config in configs
-            }
-
-            completed = 0
-            total = len(configs)
-
-            for future in concurrent.futures.as_completed(future_to_config):
-                config = future_to_config[future]
-                try:
-                    config_id, latency, status = future.result()
-                    results[config_id] = (latency, status)
-                except Exception as e:
-                    config_id = config.get("title", "Unknown")
-                    results[config_id] = (-1, f"Error: {str(e)[:20]}")
-
-                completed += 1
-                if progress_callback:
-                    progress_callback(completed, total)
-
-        return results
-
 
 class FileUploaderApp:
     def __init__(self, root):
@@ -603,8 +79,10 @@ class FileUploaderApp:
 
         # Variables
         self.server_url = "http://185.92.181.112:8000"
+        # Every backend call goes through this client's pooled session
+        self._api = ApiClient(self.server_url)
         # Pass the root window to the tester class so it can show message boxes
-        self.v2ray_tester = OptimizedV2RayTester(root)
+        self.v2ray_tester = TkV2RayTester(root)
         self.v2ray_tester.set_log_callback(self.log_message)
 
         # Log window
@@ -653,6 +131,7 @@ class FileUploaderApp:
         """Quit the application"""
         if self.tray_icon:
             self.tray_icon.stop()
+        self.v2ray_tester.close()
         self.root.quit()
 
     def on_closing(self):
@@ -662,8 +141,35 @@ class FileUploaderApp:
             self.hide_window()
         else:
             # If no system tray support, just quit
+            self.v2ray_tester.close()
             self.root.destroy()
 
+    @property
+    def api(self):
+        """Backend client pointed at the server URL and token from the header"""
+        self._api.base_url = self.url_entry.get().strip() or self.server_url
+        self._api.token = self.token_entry.get().strip() or None
+        return self._api
+
+    def report_probe_results(self, api, configs, results):
+        """
+        Send results for configs loaded from the server to its latency
+        rankings. Runs on the tester's thread, so api is a client of its own
+        built on the Tk thread, never self.api.
+        """
+        reports = probe_reports(configs, results)
+        if not reports:
+            return
+        for i in range(0, len(reports), PROBE_REPORT_BATCH):
+            try:
+                api.post(
+                    "tickets/api/config/probe-results/",
+                    json={"results": reports[i : i + PROBE_REPORT_BATCH]},
+                ).raise_for_status()
+            except requests.RequestException as e:
+                self.log_message(f"Could not report test results: {e}")
+                return
+
     def log_message(self, message):
         """Log message to the log window if it exists"""
         if self.log_window and hasattr(self, "log_text"):
@@ -768,6 +274,22 @@ class FileUploaderApp:
         self.url_entry.insert(0, self.server_url)
         self.url_entry.pack(side=tk.LEFT)
 
+        token_label = ctk.CTkLabel(
+            url_frame, text="API Token:", font=ctk.CTkFont(size=14, weight="bold")
+        )
+        token_label.pack(side=tk.LEFT, padx=(20, 10))
+
+        # Reporting test results to the server needs an account's API token
+        self.token_entry = ctk.CTkEntry(
+            url_frame,
+            font=ctk.CTkFont(size=13),
+            height=36,
+            width=200,
+            placeholder_text="To report test results",
+            show="*",
+        )
+        self.token_entry.pack(side=tk.LEFT)
+
         # Status indicator
         status_indicator = ctk.CTkFrame(
             header_frame, width=20, height=20, corner_radius=10
@@ -874,7 +396,7 @@ class FileUploaderApp:
         concurrent_label.pack(side=tk.LEFT)
 
         concurrent_slider = ctk.CTkSlider(
-            concurrent_frame, from_=10, to=500, number_of_steps=49, width=200
+            concurrent_frame, from_=50, to=1000, number_of_steps=19, width=200
         )
         concurrent_slider.set(self.v2ray_tester.max_concurrent_tests)
         concurrent_slider.pack(side=tk.RIGHT, padx=(0, 10))
@@ -1211,8 +733,7 @@ class FileUploaderApp:
         )
 
     def load_config_data(self):
-        server_url = self.url_entry.get().strip() or self.server_url
-        api_url = f"{server_url.rstrip('/')}/tickets/api/config/"
+        api = self.api
 
         def load_in_thread():
             self.config_status.configure(
@@ -1220,8 +741,7 @@ class FileUploaderApp:
             )
 
             try:
-                # Increase timeout to 30 seconds for better handling of network latency
-                response = requests.get(api_url, timeout=30)
+                response = api.get("tickets/api/config/", params={"order": "latency"})
 
                 if response.status_code == 200:
                     data = response.json()
@@ -1472,6 +992,32 @@ class FileUploaderApp:
                 text=f"Testing... ({completed}/{total})", text_color="#2196F3"
             )
 
+        labels_by_title = {}
+        for config, label in zip(configs, ping_labels):
+            labels_by_title.setdefault(config.get("title", "Unknown"), []).append(label)
+
+        def show_result(config_title, latency, status):
+            for label in labels_by_title.get(config_title, ()):
+                if latency > 0:
+                    label.configure(text=f"Ping: {latency}ms", text_color="#4CAF50")
+                else:
+                    label.configure(
+                        text=f"Failed: {status[:15]}", text_color="#f44336"
+                    )
+
+        # Widgets are only read on the Tk thread; anonymous reports are refused
+        token = self.token_entry.get().strip() or None
+        reporter = (
+            ApiClient(self.url_entry.get().strip() or self.server_url, token=token)
+            if token
+            else None
+        )
+        self.v2ray_tester.set_results_callback(
+            (lambda tested, results: self.report_probe_results(reporter, tested, results))
+            if reporter
+            else None
+        )
+
         def test_all_in_thread():
             total_count = len(configs)
 
@@ -1491,26 +1037,22 @@ class FileUploaderApp:
 
             # Run parallel tests
             start_time = time.time()
-            results = self.v2ray_tester.test_multiple_configs_parallel(
-                configs, progress_callback
-            )
+            try:
+                results = self.v2ray_tester.test_multiple_configs_parallel(
+                    configs, progress_callback, show_result
+                )
+            finally:
+                if reporter:
+                    reporter.close()
             end_time = time.time()
 
-            # Update results
+            # Labels were updated as results arrived; count the successes
             successful_tests = 0
-            for i, config in enumerate(configs):
+            for config in configs:
                 config_title = config.get("title", "Unknown")
                 latency, status = results.get(config_title, (-1, "Unknown error"))
-
                 if latency > 0:
-                    ping_labels[i].configure(
-                        text=f"Ping: {latency}ms", text_color="#4CAF50"
-                    )
                     successful_tests += 1
-                else:
-                    ping_labels[i].configure(
-                        text=f"Failed: {status[:15]}", text_color="#f44336"
-                    )
 
             total_time = end_time - start_time
 
@@ -1590,6 +1132,17 @@ class FileUploaderApp:
                 text=f"Testing... ({completed}/{total})", text_color="#2196F3"
             )
 
+        labels_by_title = {}
+        for config, label in zip(configs, ping_labels):
+            labels_by_title.setdefault(config.get("title", "Unknown"), []).append(label)
+
+        def show_failure(config_title, latency, status):
+            if latency < 0:
+                for label in labels_by_title.get(config_title, ()):
+                    label.configure(
+                        text=f"Failed: {status[:15]}", text_color="#f44336"
+                    )
+
         def remove_trash_in_thread():
             total_count = len(configs)
 
@@ -1606,10 +1159,32 @@ class FileUploaderApp:
             )
             self.log_message(f"{'='*80}")
 
-            # Run parallel tests
             start_time = time.time()
-            results = self.v2ray_tester.test_multiple_configs_parallel(
-                configs, progress_callback
+
+            # Fast path: dead servers are trash without starting V2Ray
+            screened = self.v2ray_tester.screen_configs(configs, show_failure)
+            reachable = {
+                config_id: latency
+                for config_id, (latency, status) in screened.items()
+                if status == "Reachable"
+            }
+            survivors = [
+                config
+                for config in configs
+                if config.get("title", "Unknown") in reachable
+            ]
+            self.log_message(
+                f"Screening: {total_count - len(survivors)} unreachable, "
+                f"{len(survivors)} left for the full test "
+                f"({time.time() - start_time:.1f}s)"
+            )
+
+            # Full proxy test for the survivors only
+            results = dict(screened)
+            results.update(
+                self.v2ray_tester.test_multiple_configs_parallel(
+                    survivors, progress_callback, prescreened=reachable
+                )
             )
             end_time = time.time()
 
@@ -1674,10 +1249,7 @@ class FileUploaderApp:
             messagebox.showerror("Error", "File URL not available")
             return
 
-        server_url = (self.url_entry.get().strip() or self.server_url).rstrip("/")
-        full_url = (
-            server_url + file_url if not file_url.startswith("http") else file_url
-        )
+        api = self.api
 
         def download_in_thread():
             try:
@@ -1685,7 +1257,7 @@ class FileUploaderApp:
                     text=f"Downloading {file_name}...", text_color="#2196F3"
                 )
 
-                response = requests.get(full_url, timeout=30)
+                response = api.get(file_url)
 
                 if response.status_code == 200:
                     save_path = filedialog.asksaveasfilename(initialfile=file_name)
@@ -1730,6 +1302,7 @@ class FileUploaderApp:
 
         item = self.tree.item(selection[0])
         values = item["values"]
+        file_id = values[0]
         file_name = values[1]
         file_url = values[5] if len(values) > 5 else None
 
@@ -1737,58 +1310,69 @@ class FileUploaderApp:
             messagebox.showerror("Error", "File URL not available")
             return
 
-        server_url = (self.url_entry.get().strip() or self.server_url).rstrip("/")
-        full_url = (
-            server_url + file_url if not file_url.startswith("http") else file_url
-        )
+        api = self.api
 
         def extract_in_thread():
             try:
                 self.receive_status.configure(
-                    text=f"Downloading {file_name} for config extraction...",
+                    text=f"Loading configs extracted from {file_name}...",
                     text_color="#2196F3",
                 )
 
-                response = requests.get(full_url, timeout=30)
-
-                if response.status_code == 200:
-                    file_content = response.text
-
-                    # Extract V2Ray configs from the file content
-                    configs = self.extract_v2ray_configurations(file_content)
+                # The server parses uploads once; only files it has not
+                # processed are downloaded and parsed locally
+                configs = self.fetch_extracted_configs(api, file_id)
 
-                    if configs:
-                        # Add configs to the config tab
-                        self.add_configs_to_config_tab(configs)
+                if configs is None:
+                    self.receive_status.configure(
+                        text=f"Downloading {file_name} for config extraction...",
+                        text_color="#2196F3",
+                    )
 
-                        # Switch to the config tab
-                        self.tab_view.set("Config")
+                    response = api.get(file_url, stream=True)
 
+                    if response.status_code != 200:
                         self.receive_status.configure(
-                            text=f"Extracted {len(configs)} configs and added to Config tab",
-                            text_color="#4CAF50",
-                        )
-                        messagebox.showinfo(
-                            "Success",
-                            f"Extracted {len(configs)} V2Ray configurations and added to Config tab",
+                            text=f"Error: Status {response.status_code}",
+                            text_color="#f44336",
                         )
-                    else:
-                        self.receive_status.configure(
-                            text="No V2Ray configurations found in the file",
-                            text_color="#FF9800",
+                        messagebox.showerror(
+                            "Error",
+                            f"Failed to download file. Status: {response.status_code}",
                         )
-                        messagebox.showwarning(
-                            "No Configs Found",
-                            "No V2Ray configurations were found in the selected file",
+                        return
+
+                    # Parse while downloading instead of holding the whole file
+                    with response:
+                        configs = list(
+                            iter_configs(
+                                decode_chunks(response.iter_content(chunk_size=65536))
+                            )
                         )
+
+                if configs:
+                    # Add configs to the config tab
+                    self.add_configs_to_config_tab(configs)
+
+                    # Switch to the config tab
+                    self.tab_view.set("Config")
+
+                    self.receive_status.configure(
+                        text=f"Extracted {len(configs)} configs and added to Config tab",
+                        text_color="#4CAF50",
+                    )
+                    messagebox.showinfo(
+                        "Success",
+                        f"Extracted {len(configs)} V2Ray configurations and added to Config tab",
+                    )
                 else:
                     self.receive_status.configure(
-                        text=f"Error: Status {response.status_code}",
-                        text_color="#f44336",
+                        text="No V2Ray configurations found in the file",
+                        text_color="#FF9800",
                     )
-                    messagebox.showerror(
-                        "Error",
-                        f"Failed to download file. Status: {response.status_code}",
+                    messagebox.showwarning(
+                        "No Configs Found",
+                        "No V2Ray configurations were found in the selected file",
                     )
 
             except Exception as e:
@@ -1799,52 +1383,23 @@ class FileUploaderApp:
 
         threading.Thread(target=extract_in_thread, daemon=True).start()
 
+    def fetch_extracted_configs(self, api, file_id):
+        """Return the configs the server extracted from an uploaded file,
+        or None if it has not processed the file"""
+        try:
+            response = api.get("tickets/api/config/", params={"source_file": file_id})
+            if response.status_code != 200:
+                return None
+            return [
+                {"id": c["id"], "title": c["title"], "text": c["text"]}
+                for c in response.json().get("configs", [])
+            ]
+        except (requests.RequestException, ValueError):
+            return None
+
     def extract_v2ray_configurations(self, file_content):
         """Extract V2Ray configurations from file content"""
-        configs = []
-
-        # Look for JSON configurations
-        json_configs = re.findall(r"\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}", file_content)
-        for json_str in json_configs:
-            try:
-                config = json.loads(json_str)
-                # Check if it looks like a V2Ray config (has inbounds or outbounds)
-                if "inbounds" in config or "outbounds" in config:
-                    configs.append(
-                        {
-                            "title": f"V2Ray Config {len(configs) + 1}",
-                            "text": json.dumps(config, indent=2),
-                        }
-                    )
-            except json.JSONDecodeError:
-                continue
-
-        # Look for vmess:// URLs
-        vmess_urls = re.findall(r"vmess://[A-Za-z0-9+/=]+", file_content)
-        for i, url in enumerate(vmess_urls):
-            try:
-                # Decode base64 part
-                encoded_part = url[8:]  # Remove 'vmess://'
-                decoded = base64.b64decode(
-                    encoded_part + "=" * (-len(encoded_part) % 4)
-                ).decode("utf-8")
-                config = json.loads(decoded)
-
-                configs.append(
-                    {
-                        "title": f"Vmess Config {i + 1}",
-                        "text": url,  # Keep the original URL
-                    }
-                )
-            except Exception:
-                continue
-
-        # Look for vless:// URLs
-        vless_urls = re.findall(r"vless://[^\s\n]+", file_content)
-        for i, url in enumerate(vless_urls):
-            configs.append({"title": f"Vless Config {i + 1}", "text": url})
-
-        return configs
+        return extract_configs(file_content)
 
     def add_configs_to_config_tab(self, configs):
         """Add extracted configs to the config tab"""
@@ -1861,14 +1416,13 @@ class FileUploaderApp:
         )
 
     def load_receive_data(self):
-        server_url = self.url_entry.get().strip() or self.server_url
-        api_url = f"{server_url.rstrip('/')}/tickets/api/files/"
+        api = self.api
 
         def load_in_thread():
             self.receive_status.configure(text="Loading data...", text_color="#2196F3")
 
             try:
-                response = requests.get(api_url, timeout=10)
+                response = api.get("tickets/api/files/", timeout=10)
 
                 if response.status_code == 200:
                     data = response.json()
@@ -0,0 +1,138 @@
+"""
+On-disk cache of latency test results.
+
+Results are keyed by fingerprint(): a hash of the parsed server tuple
+(protocol, address, port, id and transport), so the same server found in
+another subscription or under another title reuses its result. Each row
+keeps the last latency and status, when it was tested and how many tests in
+a row have failed.
+
+A result is fresh for CACHE_TTL after a success; failures stay fresh longer
+with every consecutive failure (doubling, up to MAX_FAILURE_TTL), so servers
+that are down for good stop being retested every session. Only a "Success"
+status counts as a success: a "Direct connection" result carries the TCP
+latency of a server whose proxy failed. Rows older than
+MAX_AGE are evicted when the cache is opened.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = "latency_cache.sqlite3"
+CACHE_TTL = 30 * 60
+MAX_FAILURE_TTL = 6 * 60 * 60
+MAX_AGE = 7 * 24 * 60 * 60
+# Stay below SQLite's default limit on bound parameters
+LOOKUP_CHUNK = 500
+SUCCESS = "Success"
+
+FINGERPRINT_FIELDS = (
+    "protocol",
+    "address",
+    "port",
+    "id",
+    "type",
+    "path",
+    "security",
+    "sni",
+)
+
+
+def fingerprint(server_info):
+    """Canonical hash of the fields that identify a server and how it is reached"""
+    values = [server_info.get(field) for field in FINGERPRINT_FIELDS]
+    values[1] = str(values[1] or "").lower()
+    values[2] = int(values[2] or 0)
+    return hashlib.sha256(json.dumps(values).encode("utf-8")).hexdigest()
+
+
+class CachedResult:
+    __slots__ = ("latency", "status", "tested_at", "failure_streak")
+
+    def __init__(self, latency, status, tested_at, failure_streak):
+        self.latency = latency
+        self.status = status
+        self.tested_at = tested_at
+        self.failure_streak = failure_streak
+
+    def ttl(self, ttl=CACHE_TTL):
+        if self.status == SUCCESS:
+            return ttl
+        return min(ttl * 2 ** max(self.failure_streak - 1, 0), MAX_FAILURE_TTL)
+
+    def is_fresh(self, now=None, ttl=CACHE_TTL):
+        return (now or time.time()) - self.tested_at < self.ttl(ttl)
+
+
+class ResultCache:
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_age=MAX_AGE):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        # Tests report from worker threads; every use goes through self.lock
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS results (
+                    fingerprint TEXT PRIMARY KEY,
+                    latency INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    tested_at REAL NOT NULL,
+                    failure_streak INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            self.connection.execute(
+                "DELETE FROM results WHERE tested_at < ?", (time.time() - max_age,)
+            )
+
+    def lookup(self, fingerprints):
+        """{fingerprint: CachedResult} for the fingerprints that have a row"""
+        fingerprints = list(set(fingerprints))
+        found = {}
+        with self.lock:
+            for i in range(0, len(fingerprints), LOOKUP_CHUNK):
+                chunk = fingerprints[i : i + LOOKUP_CHUNK]
+                rows = self.connection.execute(
+                    "SELECT fingerprint, latency, status, tested_at, failure_streak "
+                    f"FROM results WHERE fingerprint IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+                for key, *values in rows:
+                    found[key] = CachedResult(*values)
+        return found
+
+    def store(self, results):
+        """Record [(fingerprint, latency, status)]; failures extend the streak"""
+        now = time.time()
+        rows = [
+            (key, latency, status, now, 0 if status == SUCCESS else 1)
+            for key, latency, status in results
+        ]
+        with self.lock, self.connection:
+            self.connection.executemany(
+                """
+                INSERT INTO results (fingerprint, latency, status, tested_at, failure_streak)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(fingerprint) DO UPDATE SET
+                    latency = excluded.latency,
+                    status = excluded.status,
+                    tested_at = excluded.tested_at,
+                    failure_streak = CASE
+                        WHEN excluded.failure_streak = 0 THEN 0
+                        ELSE results.failure_streak + 1
+                    END
+                """,
+                rows,
+            )
+
+    def clear(self):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM results")
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
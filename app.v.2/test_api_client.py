@@ -0,0 +1,66 @@
+"""Tests for api_client: python -m unittest (run from this directory)"""
+
+import unittest
+from unittest import mock
+
+from api_client import DEFAULT_TIMEOUT, ApiClient
+
+
+class ApiClientTest(unittest.TestCase):
+    def setUp(self):
+        self.session = mock.Mock()
+        self.api = ApiClient(" http://server:8000/ ", token="abc", session=self.session)
+
+    def sent(self):
+        args, kwargs = self.session.request.call_args
+        return args[1], kwargs["headers"], kwargs
+
+    def test_base_url_is_normalized(self):
+        self.assertEqual(self.api.base_url, "http://server:8000")
+        self.assertEqual(
+            self.api.url("/api/configs/"), "http://server:8000/api/configs/"
+        )
+        self.assertEqual(
+            self.api.url("api/configs/"), "http://server:8000/api/configs/"
+        )
+
+    def test_credentials_sent_to_the_server(self):
+        self.api.get("/api/configs/", admin_password="secret")
+        url, headers, kwargs = self.sent()
+        self.assertEqual(url, "http://server:8000/api/configs/")
+        self.assertEqual(headers["Authorization"], "Token abc")
+        self.assertEqual(headers["X-Admin-Password"], "secret")
+        self.assertEqual(kwargs["timeout"], DEFAULT_TIMEOUT)
+
+    def test_credentials_not_sent_elsewhere(self):
+        for url in (
+            "https://example.com/config.json",
+            # Shares the base URL as a string prefix but is another host
+            "http://server:80001/api/",
+            "http://server:8000.example.com/api/",
+        ):
+            self.api.get(url, admin_password="secret")
+            sent_url, headers, kwargs = self.sent()
+            self.assertEqual(sent_url, url)
+            self.assertNotIn("Authorization", headers)
+            self.assertNotIn("X-Admin-Password", headers)
+
+    def test_caller_headers_and_timeout_are_kept(self):
+        headers = {"Content-Type": "application/json"}
+        self.api.post("/api/configs/", headers=headers, timeout=5)
+        url, sent_headers, kwargs = self.sent()
+        self.assertEqual(sent_headers["Content-Type"], "application/json")
+        self.assertEqual(kwargs["timeout"], 5)
+        # The caller's dict is not modified
+        self.assertEqual(headers, {"Content-Type": "application/json"})
+
+    def test_no_token(self):
+        self.api.token = None
+        self.api.get("/api/configs/")
+        url, headers, kwargs = self.sent()
+        self.assertNotIn("Authorization", headers)
+        self.assertNotIn("X-Admin-Password", headers)
+
+
+if __name__ == "__main__":
+    unittest.main()
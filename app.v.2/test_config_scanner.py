@@ -0,0 +1,62 @@
+"""Tests for config_scanner: python -m unittest (run from this directory)"""
+
+import base64
+import json
+import unittest
+
+from config_scanner import extract_configs, iter_configs
+
+VMESS = "vmess://" + base64.b64encode(
+    json.dumps({"v": "2", "ps": "Tokyo", "add": "1.2.3.4", "port": "443"}).encode()
+).decode().rstrip("=")
+
+SAMPLE = "\n".join(
+    [
+        "channel dump, vmess:// alone is not a config",
+        VMESS,
+        "vless://uuid@example.com:443?type=ws&security=tls#Edge",
+        "trojan://secret@example.org:443#Trojan",
+        "ss://YWVzLTI1Ni1nY206cGFzcw@example.net:8388#SS",
+        "vmess://not-base64!!",
+        "{",
+        '  "remarks": "braces { and quotes \\" in strings",',
+        '  "outbounds": [{"protocol": "freedom"}]',
+        "}",
+        '{"messages": [{"text": "try trojan://pw@h.example:1 today"}]}',
+        "{ not json }",
+    ]
+)
+
+
+class ChunkInvarianceTest(unittest.TestCase):
+    def test_every_split_finds_the_same_configs(self):
+        expected = extract_configs(SAMPLE)
+        self.assertEqual(
+            [c["title"] for c in expected],
+            [
+                "Vmess Config 1",
+                "Vless Config 1",
+                "Trojan Config 1",
+                "Shadowsocks Config 1",
+                "V2Ray Config 1",
+                "Trojan Config 2",
+            ],
+        )
+        for split in range(len(SAMPLE) + 1):
+            with self.subTest(split=split):
+                self.assertEqual(
+                    list(iter_configs([SAMPLE[:split], SAMPLE[split:]])), expected
+                )
+
+    def test_single_character_chunks(self):
+        self.assertEqual(list(iter_configs(SAMPLE)), extract_configs(SAMPLE))
+
+    def test_longest_scheme_split_before_last_slash(self):
+        self.assertEqual(
+            list(iter_configs(["abc trojan:/", "/pw@h:1 x"])),
+            extract_configs("abc trojan://pw@h:1 x"),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
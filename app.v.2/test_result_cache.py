@@ -0,0 +1,30 @@
+"""Tests for result_cache: python -m unittest (run from this directory)"""
+
+import os
+import tempfile
+import unittest
+
+from result_cache import CACHE_TTL, ResultCache
+
+
+class ResultCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = ResultCache(os.path.join(directory.name, "cache.sqlite3"))
+        self.addCleanup(self.cache.close)
+
+    def test_direct_connection_is_a_failure(self):
+        self.cache.store([("proxy", 120, "Success"), ("direct", 80, "Direct connection")])
+        self.cache.store([("direct", 80, "Direct connection")])
+        found = self.cache.lookup(["proxy", "direct"])
+        self.assertEqual(found["proxy"].failure_streak, 0)
+        self.assertEqual(found["direct"].failure_streak, 2)
+        self.assertEqual(found["direct"].ttl(), 2 * CACHE_TTL)
+
+        self.cache.store([("direct", 90, "Success")])
+        self.assertEqual(self.cache.lookup(["direct"])["direct"].failure_streak, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+"""Tests for v2ray_pool: python -m unittest (run from this directory)"""
+
+import socket
+import threading
+import unittest
+from unittest import mock
+
+from v2ray_pool import PortAllocator, build_batch_config, port_is_free, start_core
+
+
+class PortAllocatorTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch("v2ray_pool.port_is_free", return_value=True)
+        self.port_is_free = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_concurrent_leases_never_share_a_port(self):
+        ports = PortAllocator(20000, 6)
+        held = set()
+        held_lock = threading.Lock()
+        errors = []
+
+        def worker():
+            for _ in range(200):
+                with ports.lease(2) as leased:
+                    with held_lock:
+                        if held & set(leased):
+                            errors.append(leased)
+                        held.update(leased)
+                    with held_lock:
+                        held.difference_update(leased)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(ports.free), list(range(20000, 20006)))
+
+    def test_acquire_waits_for_a_release(self):
+        ports = PortAllocator(20000, 2)
+        first = ports.acquire(2)
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(ports.acquire(1)))
+        waiter.start()
+        waiter.join(0.2)
+        self.assertTrue(waiter.is_alive())
+        ports.release(first)
+        waiter.join(1)
+        self.assertEqual(got, [[20000]])
+
+    def test_busy_ports_are_skipped_and_retried_last(self):
+        self.port_is_free.side_effect = lambda port: port != 20001
+        ports = PortAllocator(20000, 4)
+        self.assertEqual(ports.acquire(2), [20000, 20002])
+        self.assertEqual(list(ports.free), [20003, 20001])
+
+    def test_lease_larger_than_range(self):
+        with self.assertRaises(ValueError):
+            PortAllocator(20000, 2).acquire(3)
+
+
+class PortIsFreeTest(unittest.TestCase):
+    def test_bound_port_is_busy(self):
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.bind(("127.0.0.1", 0))
+            sock.listen()
+            self.assertFalse(port_is_free(sock.getsockname()[1]))
+
+
+class StartCoreTest(unittest.TestCase):
+    def setUp(self):
+        self.free = {20000: True, 20001: True, 20002: True, 20003: True}
+        for patcher in (
+            mock.patch("v2ray_pool.subprocess.Popen"),
+            mock.patch("v2ray_pool._write_json", return_value="config.json"),
+            mock.patch("v2ray_pool.stop_core"),
+            mock.patch(
+                "v2ray_pool.port_is_free", side_effect=lambda port: self.free[port]
+            ),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.ports = PortAllocator(20000, 4)
+
+    def test_retries_on_other_ports_when_one_was_taken(self):
+        def wait_for_port(port, process):
+            if port == 20001:
+                # Another program bound the port after the lease
+                self.free[20000] = False
+                return None
+            return 0.1
+
+        build_config = mock.Mock(return_value={})
+        on_startup = mock.Mock()
+        with mock.patch("v2ray_pool.wait_for_port", side_effect=wait_for_port):
+            process, config_file, leased = start_core(
+                "v2ray", self.ports, 2, build_config, on_startup
+            )
+        self.assertEqual(leased, [20002, 20003])
+        self.assertEqual(
+            [c.args[0] for c in build_config.call_args_list],
+            [[20000, 20001], [20002, 20003]],
+        )
+        on_startup.assert_called_once_with(0.1)
+        # The failed lease went back to the allocator
+        self.assertIn(20001, self.ports.free)
+
+    def test_gives_up_when_no_port_was_taken(self):
+        with mock.patch("v2ray_pool.wait_for_port", return_value=None):
+            with self.assertRaises(RuntimeError):
+                start_core("v2ray", self.ports, 2, mock.Mock(return_value={}))
+        self.assertEqual(sorted(self.ports.free), [20000, 20001, 20002, 20003])
+
+
+class BuildBatchConfigTest(unittest.TestCase):
+    def test_slots_route_to_their_outbounds(self):
+        outbounds = [{"protocol": "vless"}, {"protocol": "trojan"}]
+        config = build_batch_config([1080, 1081], outbounds, api_port=1090)
+        self.assertEqual(
+            [(i["tag"], i["port"]) for i in config["inbounds"]],
+            [("api", 1090), ("slot-0-in", 1080), ("slot-1-in", 1081)],
+        )
+        self.assertEqual(
+            [(o["tag"], o["protocol"]) for o in config["outbounds"]],
+            [("blocked", "blackhole"), ("slot-0", "vless"), ("slot-1", "trojan")],
+        )
+        self.assertEqual(
+            [(r["inboundTag"], r["outboundTag"]) for r in config["routing"]["rules"]],
+            [(["api"], "api"), (["slot-0-in"], "slot-0"), (["slot-1-in"], "slot-1")],
+        )
+        self.assertEqual(config["api"]["services"], ["HandlerService"])
+        # The caller's outbounds are not modified
+        self.assertNotIn("tag", outbounds[0])
+
+    def test_without_api_or_outbounds(self):
+        config = build_batch_config([1080])
+        self.assertNotIn("api", config)
+        self.assertEqual([o["tag"] for o in config["outbounds"]], ["blocked"])
+        self.assertEqual(config["inbounds"][0]["listen"], "127.0.0.1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,315 @@
+"""
+Headless config tester: python -m tester_cli (run from this directory).
+
+Loads configs from the server's config API and/or from files (subscription
+dumps, parsed with config_scanner), tests them with OptimizedV2RayTester and
+writes one result per line as JSON Lines or CSV. Logs go to stderr.
+
+With --interval the tester keeps running as a daemon and retests every
+INTERVAL seconds, reloading the configs each round; servers with a fresh
+cached result are skipped (see result_cache.py). --report sends freshly
+tested results to the server's probe-results API, which needs --token.
+
+Nothing here imports Tk, so it runs on headless machines:
+
+    python -m tester_cli --server http://host:8000 --format csv -o results.csv
+    python -m tester_cli subscription.txt --screen-only
+    python -m tester_cli --server http://host:8000 --token KEY --report --interval 1800
+"""
+
+import argparse
+import csv
+import json
+import signal
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+
+from api_client import ApiClient
+from config_scanner import decode_chunks, iter_configs
+from result_cache import CACHE_PATH
+from v2ray_tester import PROBE_REPORT_BATCH, OptimizedV2RayTester, probe_reports
+
+RESULT_FIELDS = ("id", "title", "latency_ms", "status", "success", "tested_at")
+READ_CHUNK = 64 * 1024
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def load_server_configs(api, source_file=None, min_success=None):
+    """{"id", "title", "text"} of the configs listed by the server, best-ranked first"""
+    params = {"order": "latency"}
+    if source_file:
+        params["source_file"] = source_file
+    if min_success is not None:
+        params["min_success"] = min_success
+    response = api.get("tickets/api/config/", params=params)
+    response.raise_for_status()
+    return [
+        {"id": c["id"], "title": c["title"], "text": c["text"]}
+        for c in response.json().get("configs", [])
+    ]
+
+
+def load_file_configs(path):
+    """Configs found in a file ("-" for stdin), read in chunks"""
+    stream = sys.stdin.buffer if path == "-" else open(path, "rb")
+    try:
+        chunks = iter(lambda: stream.read(READ_CHUNK), b"")
+        return list(iter_configs(decode_chunks(chunks)))
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+
+
+def unique_titles(configs):
+    """Make titles unique in place; the tester identifies configs by title"""
+    seen = set()
+    for config in configs:
+        title = base = config.get("title", "Unknown")
+        copy = 1
+        while title in seen:
+            copy += 1
+            title = f"{base} ({copy})"
+        config["title"] = title
+        seen.add(title)
+    return configs
+
+
+def report_results(api, configs, results):
+    """Send [(config_id, latency, status)] to the server's probe-results API"""
+    reports = probe_reports(configs, results)
+    for i in range(0, len(reports), PROBE_REPORT_BATCH):
+        try:
+            response = api.post(
+                "tickets/api/config/probe-results/",
+                json={"results": reports[i : i + PROBE_REPORT_BATCH]},
+            )
+            response.raise_for_status()
+        except requests.RequestException as e:
+            log(f"Could not report test results: {e}")
+            return
+    if reports:
+        log(f"Reported {len(reports)} results to {api.base_url}")
+
+
+class ResultWriter:
+    """Writes result rows to a stream as they arrive"""
+
+    def __init__(self, stream, output_format):
+        self.stream = stream
+        self.csv = None
+        if output_format == "csv":
+            self.csv = csv.DictWriter(stream, RESULT_FIELDS)
+            self.csv.writeheader()
+
+    def write(self, config, latency, status, success):
+        row = {
+            "id": config.get("id"),
+            "title": config.get("title", "Unknown"),
+            "latency_ms": latency if latency > 0 else None,
+            "status": status,
+            "success": success,
+            "tested_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        if self.csv:
+            self.csv.writerow(row)
+        else:
+            self.stream.write(json.dumps(row) + "\n")
+        self.stream.flush()
+
+
+def load_configs(args, api):
+    configs = []
+    if api:
+        configs.extend(load_server_configs(api, args.source_file, args.min_success))
+    for path in args.files:
+        configs.extend(load_file_configs(path))
+    return unique_titles(configs)
+
+
+def test_round(tester, args, api, writer, configs):
+    """Test the configs and write (and report) the results"""
+    by_title = {config["title"]: config for config in configs}
+    log(f"Testing {len(configs)} configs")
+    start = time.monotonic()
+
+    if args.screen_only:
+
+        def show(config_id, latency, status):
+            writer.write(by_title[config_id], latency, status, status == "Reachable")
+
+        results = tester.screen_configs(configs, show)
+        if args.report:
+            # A reachable server says nothing about the proxy; report failures only
+            report_results(
+                api,
+                configs,
+                [
+                    (config_id, latency, status)
+                    for config_id, (latency, status) in results.items()
+                    if status != "Reachable"
+                ],
+            )
+        passed = sum(status == "Reachable" for _, status in results.values())
+    else:
+
+        def show(config_id, latency, status):
+            writer.write(by_title[config_id], latency, status, status == "Success")
+
+        results = tester.test_multiple_configs_parallel(configs, result_callback=show)
+        passed = sum(status == "Success" for _, status in results.values())
+
+    log(
+        f"{passed} of {len(configs)} configs passed "
+        f"in {time.monotonic() - start:.1f}s"
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m tester_cli",
+        description="Test V2Ray configs without the GUI.",
+    )
+    parser.add_argument(
+        "files", nargs="*", help='files to read configs from ("-" for stdin)'
+    )
+    parser.add_argument("--server", help="backend URL to load configs from")
+    parser.add_argument("--token", help="API token to authenticate to the server with")
+    parser.add_argument(
+        "--source-file", type=int, help="only configs extracted from this file id"
+    )
+    parser.add_argument(
+        "--min-success",
+        type=float,
+        help="only configs whose reported success rate is at least this (0-1)",
+    )
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    parser.add_argument(
+        "-o", "--output", default="-", help='result file ("-" for stdout)'
+    )
+    parser.add_argument(
+        "--screen-only",
+        action="store_true",
+        help="only check TCP/TLS reachability; no V2Ray needed",
+    )
+    parser.add_argument(
+        "--report",
+        action="store_true",
+        help="send results to the server's probe-results API",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        help="keep running and retest every INTERVAL seconds",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=500, help="probes in flight at once"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=25, help="link configs per V2Ray process"
+    )
+    parser.add_argument(
+        "--no-tls-screening",
+        action="store_true",
+        help="screen tls/reality servers with a TCP connect only",
+    )
+    parser.add_argument(
+        "--cache",
+        default=CACHE_PATH,
+        help="result cache file; an empty value disables it",
+    )
+    parser.add_argument(
+        "--download-core",
+        action="store_true",
+        help="download the V2Ray core if it is not installed",
+    )
+    args = parser.parse_args(argv)
+
+    if not args.server and not args.files:
+        parser.error("give --server and/or at least one file")
+    if args.report and not (args.server and args.token):
+        parser.error("--report needs --server and --token")
+    if args.source_file and not args.server:
+        parser.error("--source-file needs --server")
+    if args.interval is not None and args.interval <= 0:
+        parser.error("--interval must be positive")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    api = ApiClient(args.server, token=args.token) if args.server else None
+    tester = OptimizedV2RayTester(
+        cache_path=args.cache or None, auto_download=args.download_core
+    )
+    if not tester.v2ray_path and not args.screen_only:
+        log(
+            "V2Ray executable not found; install it, "
+            "pass --download-core or use --screen-only"
+        )
+        return 2
+    tester.max_concurrent_tests = args.concurrency
+    tester.batch_size = args.batch_size
+    tester.tls_screening = not args.no_tls_screening
+    if args.report and not args.screen_only:
+        # Called with freshly tested results only, never cached ones
+        tester.set_results_callback(
+            lambda configs, results: report_results(api, configs, results)
+        )
+
+    output = (
+        sys.stdout
+        if args.output == "-"
+        else open(args.output, "w", newline="", encoding="utf-8")
+    )
+    writer = ResultWriter(output, args.format)
+    try:
+        if args.interval is None:
+            try:
+                configs = load_configs(args, api)
+            except (requests.RequestException, OSError, ValueError) as e:
+                log(f"Could not load configs: {e}")
+                return 1
+            test_round(tester, args, api, writer, configs)
+            return 0
+
+        # Daemon: the first SIGTERM/SIGINT finishes the round in progress,
+        # a second one stops at once
+        stop = threading.Event()
+
+        def request_stop(*_):
+            if stop.is_set():
+                raise KeyboardInterrupt
+            log("Stopping after this round")
+            stop.set()
+
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, request_stop)
+        while not stop.is_set():
+            started = time.monotonic()
+            try:
+                configs = load_configs(args, api)
+            except (requests.RequestException, OSError, ValueError) as e:
+                # The server may be back by the next round
+                log(f"Could not load configs: {e}")
+            else:
+                test_round(tester, args, api, writer, configs)
+            stop.wait(max(args.interval - (time.monotonic() - started), 0))
+        return 0
+    finally:
+        tester.close()
+        if api:
+            api.close()
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
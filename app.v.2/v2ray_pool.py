@@ -0,0 +1,425 @@
+"""
+Pool of long-lived v2ray core processes for latency testing.
+
+build_batch_config() packs N outbounds into one core config: N SOCKS
+inbounds ("slots"), each routed to its own outbound tag, so N servers are
+tested concurrently through one process.
+
+Pool workers are started once with that layout (and no outbounds) plus an
+API inbound for the HandlerService. Testing leases free slots and swaps
+their outbounds in place with `v2ray api rmo/ado` (same commands on Xray),
+one call per batch, so the core is started once per worker instead of once
+per config.
+
+Workers are used as soon as their inbounds accept connections
+(wait_for_port); the measured startup time is reported through on_startup.
+
+Every process takes its ports from a PortAllocator, a thread-safe free list
+over a preallocated range, so concurrent tests never pick the same port.
+Ports another program is bound to are skipped, and a core that exits during
+startup because one was taken after the check is retried on other ports
+(start_core).
+
+Cores without the api commands are detected when the first worker starts;
+callers then fall back to one process per test
+(V2RayProcessPool.api_supported is False).
+"""
+
+import json
+import os
+import queue
+from collections import deque
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# Readiness polling: first retry after 20ms, doubling up to 250ms, give up after 10s
+READY_INITIAL_DELAY = 0.02
+READY_MAX_DELAY = 0.25
+READY_TIMEOUT = 10
+API_TIMEOUT = 5
+STARTUP_ATTEMPTS = 3
+BUSY_PORT_RETRY = 1
+
+
+class PoolUnavailable(Exception):
+    """The core cannot be reconfigured at runtime; test without the pool"""
+
+
+def port_is_free(port):
+    """True if nothing is bound to 127.0.0.1:port"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        if os.name != "nt":
+            # Like the core's listener, ignore TIME_WAIT leftovers of earlier tests
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind(("127.0.0.1", port))
+        except OSError:
+            return False
+    return True
+
+
+class PortAllocator:
+    """
+    Leases 127.0.0.1 ports from [start, start + count). Released ports go to
+    the back of the free list so a port is reused as late as possible.
+    """
+
+    def __init__(self, start, count):
+        self.size = count
+        self.free = deque(range(start, start + count))
+        self.available = threading.Condition()
+
+    def acquire(self, count=1):
+        """Take count ports nothing else is bound to, waiting for releases if needed"""
+        if count > self.size:
+            raise ValueError(f"Cannot lease {count} of {self.size} ports")
+        with self.available:
+            while True:
+                leased = []
+                busy = []
+                while self.free and len(leased) < count:
+                    port = self.free.popleft()
+                    (leased if port_is_free(port) else busy).append(port)
+                # Ports in use elsewhere are retried after every other port
+                self.free.extend(busy)
+                if len(leased) == count:
+                    return leased
+                self.free.extendleft(reversed(leased))
+                # A busy port can be freed by its owner without a release()
+                self.available.wait(timeout=BUSY_PORT_RETRY if busy else None)
+
+    def release(self, ports):
+        with self.available:
+            self.free.extend(ports)
+            self.available.notify_all()
+
+    @contextmanager
+    def lease(self, count=1):
+        ports = self.acquire(count)
+        try:
+            yield ports
+        finally:
+            self.release(ports)
+
+
+def wait_for_port(port, process=None, timeout=READY_TIMEOUT):
+    """
+    Poll 127.0.0.1:port with short connects and exponential backoff until it
+    accepts a connection. Returns the seconds waited, or None if the process
+    exited or the timeout passed first.
+    """
+    start = time.monotonic()
+    delay = READY_INITIAL_DELAY
+    while True:
+        if process is not None and process.poll() is not None:
+            return None
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=delay):
+                return time.monotonic() - start
+        except OSError:
+            pass
+        remaining = timeout - (time.monotonic() - start)
+        if remaining <= 0:
+            return None
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, READY_MAX_DELAY)
+
+
+def slot_tag(slot):
+    return f"slot-{slot}"
+
+
+def build_batch_config(socks_ports, outbounds=(), api_port=None):
+    """
+    Core config with a SOCKS inbound per port, slot i routed to outbound tag
+    slot-i; outbounds[i] (if given) is loaded into slot i.
+    """
+    inbounds = []
+    rules = []
+    if api_port is not None:
+        inbounds.append(
+            {
+                "tag": "api",
+                "listen": "127.0.0.1",
+                "port": api_port,
+                "protocol": "dokodemo-door",
+                "settings": {"address": "127.0.0.1"},
+            }
+        )
+        rules.append({"type": "field", "inboundTag": ["api"], "outboundTag": "api"})
+    for slot, port in enumerate(socks_ports):
+        tag = slot_tag(slot)
+        inbounds.append(
+            {
+                "tag": f"{tag}-in",
+                "port": port,
+                "listen": "127.0.0.1",
+                "protocol": "socks",
+                "settings": {"auth": "noauth", "udp": False},
+            }
+        )
+        rules.append({"type": "field", "inboundTag": [f"{tag}-in"], "outboundTag": tag})
+    config = {
+        "log": {"loglevel": "error"},
+        "inbounds": inbounds,
+        # First outbound is the default: anything unrouted is dropped
+        "outbounds": [{"tag": "blocked", "protocol": "blackhole"}]
+        + [dict(outbound, tag=slot_tag(slot)) for slot, outbound in enumerate(outbounds)],
+        "routing": {"rules": rules},
+    }
+    if api_port is not None:
+        config["api"] = {"tag": "api", "services": ["HandlerService"]}
+    return config
+
+
+def _write_json(data):
+    with tempfile.NamedTemporaryFile(mode="w", suffix=".json", delete=False) as f:
+        json.dump(data, f, separators=(",", ":"))
+        return f.name
+
+
+def _remove(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def start_core(v2ray_path, ports, count, build_config, on_startup=None):
+    """
+    Lease count ports from the allocator, start a core on build_config(leased)
+    and wait until the last port accepts connections.
+    Returns (process, config_file, leased).
+
+    If the core exits during startup and one of its ports is now in use,
+    another program bound it after the lease: the start is retried on other
+    ports (acquire() skips busy ones).
+    """
+    for _ in range(STARTUP_ATTEMPTS):
+        leased = ports.acquire(count)
+        config_file = _write_json(build_config(leased))
+        process = subprocess.Popen(
+            [v2ray_path, "run", "-c", config_file],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        startup_time = wait_for_port(leased[-1], process)
+        if startup_time is not None:
+            if on_startup:
+                on_startup(startup_time)
+            return process, config_file, leased
+
+        stop_core(process, config_file)
+        taken = [port for port in leased if not port_is_free(port)]
+        ports.release(leased)
+        if not taken:
+            break
+    raise RuntimeError("V2Ray failed to start")
+
+
+def stop_core(process, config_file):
+    if process:
+        try:
+            process.terminate()
+            try:
+                process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        except OSError:
+            pass
+    if config_file:
+        _remove(config_file)
+
+
+@contextmanager
+def run_core(v2ray_path, ports, count, build_config, on_startup=None):
+    """Run a core for the duration of the with block and yield its leased ports"""
+    process, config_file, leased = start_core(
+        v2ray_path, ports, count, build_config, on_startup
+    )
+    try:
+        yield leased
+    finally:
+        stop_core(process, config_file)
+        ports.release(leased)
+
+
+def batch_process(v2ray_path, ports, outbounds, on_startup=None):
+    """
+    Context manager running one core with outbounds[i] behind the i-th
+    yielded SOCKS port; used when the core cannot be reconfigured through
+    the API.
+    """
+    return run_core(
+        v2ray_path,
+        ports,
+        len(outbounds),
+        lambda leased: build_batch_config(leased, outbounds),
+        on_startup,
+    )
+
+
+class V2RayWorker:
+    def __init__(self, v2ray_path, ports, slot_count, on_startup=None):
+        self.v2ray_path = v2ray_path
+        self.ports = ports
+        self.slot_count = slot_count
+        self.on_startup = on_startup
+        self.process = None
+        self.config_file = ""
+        # Leased while the process runs
+        self.api_port = None
+        self.socks_ports = []
+        # Slots whose outbound tag is currently registered in the core
+        self.loaded = set()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def build_config(leased):
+        return build_batch_config(leased[1:], api_port=leased[0])
+
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        self.stop()
+        # Inbounds are bound together, so the last one accepting means all are up
+        self.process, self.config_file, leased = start_core(
+            self.v2ray_path,
+            self.ports,
+            self.slot_count + 1,
+            self.build_config,
+            self.on_startup,
+        )
+        self.api_port, self.socks_ports = leased[0], leased[1:]
+        self.loaded.clear()
+        # Older cores have no runtime API; find out before leasing slots
+        if self._add_outbounds([{"tag": "api-probe", "protocol": "blackhole"}]) != 0:
+            self.stop()
+            raise PoolUnavailable("v2ray core has no api commands")
+
+    def stop(self):
+        stop_core(self.process, self.config_file)
+        self.process = None
+        self.config_file = ""
+        if self.api_port is not None:
+            self.ports.release([self.api_port] + self.socks_ports)
+            self.api_port = None
+            self.socks_ports = []
+
+    def _api(self, *args):
+        return subprocess.run(
+            [self.v2ray_path, "api", args[0], f"--server=127.0.0.1:{self.api_port}"]
+            + list(args[1:]),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=API_TIMEOUT,
+        ).returncode
+
+    def _add_outbounds(self, outbounds):
+        outbound_file = _write_json({"outbounds": outbounds})
+        try:
+            return self._api("ado", outbound_file)
+        finally:
+            _remove(outbound_file)
+
+    def set_outbounds(self, outbounds):
+        """
+        Route slots to outbounds ({slot: outbound}) with one API call.
+        Returns {slot: SOCKS port}, with None for outbounds the core rejected.
+        """
+        tags = {slot: slot_tag(slot) for slot in outbounds}
+        with self.lock:
+            if not self.is_running():
+                self.start()
+            stale = [tags[slot] for slot in outbounds if slot in self.loaded]
+            if stale:
+                self._api("rmo", *stale)
+                self.loaded.difference_update(outbounds)
+            tagged = [dict(outbound, tag=tags[slot]) for slot, outbound in outbounds.items()]
+            if self._add_outbounds(tagged) == 0:
+                self.loaded.update(outbounds)
+                return {slot: self.socks_ports[slot] for slot in outbounds}
+
+            # One bad outbound fails the whole call; load them singly to find it
+            self._api("rmo", *tags.values())
+            ports = {}
+            for slot, outbound in outbounds.items():
+                if self._add_outbounds([dict(outbound, tag=tags[slot])]) == 0:
+                    self.loaded.add(slot)
+                    ports[slot] = self.socks_ports[slot]
+                else:
+                    ports[slot] = None
+            return ports
+
+
+class V2RayProcessPool:
+    def __init__(
+        self,
+        v2ray_path,
+        ports,
+        workers=4,
+        slots_per_worker=25,
+        on_startup=None,
+    ):
+        self.v2ray_path = v2ray_path
+        self.workers = []
+        self.free = queue.Queue()
+        # Held while taking several slots so concurrent batches cannot deadlock
+        self.lease_lock = threading.Lock()
+        self.api_supported = None  # unknown until the first lease
+        for _ in range(workers):
+            worker = V2RayWorker(v2ray_path, ports, slots_per_worker, on_startup)
+            self.workers.append(worker)
+            for slot in range(slots_per_worker):
+                self.free.put((worker, slot))
+
+    @property
+    def capacity(self):
+        return sum(worker.slot_count for worker in self.workers)
+
+    @contextmanager
+    def slots(self, outbounds):
+        """
+        Lease one slot per outbound and yield their SOCKS ports, in order
+        (None where the core rejected the outbound).
+        """
+        if self.api_supported is False:
+            raise PoolUnavailable("v2ray core has no api commands")
+        if len(outbounds) > self.capacity:
+            raise ValueError("Batch is larger than the pool")
+        with self.lease_lock:
+            leased = [self.free.get() for _ in outbounds]
+        try:
+            by_worker = {}
+            for (worker, slot), outbound in zip(leased, outbounds):
+                by_worker.setdefault(worker, {})[slot] = outbound
+            ports = {}
+            try:
+                for worker, worker_outbounds in by_worker.items():
+                    for slot, port in worker.set_outbounds(worker_outbounds).items():
+                        ports[(worker, slot)] = port
+            except PoolUnavailable:
+                self.api_supported = False
+                raise
+            self.api_supported = True
+            yield [ports[lease] for lease in leased]
+        finally:
+            for lease in leased:
+                self.free.put(lease)
+
+    @contextmanager
+    def slot(self, outbound):
+        """Lease a slot routed to outbound and yield its SOCKS port"""
+        with self.slots([outbound]) as ports:
+            if ports[0] is None:
+                raise ValueError("V2Ray rejected the outbound")
+            yield ports[0]
+
+    def close(self):
+        for worker in self.workers:
+            worker.stop()
@@ -0,0 +1,762 @@
+"""
+Config latency tester, without any GUI dependency.
+
+OptimizedV2RayTester parses vmess/vless links and V2Ray JSON configs, runs
+them through the V2Ray core and measures latency (see async_probe.py and
+v2ray_pool.py). client.py wraps it for the desktop app and tester_cli.py
+runs it headless; neither this module nor tester_cli.py imports Tk.
+"""
+
+import atexit
+import base64
+import json
+import os
+import platform
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import zipfile
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import parse_qs, unquote, urlparse
+
+import requests
+
+from async_probe import run_latencies, run_screening
+from result_cache import CACHE_PATH, ResultCache, fingerprint
+from v2ray_pool import (
+    PoolUnavailable,
+    PortAllocator,
+    V2RayProcessPool,
+    batch_process,
+    run_core,
+)
+
+# Results per request to the server's probe-results endpoint (its batch limit)
+PROBE_REPORT_BATCH = 1000
+
+
+class OptimizedV2RayTester:
+    def __init__(self, cache_path=CACHE_PATH, auto_download=False):
+        """
+        Initializes the V2RayTester with optimizations for faster testing.
+        cache_path=None disables the result cache; auto_download fetches the
+        V2Ray core if it is not installed.
+        """
+        self.auto_download = auto_download
+        self.log_callback = None
+        self.results_callback = None
+        self.v2ray_path = self.find_v2ray_executable()
+
+        # Optimization: Reuse V2Ray processes with different ports
+        self.process_pool = None  # started on first test (see get_process_pool)
+        self.pool_lock = threading.Lock()
+        self.max_concurrent_tests = (
+            500  # Probes in flight at once (asyncio, see async_probe.py)
+        )
+        # Every SOCKS/API port a V2Ray process listens on is leased from here
+        self.ports = PortAllocator(10800, 2500)
+        # Link configs are tested batch_size at a time through one V2Ray process;
+        # without the pool up to max_batch_processes of them run at once
+        self.batch_size = 25
+        self.max_batch_processes = 20
+        # Servers of tls/reality links must also complete a TLS handshake to be tested
+        self.tls_screening = True
+        # Seconds from spawn until V2Ray accepted connections, most recent last
+        self.startup_times = deque(maxlen=500)
+        # Results persisted across sessions, keyed by server fingerprint
+        self.result_cache = None
+        if cache_path:
+            try:
+                self.result_cache = ResultCache(cache_path)
+            except sqlite3.Error as e:
+                self.log(f"Latency result cache disabled: {e}")
+        atexit.register(self.close)
+
+    def get_process_pool(self):
+        """Pool of warm V2Ray processes, or None if the core has no runtime API"""
+        with self.pool_lock:
+            if self.process_pool is None and self.v2ray_path:
+                self.process_pool = V2RayProcessPool(
+                    self.v2ray_path,
+                    self.ports,
+                    on_startup=self.startup_times.append,
+                )
+            if self.process_pool and self.process_pool.api_supported is False:
+                return None
+            return self.process_pool
+
+    def startup_summary(self):
+        """Human readable V2Ray startup time metric"""
+        if not self.startup_times:
+            return "no V2Ray starts measured"
+        times = sorted(self.startup_times)
+        return (
+            f"V2Ray startup: avg {sum(times) / len(times) * 1000:.0f}ms, "
+            f"max {times[-1] * 1000:.0f}ms over {len(times)} starts"
+        )
+
+    def close(self):
+        """Stop the pooled V2Ray processes"""
+        with self.pool_lock:
+            if self.process_pool:
+                self.process_pool.close()
+                self.process_pool = None
+
+    def set_log_callback(self, callback):
+        """Set callback function for logging"""
+        self.log_callback = callback
+
+    def set_results_callback(self, callback):
+        """Set callback(configs, [(config_id, latency, status)]) called after each
+        test run with the configs that were actually tested (not cached)"""
+        self.results_callback = callback
+
+    def log(self, message):
+        """Log message to callback if available"""
+        if self.log_callback:
+            self.log_callback(message)
+        # stderr, so stdout can carry results (see tester_cli.py)
+        print(message, file=sys.stderr)
+
+    def find_v2ray_executable(self):
+        """Find V2Ray executable in common locations or offer to download it."""
+        executable_name = "v2ray.exe" if platform.system() == "Windows" else "v2ray"
+        local_path = os.path.join("v2ray_core", executable_name)
+
+        common_paths = [
+            local_path,
+            "v2ray",
+            "./v2ray",
+            "./v2ray.exe",
+            "C:/Program Files/v2ray/v2ray.exe",
+            "/usr/bin/v2ray",
+            "/usr/local/bin/v2ray",
+        ]
+
+        for path in common_paths:
+            try:
+                result = subprocess.run(
+                    [path, "version"],
+                    capture_output=True,
+                    text=True,
+                    timeout=5,
+                    check=False,
+                )
+                if result.returncode == 0 and (
+                    "V2Ray" in result.stdout or "Xray" in result.stdout
+                ):
+                    self.log(f"Found V2Ray executable at: {path}")
+                    return path
+            except (subprocess.TimeoutExpired, FileNotFoundError, OSError):
+                continue
+
+        return self.offer_download()
+
+    def offer_download(self):
+        """Called when no V2Ray executable was found; returns the downloaded
+        core's path or None. Frontends override this to ask the user first."""
+        if self.auto_download:
+            return self._download_v2ray_core()
+        return None
+
+    def _download_v2ray_core(self):
+        """Downloads and extracts the latest V2Ray core for the current OS."""
+        try:
+            system = platform.system()
+            machine = platform.machine().lower()
+
+            os_map = {"Windows": "windows", "Linux": "linux", "Darwin": "macos"}
+            if system not in os_map:
+                self.log(f"Unsupported OS: {system}")
+                return None
+            os_name = os_map[system]
+
+            if "amd64" in machine or "x86_64" in machine:
+                arch_name = "64"
+            elif "arm64" in machine or "aarch64" in machine:
+                arch_name = "arm64-v8a"
+            elif "arm" in machine:
+                arch_name = "arm32-v7a"
+            else:
+                arch_name = "32"
+
+            self.log("Fetching latest V2Ray release info from GitHub...")
+            api_url = "https://api.github.com/repos/v2fly/v2ray-core/releases/latest"
+            response = requests.get(api_url, timeout=30)
+            response.raise_for_status()
+            release_data = response.json()
+
+            asset_filename = f"v2ray-{os_name}-{arch_name}.zip"
+            download_url = None
+            for asset in release_data.get("assets", []):
+                if asset.get("name") == asset_filename:
+                    download_url = asset.get("browser_download_url")
+                    break
+
+            if not download_url:
+                self.log(
+                    f"Could not find a compatible V2Ray version for your system ({asset_filename})."
+                )
+                return None
+
+            download_dir = "v2ray_core"
+            os.makedirs(download_dir, exist_ok=True)
+            zip_path = os.path.join(download_dir, "v2ray.zip")
+
+            self.log(f"Downloading {download_url}...")
+            with requests.get(download_url, stream=True, timeout=60) as r:
+                r.raise_for_status()
+                with open(zip_path, "wb") as f:
+                    for chunk in r.iter_content(chunk_size=8192):
+                        f.write(chunk)
+
+            self.log(f"Extracting {zip_path}...")
+            with zipfile.ZipFile(zip_path, "r") as zip_ref:
+                zip_ref.extractall(download_dir)
+
+            os.remove(zip_path)
+
+            executable_name = "v2ray.exe" if system == "Windows" else "v2ray"
+            executable_path = os.path.join(download_dir, executable_name)
+
+            if os.path.exists(executable_path):
+                if system != "Windows":
+                    os.chmod(executable_path, 0o755)
+
+                self.log(f"V2Ray executable is now at: {executable_path}")
+                return executable_path
+
+            self.log(f"Executable '{executable_name}' not found after extraction.")
+            return None
+
+        except Exception as e:
+            self.log(f"An error occurred during V2Ray download: {e}")
+            return None
+
+    def parse_vmess_url(self, url):
+        """Parse vmess:// URL to extract server info"""
+        try:
+            if not url.startswith("vmess://"):
+                return None
+
+            encoded_part = url[8:]
+            decoded = base64.b64decode(
+                encoded_part + "=" * (-len(encoded_part) % 4)
+            ).decode("utf-8")
+            config = json.loads(decoded)
+
+            return {
+                "protocol": "vmess",
+                "address": config.get("add", ""),
+                "port": int(config.get("port", 443)),
+                "id": config.get("id", ""),
+                "name": config.get("ps", "Unknown"),
+                "security": "tls" if config.get("tls") == "tls" else "none",
+                "sni": config.get("sni") or config.get("host", ""),
+            }
+        except Exception as e:
+            self.log(f"Error parsing vmess URL: {e}")
+            return None
+
+    def parse_vless_url(self, url):
+        """Parse vless:// URL to extract server info"""
+        try:
+            if not url.startswith("vless://"):
+                return None
+
+            parsed = urlparse(url)
+            query = parse_qs(parsed.query)
+
+            name = "Unknown"
+            if "remarks" in query:
+                name = unquote(query["remarks"][0])
+            elif parsed.fragment:
+                name = unquote(parsed.fragment)
+
+            return {
+                "protocol": "vless",
+                "address": parsed.hostname,
+                "port": parsed.port or 80,
+                "id": parsed.username,
+                "name": name,
+                "path": query.get("path", ["/"])[0],
+                "type": query.get("type", ["tcp"])[0],
+                "security": query.get("security", ["none"])[0],
+                "sni": query.get("sni", [""])[0],
+                "encryption": query.get("encryption", ["none"])[0],
+            }
+        except Exception as e:
+            self.log(f"Error parsing vless URL: {e}")
+            return None
+
+    def parse_config_text(self, config_text):
+        """Parse V2Ray config text to extract server information"""
+        try:
+            vmess_urls = re.findall(r"vmess://[A-Za-z0-9+/=]+", config_text)
+            if vmess_urls:
+                return self.parse_vmess_url(vmess_urls[0])
+
+            vless_urls = re.findall(r"vless://[^\s\n]+", config_text)
+            if vless_urls:
+                return self.parse_vless_url(vless_urls[0])
+
+            if config_text.strip().startswith("{"):
+                config = json.loads(config_text)
+                outbounds = config.get("outbounds", [])
+                if outbounds:
+                    outbound = outbounds[0]
+                    settings = outbound.get("settings", {})
+                    vnext = settings.get("vnext", [{}])
+                    if vnext:
+                        vnext = vnext[0]
+                        return {
+                            "protocol": outbound.get("protocol", "unknown"),
+                            "address": vnext.get("address", ""),
+                            "port": vnext.get("port", 443),
+                            "name": "V2Ray JSON Config",
+                        }
+
+            address_match = re.search(r'"address":\s*"([^"]+)"', config_text)
+            port_match = re.search(r'"port":\s*(\d+)', config_text)
+
+            if address_match and port_match:
+                return {
+                    "protocol": "unknown",
+                    "address": address_match.group(1),
+                    "port": int(port_match.group(1)),
+                    "name": "Parsed Config",
+                }
+
+        except Exception as e:
+            self.log(f"Error parsing config: {e}")
+
+        return None
+
+    def create_test_config_from_vless(self, server_info, socks_port):
+        """Create V2Ray config from vless server info with custom SOCKS port"""
+        config = {
+            "log": {"loglevel": "error"},  # Reduced logging for speed
+            "inbounds": [
+                {
+                    "tag": "socks-in",
+                    "port": socks_port,
+                    "listen": "127.0.0.1",
+                    "protocol": "socks",
+                    "settings": {
+                        "auth": "noauth",
+                        "udp": False,
+                    },  # Disable UDP for faster testing
+                }
+            ],
+            "outbounds": [
+                {
+                    "tag": "proxy",
+                    "protocol": "vless",
+                    "settings": {
+                        "vnext": [
+                            {
+                                "address": server_info["address"],
+                                "port": server_info["port"],
+                                "users": [
+                                    {
+                                        "id": server_info["id"],
+                                        "encryption": server_info.get(
+                                            "encryption", "none"
+                                        ),
+                                    }
+                                ],
+                            }
+                        ]
+                    },
+                    "streamSettings": {"network": server_info.get("type", "tcp")},
+                }
+            ],
+        }
+
+        if server_info.get("type") == "ws":
+            config["outbounds"][0]["streamSettings"]["wsSettings"] = {
+                "path": server_info.get("path", "/")
+            }
+
+        return config
+
+    def create_test_config_from_vmess(self, server_info, socks_port):
+        """Create V2Ray config from vmess server info with custom SOCKS port"""
+        config = {
+            "log": {"loglevel": "error"},  # Reduced logging for speed
+            "inbounds": [
+                {
+                    "tag": "socks-in",
+                    "port": socks_port,
+                    "listen": "127.0.0.1",
+                    "protocol": "socks",
+                    "settings": {
+                        "auth": "noauth",
+                        "udp": False,
+                    },  # Disable UDP for faster testing
+                }
+            ],
+            "outbounds": [
+                {
+                    "tag": "proxy",
+                    "protocol": "vmess",
+                    "settings": {
+                        "vnext": [
+                            {
+                                "address": server_info["address"],
+                                "port": server_info["port"],
+                                "users": [
+                                    {"id": server_info["id"], "security": "auto"}
+                                ],
+                            }
+                        ]
+                    },
+                }
+            ],
+        }
+
+        return config
+
+    def create_test_config(self, config_text, socks_port):
+        """Create a temporary V2Ray config for testing with custom SOCKS port"""
+        try:
+            if config_text.strip().startswith("{"):
+                base_config = json.loads(config_text)
+
+                if "inbounds" not in base_config:
+                    base_config["inbounds"] = []
+
+                # Replace existing SOCKS inbound with our custom port
+                base_config["inbounds"] = [
+                    ib
+                    for ib in base_config["inbounds"]
+                    if not (ib.get("protocol") == "socks" and ib.get("port") == 1080)
+                ]
+
+                base_config["inbounds"].append(
+                    {
+                        "tag": "socks-test",
+                        "port": socks_port,
+                        "listen": "127.0.0.1",
+                        "protocol": "socks",
+                        "settings": {"auth": "noauth", "udp": False},
+                    }
+                )
+
+                # Optimize logging
+                base_config["log"] = {"loglevel": "error"}
+
+                return base_config
+            else:
+                server_info = self.parse_config_text(config_text)
+                if not server_info:
+                    return None
+
+                if server_info["protocol"] == "vless":
+                    return self.create_test_config_from_vless(server_info, socks_port)
+                elif server_info["protocol"] == "vmess":
+                    return self.create_test_config_from_vmess(server_info, socks_port)
+                else:
+                    return None
+
+        except Exception as e:
+            self.log(f"Error creating test config: {e}")
+            return None
+
+    def create_test_outbound(self, config_text):
+        """Proxy outbound for a vmess/vless link, as hosted by a pool slot"""
+        if config_text.strip().startswith("{"):
+            # Full JSON configs may depend on their own routing; test them as-is
+            return None
+        test_config = self.create_test_config(config_text, 0)
+        if not test_config:
+            return None
+        return test_config["outbounds"][0]
+
+    def measure_proxy_latency(self, socks_port, tcp_latency, timeout):
+        """Time a request through the SOCKS proxy on socks_port"""
+        proxies = {
+            "http": f"socks5://127.0.0.1:{socks_port}",
+            "https": f"socks5://127.0.0.1:{socks_port}",
+        }
+
+        start_time = time.time()
+        try:
+            # Use lightweight endpoint with shorter timeout
+            response = requests.get(
+                "http://www.google.com/generate_204",
+                proxies=proxies,
+                timeout=timeout // 2,
+            )
+            end_time = time.time()
+
+            latency = int((end_time - start_time) * 1000)
+            return latency, "Success"
+
+        except requests.exceptions.RequestException:
+            # If proxy test fails, return the TCP connection latency
+            if tcp_latency > 0:
+                return tcp_latency, "Direct connection"
+            else:
+                return -1, "Connection failed"
+
+    def fast_connectivity_check(self, server_info, timeout=3):
+        """Fast TCP connectivity check before full V2Ray test"""
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            start_time = time.time()
+            result = sock.connect_ex((server_info["address"], server_info["port"]))
+            end_time = time.time()
+            sock.close()
+
+            if result == 0:
+                latency = int((end_time - start_time) * 1000)
+                return latency, True
+            else:
+                return -1, False
+
+        except Exception:
+            return -1, False
+
+    def test_config_latency_optimized(self, config_text, timeout=8):
+        """Optimized V2Ray config testing with faster startup and reduced timeouts"""
+        if not self.v2ray_path:
+            return -1, "V2Ray executable not found"
+
+        server_info = self.parse_config_text(config_text)
+        if not server_info:
+            return -1, "Could not parse config"
+
+        # Quick connectivity pre-check
+        tcp_latency, is_reachable = self.fast_connectivity_check(server_info, timeout=3)
+        if not is_reachable:
+            return -1, "Server unreachable"
+
+        # Load the config into a warm pooled process instead of starting one
+        outbound = self.create_test_outbound(config_text)
+        pool = self.get_process_pool() if outbound else None
+        if pool:
+            try:
+                with pool.slot(outbound) as socks_port:
+                    return self.measure_proxy_latency(socks_port, tcp_latency, timeout)
+            except PoolUnavailable:
+                self.log("V2Ray core has no API support; using one process per test")
+            except (RuntimeError, ValueError, OSError, subprocess.SubprocessError) as e:
+                return -1, f"Test error: {str(e)[:20]}"
+
+        if not self.create_test_config(config_text, 0):
+            return -1, "Could not create test config"
+
+        try:
+            # Ports are leased, so concurrent tests never share one
+            with run_core(
+                self.v2ray_path,
+                self.ports,
+                1,
+                lambda ports: self.create_test_config(config_text, ports[0]),
+                self.startup_times.append,
+            ) as (socks_port,):
+                # Test with reduced timeout
+                return self.measure_proxy_latency(socks_port, tcp_latency, timeout)
+        except RuntimeError as e:
+            return -1, str(e)
+        except Exception as e:
+            return -1, f"Test error: {str(e)[:20]}"
+
+    @contextmanager
+    def load_batch(self, outbounds):
+        """Yield one SOCKS port per outbound (None if it could not be loaded)"""
+        pool = self.get_process_pool()
+        if pool:
+            try:
+                with pool.slots(outbounds) as ports:
+                    yield ports
+                return
+            except PoolUnavailable:
+                self.log("V2Ray core has no API support; using one process per batch")
+
+        with batch_process(
+            self.v2ray_path, self.ports, outbounds, self.startup_times.append
+        ) as ports:
+            yield ports
+
+    def batch_loaders(self):
+        """How many batches load_batch can hold at once without waiting"""
+        pool = self.get_process_pool()
+        if pool:
+            return max(1, pool.capacity // self.batch_size)
+        return self.max_batch_processes
+
+    def split_screenable(self, configs):
+        """Split configs into (config_id, server_info, outbound, config_text)
+        items for screening and the configs that could not be parsed.
+        outbound is None where the config cannot be loaded into a batch
+        (full JSON configs, or no V2Ray executable)."""
+        items = []
+        unparsed = []
+        for config in configs:
+            config_text = config.get("text", "")
+            server_info = self.parse_config_text(config_text)
+            if not server_info:
+                unparsed.append(config)
+                continue
+            outbound = (
+                self.create_test_outbound(config_text) if self.v2ray_path else None
+            )
+            items.append(
+                (config.get("title", "Unknown"), server_info, outbound, config_text)
+            )
+        return items, unparsed
+
+    def screen_configs(self, configs, result_callback=None):
+        """Stage one alone: TCP (and TLS) reachability of every config's server.
+        Returns {config_id: (tcp_latency, status)}, status "Reachable" if it passed."""
+        results = {}
+
+        def record(config_id, latency, status):
+            results[config_id] = (latency, status)
+            if result_callback:
+                result_callback(config_id, latency, status)
+
+        run_screening(
+            self,
+            configs,
+            record,
+            concurrency=self.max_concurrent_tests,
+            tls=self.tls_screening,
+        )
+        if self.result_cache:
+            # A dead server is a complete result; reachable ones still need the proxy test
+            self.cache_results(
+                self.fingerprint_configs(configs),
+                [
+                    (config_id, latency, status)
+                    for config_id, (latency, status) in results.items()
+                    if status != "Reachable"
+                ],
+            )
+        return results
+
+    def test_multiple_configs_parallel(
+        self, configs, progress_callback=None, result_callback=None, prescreened=None
+    ):
+        """Test multiple configs concurrently on one asyncio event loop: servers
+        are screened with TCP/TLS connects first, and only the survivors are
+        loaded into V2Ray, batch_size links per process.
+        result_callback(config_id, latency, status) fires as each one finishes;
+        prescreened maps config ids that already passed screen_configs to their
+        TCP latency. Servers with a fresh cached result are not retested."""
+        results = {}
+        completed = 0
+        total = len(configs)
+
+        def record(config_id, latency, status):
+            nonlocal completed
+            results[config_id] = (latency, status)
+            completed += 1
+            if result_callback:
+                result_callback(config_id, latency, status)
+            if progress_callback:
+                progress_callback(completed, total)
+
+        fingerprints = self.fingerprint_configs(configs) if self.result_cache else {}
+        to_test = configs
+        if fingerprints:
+            try:
+                cached = self.result_cache.lookup(fingerprints.values())
+            except sqlite3.Error as e:
+                self.log(f"Could not read cached results: {e}")
+                cached = {}
+            now = time.time()
+            to_test = []
+            for config in configs:
+                config_id = config.get("title", "Unknown")
+                entry = cached.get(fingerprints.get(config_id))
+                if entry and entry.is_fresh(now, self.result_cache.ttl):
+                    record(config_id, entry.latency, entry.status)
+                else:
+                    to_test.append(config)
+
+            # Servers that kept failing are retested after everything else
+            def failure_streak(config):
+                entry = cached.get(fingerprints.get(config.get("title", "Unknown")))
+                return entry.failure_streak if entry else 0
+
+            to_test.sort(key=failure_streak)
+            if len(to_test) < total:
+                self.log(
+                    f"{total - len(to_test)} results from the cache, "
+                    f"testing {len(to_test)} configs"
+                )
+
+        tested = []
+
+        def record_tested(config_id, latency, status):
+            tested.append((config_id, latency, status))
+            record(config_id, latency, status)
+
+        run_latencies(
+            self,
+            to_test,
+            record_tested,
+            concurrency=self.max_concurrent_tests,
+            tls=self.tls_screening,
+            prescreened=prescreened,
+        )
+        self.cache_results(fingerprints, tested)
+        if self.results_callback and tested:
+            self.results_callback(to_test, tested)
+
+        self.log(self.startup_summary())
+        return results
+
+    def fingerprint_configs(self, configs):
+        """{config_id: result cache key} for the configs that can be parsed"""
+        fingerprints = {}
+        for config in configs:
+            server_info = self.parse_config_text(config.get("text", ""))
+            if server_info:
+                fingerprints[config.get("title", "Unknown")] = fingerprint(server_info)
+        return fingerprints
+
+    def cache_results(self, fingerprints, results):
+        """Persist [(config_id, latency, status)] in the result cache"""
+        rows = [
+            (fingerprints[config_id], latency, status)
+            for config_id, latency, status in results
+            if config_id in fingerprints
+        ]
+        if rows:
+            try:
+                self.result_cache.store(rows)
+            except sqlite3.Error as e:
+                self.log(f"Could not save test results: {e}")
+
+
+def probe_reports(configs, results):
+    """
+    Probe-results API entries for [(config_id, latency, status)] of configs
+    that were loaded from the server (those with an "id").
+    """
+    config_ids = {
+        config.get("title", "Unknown"): config["id"]
+        for config in configs
+        if config.get("id")
+    }
+    return [
+        {
+            "config_id": config_ids[config_title],
+            # "Direct connection" means the proxy itself failed
+            "success": status == "Success",
+            "latency_ms": latency if status == "Success" else None,
+            "status": status[:50],
+        }
+        for config_title, latency, status in results
+        if config_title in config_ids
+    ]
@@ -20,6 +20,7 @@ import zipfile
 import socket
 import concurrent.futures
 from queue import Queue
+from collections import deque
 
 def get_backend_url():
     """
@@ -27,6 +28,43 @@ def get_backend_url():
     """
     return os.environ.get('BACKEND_URL', 'https://ixiflower32.pythonanywhere.com')
 
+def port_is_free(port):
+    """True if nothing is bound to 127.0.0.1:port"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        if os.name != 'nt':
+            # Like V2Ray's listener, ignore TIME_WAIT leftovers of earlier tests
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind(('127.0.0.1', port))
+        except OSError:
+            return False
+    return True
+
+class SocksPortAllocator:
+    """
+    Thread-safe free list of ports in [start, start + count). Ports another
+    program is bound to are skipped and moved to the back.
+    """
+    def __init__(self, start, count):
+        self.free = deque(range(start, start + count))
+        self.available = threading.Condition()
+    
+    def acquire(self):
+        with self.available:
+            while True:
+                for _ in range(len(self.free)):
+                    port = self.free.popleft()
+                    if port_is_free(port):
+                        return port
+                    self.free.append(port)
+                # Every port is leased or busy; wait for a release or for a busy one to free up
+                self.available.wait(timeout=1)
+    
+    def release(self, port):
+        with self.available:
+            self.free.append(port)
+            self.available.notify()
+
 class OptimizedV2RayTester:
     def __init__(self, root_tk=None):
         """
@@ -39,7 +77,9 @@ class OptimizedV2RayTester:
         # Optimization: Reuse V2Ray processes with different ports
         self.process_pool = []
         self.max_concurrent_tests = 5  # Reduced from unlimited to prevent resource exhaustion
-        self.base_socks_port = 10800  # Starting port for SOCKS proxies
+        self.socks_ports = SocksPortAllocator(10800, 100)  # SOCKS ports leased to tests
+        # Seconds from spawn until V2Ray accepted connections, most recent last
+        self.startup_times = deque(maxlen=500)
         
     def set_log_callback(self, callback):
         """Set callback function for logging"""
@@ -386,6 +426,33 @@ class OptimizedV2RayTester:
             self.log(f"Error creating test config: {e}")
             return None
     
+    def wait_for_socks_ready(self, socks_port, process, timeout=10):
+        """Poll the SOCKS inbound with short connects (backoff 20ms doubling to 250ms)
+        until it accepts; returns the seconds waited or None if V2Ray exited or timed out"""
+        start = time.monotonic()
+        delay = 0.02
+        while True:
+            if process.poll() is not None:
+                return None
+            try:
+                with socket.create_connection(('127.0.0.1', socks_port), timeout=delay):
+                    return time.monotonic() - start
+            except OSError:
+                pass
+            remaining = timeout - (time.monotonic() - start)
+            if remaining <= 0:
+                return None
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.25)
+    
+    def startup_summary(self):
+        """Human readable V2Ray startup time metric"""
+        if not self.startup_times:
+            return "no V2Ray starts measured"
+        times = sorted(self.startup_times)
+        return (f"V2Ray startup: avg {sum(times) / len(times) * 1000:.0f}ms, "
+                f"max {times[-1] * 1000:.0f}ms over {len(times)} starts")
+    
     def fast_connectivity_check(self, server_info, timeout=3):
         """Fast TCP connectivity check before full V2Ray test"""
         try:
@@ -419,19 +486,21 @@ class OptimizedV2RayTester:
         if not is_reachable:
             return -1, "Server unreachable"
         
-        # Find available port for this test
-        socks_port = self.base_socks_port
-        while socks_port < self.base_socks_port + 100:  # Try up to 100 ports
+        # Leased ports are never shared by concurrent tests; if another program
+        # took the port before V2Ray could bind it, retry on a different one
+        for _ in range(3):
+            socks_port = self.socks_ports.acquire()
             try:
-                test_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                test_sock.bind(('127.0.0.1', socks_port))
-                test_sock.close()
-                break
-            except OSError:
-                socks_port += 1
-        else:
-            return -1, "No available ports"
-        
+                result = self.test_on_port(config_text, socks_port, tcp_latency, timeout)
+            finally:
+                self.socks_ports.release(socks_port)
+            if result is not None:
+                return result
+        return -1, "V2Ray failed to start"
+    
+    def test_on_port(self, config_text, socks_port, tcp_latency, timeout):
+        """Test through one V2Ray process listening on socks_port;
+        returns None if the port was taken before V2Ray bound it"""
         test_config = self.create_test_config(config_text, socks_port)
         if not test_config:
             return -1, "Could not create test config"
@@ -453,11 +522,13 @@ class OptimizedV2RayTester:
                 text=True
             )
             
-            # Reduced startup wait time
-            time.sleep(1.5)
-            
-            if process.poll() is not None:
+            # Wait until the SOCKS inbound accepts connections
+            startup_time = self.wait_for_socks_ready(socks_port, process)
+            if startup_time is None:
+                if process.poll() is not None and not port_is_free(socks_port):
+                    return None
                 return -1, "V2Ray failed to start"
+            self.startup_times.append(startup_time)
             
             # Test with reduced timeout
             proxies = {
@@ -534,6 +605,7 @@ class OptimizedV2RayTester:
                 if progress_callback:
                     progress_callback(completed, total)
         
+        self.log(self.startup_summary())
         return results
 
 
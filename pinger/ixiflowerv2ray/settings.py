@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -56,11 +58,13 @@ AUTH_USER_MODEL = "authentication.User"
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",  # Must be placed as high as possible
+    "tickets.middleware.RequestLoggingMiddleware",  # Sampled request logging
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "tickets.middleware.TokenAuthenticationMiddleware",  # Token header auth, after AuthenticationMiddleware
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -169,3 +173,70 @@ CORS_ALLOW_CREDENTIALS = True
 
 CORS_ALLOW_ALL_ORIGINS = True  # Only for development
 
+# Extra header used by the admin tools for destructive endpoints
+CORS_ALLOW_HEADERS = (*default_headers, "x-admin-password")
+
+# Preflights are answered by CorsMiddleware and cached by the browser
+CORS_PREFLIGHT_MAX_AGE = 86400
+
+# Let the frontend read validators for conditional GETs
+CORS_EXPOSE_HEADERS = ["ETag", "Last-Modified", "Content-Range", "Accept-Ranges"]
+
+# Cache for API token lookups (see tickets/authentication.py)
+TOKEN_AUTH_CACHE = {
+    "MAX_SIZE": 1024,
+    "TTL": 300,
+    "CACHE_ALIAS": None,  # Set to a CACHES alias to share lookups between workers
+}
+
+# Sampled request logging (see tickets/request_logging.py)
+REQUEST_LOGGING = {
+    "LEVEL": "INFO",
+    "SAMPLE_RATE": float(os.environ.get("REQUEST_LOG_SAMPLE_RATE", "0.05")),
+    "ENDPOINT_SAMPLE_RATES": {
+        "api_login": 1.0,
+        "api_upload_file": 1.0,
+    },
+    "ENDPOINT_LEVELS": {},
+    "HEADERS": ["Origin", "User-Agent", "Authorization"],
+    "SENSITIVE_HEADERS": ["Authorization", "Cookie", "X-Admin-Password"],
+}
+FILE_DOWNLOADS = {
+    # "x-accel-redirect" (nginx) or "x-sendfile" (Apache) to let the proxy serve file bytes
+    "SENDFILE": os.environ.get("FILE_DOWNLOAD_SENDFILE") or None,
+    "ACCEL_REDIRECT_PREFIX": "/protected-media/",
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "default": {
+            "format": "%(asctime)s %(levelname)s %(name)s %(message)s",
+        },
+        "request": {
+            "format": "%(asctime)s %(levelname)s %(message)s endpoint=%(endpoint)s headers=%(headers)s",
+        },
+    },
+    "handlers": {
+        "queue": {
+            "()": "tickets.request_logging.NonBlockingQueueHandler",
+            "formatter": "default",
+        },
+        "request_queue": {
+            "()": "tickets.request_logging.NonBlockingQueueHandler",
+            "formatter": "request",
+        },
+    },
+    "loggers": {
+        "tickets": {
+            "handlers": ["queue"],
+            "level": "INFO",
+        },
+        "tickets.requests": {
+            "handlers": ["request_queue"],
+            "level": "INFO",
+            "propagate": False,
+        },
+    },
+}
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth import get_user_model
-from .models import Ticket, ConfigFile, V2RayConfig, UserProfile, Task, PermanentNote
+from .models import Ticket, ConfigFile, V2RayConfig, ConfigLatencyStats, UserProfile, Task, PermanentNote
 
 User = get_user_model()
 
@@ -14,10 +14,10 @@ class TicketAdmin(admin.ModelAdmin):
 
 @admin.register(ConfigFile)
 class ConfigFileAdmin(admin.ModelAdmin):
-    list_display = ('name', 'uploaded_by', 'uploaded_at')
+    list_display = ('name', 'uploaded_by', 'uploaded_at', 'size_bytes')
     list_filter = ('uploaded_at',)
-    search_fields = ('name', 'uploaded_by__username')
-    readonly_fields = ('uploaded_at',)
+    search_fields = ('name', 'uploaded_by__username', 'sha256')
+    readonly_fields = ('uploaded_at', 'size_bytes', 'sha256', 'line_count')
 
 @admin.register(V2RayConfig)
 class V2RayConfigAdmin(admin.ModelAdmin):
@@ -26,6 +26,12 @@ class V2RayConfigAdmin(admin.ModelAdmin):
     search_fields = ('title', 'text')
     readonly_fields = ('created_at', 'updated_at')
 
+@admin.register(ConfigLatencyStats)
+class ConfigLatencyStatsAdmin(admin.ModelAdmin):
+    list_display = ('config', 'p50_latency_ms', 'p95_latency_ms', 'success_rate', 'last_success_at')
+    search_fields = ('config__title',)
+    readonly_fields = ('recent', 'updated_at')
+
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'has_v2ray_access', 'is_v2ray_admin', 'created_at')
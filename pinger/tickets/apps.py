@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TicketsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tickets'
+
+    def ready(self):
+        # Connect the token cache invalidation, daily events, revision and file blob signals
+        from . import authentication, daily_events, files, revisions  # noqa: F401
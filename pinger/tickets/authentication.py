@@ -0,0 +1,182 @@
+"""
+Token authentication shared by the tickets API.
+
+Tokens are resolved together with their user in a single query and kept in a
+small in-process LRU cache with a TTL. An optional Django cache backend can be
+layered behind it so several workers share lookups. The cache holds the user's
+field values rather than a User instance, and every lookup builds a fresh
+User from them, so nothing a request caches on its user (such as the profile)
+leaks into other requests. Entries are dropped when a token is rotated or
+deleted and whenever its user or the user's profile is saved (e.g.
+deactivated, or V2Ray admin rights revoked).
+
+Settings (all optional):
+
+    TOKEN_AUTH_CACHE = {
+        'MAX_SIZE': 1024,      # entries kept in each process
+        'TTL': 300,            # seconds before a cached lookup is re-checked
+        'CACHE_ALIAS': None,   # name of a CACHES entry to share lookups
+    }
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Token, UserProfile
+
+TOKEN_PREFIX = 'Token '
+SHARED_CACHE_PREFIX = 'tickets:token:'
+PROFILE_ACCESS_FIELDS = {'is_v2ray_admin', 'has_v2ray_access'}
+
+
+def _cache_settings():
+    options = {'MAX_SIZE': 1024, 'TTL': 300, 'CACHE_ALIAS': None}
+    options.update(getattr(settings, 'TOKEN_AUTH_CACHE', {}))
+    return options
+
+
+class TokenCache:
+    """Thread-safe LRU cache of token key -> user field values with a per-entry TTL"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def set(self, key, user):
+        with self._lock:
+            self._entries[key] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_options = _cache_settings()
+token_cache = TokenCache(_options['MAX_SIZE'], _options['TTL'])
+
+
+def _shared_cache():
+    alias = _cache_settings()['CACHE_ALIAS']
+    return caches[alias] if alias else None
+
+
+def get_token_key(request):
+    """Return the key from an 'Authorization: Token <key>' header, if any"""
+    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+    if not auth_header.startswith(TOKEN_PREFIX):
+        return None
+    return auth_header[len(TOKEN_PREFIX):].strip() or None
+
+
+def _user_fields(user):
+    return tuple(getattr(user, field.attname) for field in user._meta.concrete_fields)
+
+
+def _build_user(fields):
+    User = get_user_model()
+    return User.from_db(Token.objects.db, [field.attname for field in User._meta.concrete_fields], fields)
+
+
+def authenticate_token(key):
+    """
+    Return the active user owning the token, or None.
+    Checks the local cache, then the shared cache, then the database.
+    Each call returns a new User instance.
+    """
+    fields = token_cache.get(key)
+    if fields is not None:
+        return _build_user(fields)
+
+    shared = _shared_cache()
+    if shared is not None:
+        fields = shared.get(SHARED_CACHE_PREFIX + key)
+
+    if fields is None:
+        try:
+            user = Token.objects.select_related('user').get(key=key).user
+        except Token.DoesNotExist:
+            return None
+        fields = _user_fields(user)
+        if shared is not None:
+            shared.set(SHARED_CACHE_PREFIX + key, fields, _cache_settings()['TTL'])
+
+    user = _build_user(fields)
+    if not user.is_active:
+        return None
+
+    token_cache.set(key, fields)
+    return user
+
+
+def invalidate_token(key):
+    """Forget a cached token lookup in this process and the shared cache"""
+    if not key:
+        return
+    token_cache.delete(key)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.delete(SHARED_CACHE_PREFIX + key)
+
+
+@receiver(pre_save, sender=Token)
+def remember_previous_token_key(sender, instance, **kwargs):
+    # Rotating a key changes it in place, so look up the old one before saving
+    if instance.pk:
+        instance._previous_key = Token.objects.filter(pk=instance.pk).values_list('key', flat=True).first()
+
+
+@receiver(post_save, sender=Token)
+def invalidate_rotated_token(sender, instance, **kwargs):
+    invalidate_token(getattr(instance, '_previous_key', None))
+    invalidate_token(instance.key)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+def _invalidate_tokens_of(user_id):
+    for key in Token.objects.filter(user_id=user_id).values_list('key', flat=True):
+        invalidate_token(key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    # Covers deactivation as well as any other change to the cached user
+    _invalidate_tokens_of(instance.pk)
+
+
+@receiver(post_save, sender=UserProfile)
+def invalidate_profile_tokens(sender, instance, update_fields=None, **kwargs):
+    # The daily events snapshot saves the profile on every task change; only
+    # saves that may touch access rights matter here
+    if update_fields is None or not update_fields.isdisjoint(PROFILE_ACCESS_FIELDS):
+        _invalidate_tokens_of(instance.user_id)
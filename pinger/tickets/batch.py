@@ -0,0 +1,209 @@
+"""
+Batched create/update/delete of tasks, checklist items and daily goals.
+
+A batch is validated as a whole first; if any operation is invalid nothing is
+written and the per-operation errors are returned. Otherwise all writes run in
+one transaction using bulk_create/bulk_update and a single delete per model,
+and side effects (collection revisions, the daily events snapshot) are
+applied once for the batch, inside the transaction, instead of once per item.
+"""
+import re
+from datetime import datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from .daily_events import batched_task_events
+from .models import ChecklistItem, DailyGoal, Task
+from .revisions import bump_revision
+from .serialization import checklist_item_data, daily_goal_data, task_data
+
+BATCH_MAX_OPERATIONS = 500
+
+
+class BatchError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _parse_datetime(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def _target_time(data):
+    # Same fallback as the daily goal endpoints: read it out of the notes
+    target_time = data.get('targetTime')
+    if not target_time and data.get('notes'):
+        time_match = re.search(r'Target time: (\d+) minutes', data['notes'])
+        if time_match:
+            target_time = int(time_match.group(1))
+    return target_time
+
+
+def _apply_task(task, data, creating):
+    if creating:
+        if not data.get('title') or not data.get('startDate') or not data.get('endDate'):
+            raise BatchError('title, startDate and endDate are required')
+    if 'title' in data:
+        task.title = data['title']
+    if 'description' in data:
+        task.description = data['description'] or None
+    if 'startDate' in data:
+        task.start_date = _parse_datetime(data['startDate'])
+    if 'endDate' in data:
+        task.end_date = _parse_datetime(data['endDate'])
+    if 'color' in data:
+        task.color = data['color']
+    if 'isImportant' in data:
+        task.is_important = bool(data['isImportant'])
+
+
+def _apply_checklist_item(item, data, creating):
+    if 'text' in data:
+        item.text = data['text']
+    if 'completed' in data:
+        item.completed = bool(data['completed'])
+
+
+def _apply_daily_goal(goal, data, creating):
+    if creating:
+        if not str(data.get('text', '')).strip():
+            raise BatchError('Text field is required')
+        if not data.get('date'):
+            raise BatchError('Date field is required')
+    if 'text' in data:
+        goal.text = data['text'].strip()
+    if 'date' in data:
+        try:
+            goal.date = datetime.strptime(data['date'], '%Y-%m-%d').date()
+        except ValueError:
+            raise BatchError('Invalid date format. Expected YYYY-MM-DD')
+    if 'completed' in data:
+        goal.completed = bool(data['completed'])
+    if data.get('priority') in dict(DailyGoal.PRIORITY_CHOICES):
+        goal.priority = data['priority']
+    if data.get('category'):
+        goal.category = data['category']
+    if data.get('color') in dict(DailyGoal.COLOR_CHOICES):
+        goal.color = data['color']
+    if 'notes' in data:
+        goal.notes = data['notes'] or ''
+    target_time = _target_time(data)
+    if target_time is not None:
+        goal.target_time = target_time
+
+
+# type -> (model, apply fields, serialize, fields written by bulk_update, revision collection)
+BATCH_TYPES = {
+    'task': (Task, _apply_task, task_data,
+             ['title', 'description', 'start_date', 'end_date', 'color', 'is_important'], 'tasks'),
+    'checklist': (ChecklistItem, _apply_checklist_item, checklist_item_data,
+                  ['text', 'completed'], 'checklist'),
+    'daily_goal': (DailyGoal, _apply_daily_goal, daily_goal_data,
+                   ['text', 'completed', 'date', 'priority', 'category', 'color', 'notes', 'target_time'],
+                   'daily_goals'),
+}
+
+
+def apply_batch(user, operations):
+    """
+    Apply an ordered list of operations for the user.
+
+    Each operation is {"op": "create"|"update"|"delete", "type": "task"|
+    "checklist"|"daily_goal", "id": <for update/delete>, "data": {...}}.
+    Returns (results, applied); results has one entry per operation.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise BatchError('operations must be a non-empty list')
+    if len(operations) > BATCH_MAX_OPERATIONS:
+        raise BatchError(f'A batch may contain at most {BATCH_MAX_OPERATIONS} operations')
+
+    # Load every object referenced by an update or delete up front
+    wanted = {kind: set() for kind in BATCH_TYPES}
+    for operation in operations:
+        if isinstance(operation, dict) and operation.get('op') in ('update', 'delete') \
+                and operation.get('type') in BATCH_TYPES and isinstance(operation.get('id'), int):
+            wanted[operation['type']].add(operation['id'])
+    existing = {
+        kind: BATCH_TYPES[kind][0].objects.filter(user=user, id__in=ids).in_bulk() if ids else {}
+        for kind, ids in wanted.items()
+    }
+
+    creates = {kind: [] for kind in BATCH_TYPES}
+    updates = {kind: {} for kind in BATCH_TYPES}
+    deletes = {kind: set() for kind in BATCH_TYPES}
+    pending = []
+    failed = False
+
+    for operation in operations:
+        try:
+            if not isinstance(operation, dict):
+                raise BatchError('Each operation must be an object')
+            kind = operation.get('type')
+            if kind not in BATCH_TYPES:
+                raise BatchError(f'Unknown type: {kind}')
+            model, apply_fields = BATCH_TYPES[kind][:2]
+            action = operation.get('op')
+            data = operation.get('data') or {}
+            if not isinstance(data, dict):
+                raise BatchError('data must be an object')
+
+            if action == 'create':
+                obj = model(user=user)
+                apply_fields(obj, data, creating=True)
+                creates[kind].append(obj)
+                pending.append((action, kind, obj))
+            elif action in ('update', 'delete'):
+                obj_id = operation.get('id')
+                obj = existing[kind].get(obj_id)
+                if obj is None or obj_id in deletes[kind]:
+                    raise BatchError('Not found', status=404)
+                if action == 'update':
+                    apply_fields(obj, data, creating=False)
+                    updates[kind][obj_id] = obj
+                else:
+                    deletes[kind].add(obj_id)
+                    updates[kind].pop(obj_id, None)
+                pending.append((action, kind, obj))
+            else:
+                raise BatchError(f'Unknown op: {action}')
+        except BatchError as e:
+            failed = True
+            pending.append(e)
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            failed = True
+            pending.append(BatchError(str(e)))
+
+    if failed:
+        results = []
+        for entry in pending:
+            if isinstance(entry, BatchError):
+                results.append({'status': entry.status, 'error': str(entry)})
+            else:
+                results.append({'status': 424, 'error': 'Not applied'})
+        return results, False
+
+    now = timezone.now()
+    # Deleted tasks are recorded by the post_delete signal, bulk writes are not
+    with transaction.atomic(), batched_task_events(user.pk) as task_changes:
+        for kind, (model, _, _, update_fields, collection) in BATCH_TYPES.items():
+            if creates[kind]:
+                model.objects.bulk_create(creates[kind])
+            if updates[kind]:
+                for obj in updates[kind].values():
+                    obj.updated_at = now
+                model.objects.bulk_update(list(updates[kind].values()), update_fields + ['updated_at'])
+            if deletes[kind]:
+                model.objects.filter(user=user, id__in=deletes[kind]).delete()
+            if creates[kind] or updates[kind] or deletes[kind]:
+                bump_revision(collection, user.pk)
+        task_changes.update((task.pk, task) for task in creates['task'] + list(updates['task'].values()))
+
+    results = []
+    for action, kind, obj in pending:
+        if action == 'delete':
+            results.append({'status': 200, 'id': obj.id})
+        else:
+            results.append({'status': 201 if action == 'create' else 200, 'data': BATCH_TYPES[kind][2](obj)})
+    return results, True
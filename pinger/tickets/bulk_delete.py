@@ -0,0 +1,165 @@
+"""
+Bulk deletion of V2Ray configs and uploaded files for the admin tools.
+
+A selection is an ID list and/or filters, combined with AND; an empty
+selection is rejected rather than meaning "everything", and so are unknown
+keys, since a misspelled filter would widen the selection. Matching rows and
+the rows that cascade from them (CASCADES: extracted configs, probe results,
+latency stats) are removed with one DELETE per table and DELETE_CHUNK ids,
+without loading instances or sending per-row signals, and each collection
+revision is bumped once. Stored file blobs are released after commit by the
+background worker in tickets/files.py.
+"""
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .files import release_blobs_in_background
+from .models import ConfigFile, ConfigLatencyStats, ConfigProbeResult, V2RayConfig
+from .revisions import bump_revision
+
+BULK_MAX_IDS = 5000
+CONFIG_CRITERIA = ('ids', 'status', 'older_than', 'max_success_rate', 'source_file')
+FILE_CRITERIA = ('ids', 'older_than')
+# Stay below SQLite's limit on bound parameters
+DELETE_CHUNK = 500
+# model -> (related model, foreign key) pairs deleted before the model's rows;
+# must list every relation to the model (checked by the tests)
+CASCADES = {
+    ConfigFile: [(V2RayConfig, 'source_file')],
+    V2RayConfig: [(ConfigProbeResult, 'config'), (ConfigLatencyStats, 'config')],
+}
+
+
+class BulkDeleteError(Exception):
+    pass
+
+
+def _check_keys(data, allowed):
+    if not isinstance(data, dict):
+        raise BulkDeleteError('Expected a JSON object')
+    unknown = sorted(set(data) - set(allowed))
+    if unknown:
+        raise BulkDeleteError(f'Unknown field: {unknown[0]}')
+    if not data:
+        raise BulkDeleteError('Give ids or at least one filter')
+
+
+def _parse_ids(value):
+    if not isinstance(value, list) or not value:
+        raise BulkDeleteError('ids must be a non-empty list')
+    if len(value) > BULK_MAX_IDS:
+        raise BulkDeleteError(f'At most {BULK_MAX_IDS} ids can be deleted at once')
+    if not all(isinstance(i, int) and not isinstance(i, bool) for i in value):
+        raise BulkDeleteError('ids must be integers')
+    return value
+
+
+def _parse_older_than(value):
+    try:
+        older_than = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        raise BulkDeleteError('older_than must be an ISO 8601 timestamp')
+    if timezone.is_naive(older_than):
+        older_than = timezone.make_aware(older_than, dt_timezone.utc)
+    return older_than
+
+
+def select_configs(data):
+    """
+    V2RayConfig queryset for {"ids": [...], "status": "on"|"off",
+    "older_than": ISO 8601, "max_success_rate": 0-1, "source_file": id|null}.
+    max_success_rate matches configs testers reported on (tickets/probes.py);
+    source_file null means the manually managed configs.
+    """
+    _check_keys(data, CONFIG_CRITERIA)
+    configs = V2RayConfig.objects.all()
+    if 'ids' in data:
+        configs = configs.filter(id__in=_parse_ids(data['ids']))
+    if 'status' in data:
+        if data['status'] not in ('on', 'off'):
+            raise BulkDeleteError('status must be either "on" or "off"')
+        configs = configs.filter(status=data['status'])
+    if 'older_than' in data:
+        configs = configs.filter(created_at__lt=_parse_older_than(data['older_than']))
+    if 'max_success_rate' in data:
+        rate = data['max_success_rate']
+        if not isinstance(rate, (int, float)) or isinstance(rate, bool) or not 0 <= rate <= 1:
+            raise BulkDeleteError('max_success_rate must be a number between 0 and 1')
+        configs = configs.filter(latency_stats__success_rate__lte=rate)
+    if 'source_file' in data:
+        source_file = data['source_file']
+        if source_file is None:
+            configs = configs.filter(source_file__isnull=True)
+        elif isinstance(source_file, int) and not isinstance(source_file, bool):
+            configs = configs.filter(source_file_id=source_file)
+        else:
+            raise BulkDeleteError('source_file must be a file id or null')
+    return configs
+
+
+def select_files(data):
+    """ConfigFile queryset for {"ids": [...], "older_than": ISO 8601}"""
+    _check_keys(data, FILE_CRITERIA)
+    files = ConfigFile.objects.all()
+    if 'ids' in data:
+        files = files.filter(id__in=_parse_ids(data['ids']))
+    if 'older_than' in data:
+        files = files.filter(uploaded_at__lt=_parse_older_than(data['older_than']))
+    return files
+
+
+def _delete_where(model, column, values):
+    quote = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(values))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(model._meta.db_table)} WHERE {quote(column)} IN ({placeholders})', values
+        )
+        return cursor.rowcount
+
+
+def _delete_rows(model, pks, deleted):
+    """Delete model rows by primary key, cascading first; counts go to deleted[label]"""
+    for i in range(0, len(pks), DELETE_CHUNK):
+        chunk = pks[i:i + DELETE_CHUNK]
+        for related, field in CASCADES.get(model, ()):
+            if related in CASCADES:
+                related_pks = related._base_manager.filter(**{f'{field}__in': chunk}).values_list('pk', flat=True)
+                _delete_rows(related, list(related_pks), deleted)
+            else:
+                column = related._meta.get_field(field).column
+                deleted[related._meta.label] += _delete_where(related, column, chunk)
+        deleted[model._meta.label] += _delete_where(model, model._meta.pk.column, chunk)
+
+
+def delete_configs(configs):
+    """Delete a select_configs() queryset; returns the number of configs deleted"""
+    deleted = Counter()
+    with transaction.atomic():
+        _delete_rows(V2RayConfig, list(configs.values_list('pk', flat=True)), deleted)
+        if deleted[V2RayConfig._meta.label]:
+            bump_revision('configs')
+    return deleted[V2RayConfig._meta.label]
+
+
+def delete_files(files):
+    """
+    Delete a select_files() queryset and the configs extracted from the
+    files; returns (files deleted, configs deleted). Blobs no file refers to
+    any more are deleted in the background after commit.
+    """
+    deleted = Counter()
+    with transaction.atomic():
+        selected = list(files.values_list('pk', 'file'))
+        _delete_rows(ConfigFile, [pk for pk, _ in selected], deleted)
+        if deleted[V2RayConfig._meta.label]:
+            bump_revision('configs')
+        if deleted[ConfigFile._meta.label]:
+            bump_revision('files')
+            storage = ConfigFile._meta.get_field('file').storage
+            names = sorted({name for _, name in selected if name})
+            transaction.on_commit(lambda: release_blobs_in_background(storage, names))
+    return deleted[ConfigFile._meta.label], deleted[V2RayConfig._meta.label]
@@ -0,0 +1,249 @@
+"""
+Single-pass extraction of V2Ray configs from subscription dumps.
+
+ConfigScanner is fed text chunks and yields configs as soon as they are
+complete, so a multi-megabyte file is parsed in linear time while holding at
+most one pending JSON object (bounded by max_json_chars) in memory:
+
+- JSON objects are located by a string-aware brace scan that resumes where
+  the previous chunk stopped, then decoded once with JSONDecoder.raw_decode.
+  Objects with "inbounds" or "outbounds" are configs at any nesting depth.
+- vmess:// (base64 JSON), vless://, trojan:// and ss:// links are read up
+  to the next whitespace; vmess links are kept only if they decode to a JSON
+  object. Links inside JSON strings (e.g. a Telegram chat export) are found
+  as well.
+
+The server extracts uploaded files with this same grammar:
+pinger/tickets/config_scanner.py and app.v.2/config_scanner.py are
+identical copies, which the server's tests check. Edit both together.
+"""
+
+import base64
+import binascii
+import codecs
+import json
+import re
+
+MAX_JSON_CHARS = 1024 * 1024
+SCHEMES = ("vmess://", "vless://", "trojan://", "ss://")
+
+_SCHEME_PATTERN = r"(?<![A-Za-z0-9])(?:%s)" % "|".join(map(re.escape, SCHEMES))
+# Next interesting token: an object start or a link scheme
+TOKEN_RE = re.compile(r"\{|" + _SCHEME_PATTERN)
+LINK_RE = re.compile(_SCHEME_PATTERN)
+JSON_TOKEN_RE = re.compile(r'[{}"\\]')
+# Standard or URL-safe base64
+VMESS_BODY_RE = re.compile(r"[A-Za-z0-9+/=_-]*")
+LINK_BODY_RE = re.compile(r"\S*")
+# Enough to hold the longest scheme split across two chunks plus the character before it
+SCHEME_TAIL = max(len(s) for s in SCHEMES) + 1
+
+TITLES = {
+    "json": "V2Ray Config",
+    "vmess": "Vmess Config",
+    "vless": "Vless Config",
+    "trojan": "Trojan Config",
+    "ss": "Shadowsocks Config",
+}
+
+
+def is_v2ray_json(obj):
+    return isinstance(obj, dict) and ("inbounds" in obj or "outbounds" in obj)
+
+
+def walk_json(obj):
+    """Yield every V2Ray config dict and every other string inside a decoded JSON value"""
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        if is_v2ray_json(value) or isinstance(value, str):
+            yield value
+        elif isinstance(value, dict):
+            stack.extend(reversed(list(value.values())))
+        elif isinstance(value, list):
+            stack.extend(reversed(value))
+
+
+def decode_vmess(url):
+    """The JSON object a vmess link carries, or None if it does not decode to one"""
+    encoded = url[len("vmess://") :].replace("+", "-").replace("/", "_")
+    try:
+        config = json.loads(
+            base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)).decode(
+                "utf-8"
+            )
+        )
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    return config if isinstance(config, dict) else None
+
+
+def link_end(text, match):
+    """End offset of the link whose scheme was matched"""
+    body_re = VMESS_BODY_RE if match.group().startswith("vmess") else LINK_BODY_RE
+    return body_re.match(text, match.end()).end()
+
+
+class ConfigScanner:
+    def __init__(self, max_json_chars=MAX_JSON_CHARS):
+        self.max_json_chars = max_json_chars
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        # buffer[0] was already scanned and is kept only as lookbehind context
+        self.context = False
+        self.counts = dict.fromkeys(TITLES, 0)
+        # (object start, scan position, depth, in_string) of an unfinished JSON object
+        self.pending = None
+        # Braces before this offset belong to an abandoned object and are not retried
+        self.brace_floor = 0
+
+    def feed(self, text):
+        """Add a chunk of text and yield the configs completed by it"""
+        self.buffer += text
+        yield from self._scan(final=False)
+
+    def close(self):
+        """Yield whatever can still be parsed at end of input"""
+        yield from self._scan(final=True)
+        self.buffer = ""
+        self.context = False
+        self.pending = None
+        self.brace_floor = 0
+
+    def _config(self, kind, text):
+        self.counts[kind] += 1
+        return {"title": f"{TITLES[kind]} {self.counts[kind]}", "text": text}
+
+    def _link(self, match, url):
+        scheme = match.group()[:-3]
+        if len(url) > len(match.group()) and (
+            scheme != "vmess" or decode_vmess(url) is not None
+        ):
+            return self._config(scheme, url)
+        return None
+
+    def _links_in(self, text):
+        for match in LINK_RE.finditer(text):
+            config = self._link(match, text[match.start() : link_end(text, match)])
+            if config:
+                yield config
+
+    def _match_braces(self):
+        """Advance the pending brace scan; return the end offset or None"""
+        start, pos, depth, in_string = self.pending
+        buf = self.buffer
+        while True:
+            match = JSON_TOKEN_RE.search(buf, pos)
+            if not match:
+                self.pending = (start, len(buf), depth, in_string)
+                return None
+            char, pos = match.group(), match.end()
+            if in_string:
+                if char == "\\":
+                    if pos == len(buf):
+                        # The escaped character is in the next chunk
+                        self.pending = (start, match.start(), depth, in_string)
+                        return None
+                    pos += 1
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == "{":
+                depth += 1
+            elif char == "}":
+                depth -= 1
+                if depth == 0:
+                    return pos
+
+    def _scan(self, final):
+        buf = self.buffer
+        pos = 1 if self.context else 0
+        while True:
+            if self.pending is None:
+                match = TOKEN_RE.search(buf, pos)
+                if not match:
+                    if final:
+                        self.buffer = ""
+                        return
+                    # Keep a possibly partial scheme and the character before it
+                    keep = max(pos - 1, len(buf) - SCHEME_TAIL, 0)
+                    self.buffer = buf[keep:]
+                    self.brace_floor = max(self.brace_floor - keep, 0)
+                    self.context = self.context or keep > 0
+                    return
+                start = match.start()
+                if match.group() == "{" and start < self.brace_floor:
+                    pos = match.end()
+                    continue
+                if match.group() != "{":
+                    end = link_end(buf, match)
+                    if end == len(buf) and not final:
+                        # The link may continue in the next chunk
+                        self.buffer = buf[start:]
+                        self.brace_floor = max(self.brace_floor - start, 0)
+                        self.context = False
+                        return
+                    config = self._link(match, buf[start:end])
+                    if config:
+                        yield config
+                    pos = end
+                    continue
+                self.pending = (start, start, 0, False)
+
+            end = self._match_braces()
+            start = self.pending[0]
+            if end is None:
+                if not final and len(buf) - start <= self.max_json_chars:
+                    # Keep only the pending object, with the scan state rebased onto it
+                    _, scan_pos, depth, in_string = self.pending
+                    self.buffer = buf[start:]
+                    self.brace_floor = max(self.brace_floor - start, 0)
+                    self.context = False
+                    self.pending = (0, scan_pos - start, depth, in_string)
+                    return
+                # Never closes: give up on braces up to where the scan got,
+                # but still look for links after this one
+                self.brace_floor = self.pending[1]
+                self.pending = None
+                pos = start + 1
+                continue
+
+            self.pending = None
+            try:
+                obj, end = self.decoder.raw_decode(buf, start)
+            except ValueError:
+                # Balanced but not JSON; objects nested inside may still be
+                pos = start + 1
+                continue
+            for value in walk_json(obj):
+                if isinstance(value, str):
+                    yield from self._links_in(value)
+                else:
+                    yield self._config("json", json.dumps(value, indent=2))
+            pos = end
+
+
+def iter_configs(chunks, max_json_chars=MAX_JSON_CHARS):
+    """Yield {"title", "text"} for each config found in an iterable of text chunks"""
+    scanner = ConfigScanner(max_json_chars)
+    for chunk in chunks:
+        yield from scanner.feed(chunk)
+    yield from scanner.close()
+
+
+def decode_chunks(byte_chunks, encoding="utf-8"):
+    """Decode an iterable of byte chunks (e.g. Response.iter_content()) to text"""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    for chunk in byte_chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+def extract_configs(text):
+    """List the configs in a complete text"""
+    return list(iter_configs([text]))
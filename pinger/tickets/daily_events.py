@@ -0,0 +1,167 @@
+"""
+Incremental snapshot of a user's calendar events.
+
+Each task has a DailyEvent row holding its serialized entry, which is written
+or deleted from Task's post_save/post_delete signals, so a task change costs
+one row write however many tasks the user has, whichever way the task was
+saved (API, admin, shell). The document served by the daily events API is
+joined from those rows on the first read after a change and cached in
+UserProfile.daily_events_json until the next one.
+
+bulk_create()/bulk_update() send no signals; code using them (tickets/batch.py)
+wraps its writes in batched_task_events() and records the tasks it wrote, and
+the whole block is applied to the snapshot in one go when it ends.
+
+Each change bumps UserProfile.daily_events_version; daily_events_synced_version
+records the version the DailyEvent rows reflect, so a mismatch means the rows
+are stale (a patch failed) and they are rebuilt from the Task rows the next
+time the snapshot is read.
+"""
+import json
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models import F, QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import DailyEvent, Task, UserProfile
+from .serialization import TASK_COLUMNS, dumps, task_event_row
+
+logger = logging.getLogger(__name__)
+
+ID = TASK_COLUMNS.index('id')
+START_DATE = TASK_COLUMNS.index('start_date')
+
+# task id -> Task to upsert, or None to remove; set inside batched_task_events()
+_batched_changes = ContextVar('batched_task_events', default=None)
+
+
+def _dumps(events):
+    return dumps(events).decode()
+
+
+def _rows_fresh(profile):
+    return profile.daily_events_synced_version == profile.daily_events_version
+
+
+def rebuild_daily_events(user):
+    """
+    Rebuild the DailyEvent rows and the document from the user's tasks.
+    Only needed when the rows are stale.
+    """
+    with transaction.atomic():
+        profile, created = UserProfile.objects.select_for_update().get_or_create(user=user)
+        events = []
+        rows = []
+        for row in Task.objects.filter(user=user).order_by('start_date', 'id').values_list(*TASK_COLUMNS):
+            event = task_event_row(row)
+            events.append(event)
+            rows.append(DailyEvent(task_id=event['id'], user=user, start_date=row[START_DATE], data=_dumps(event)))
+        DailyEvent.objects.filter(user=user).delete()
+        DailyEvent.objects.bulk_create(rows, batch_size=500)
+        profile.daily_events_json = _dumps(events)
+        profile.daily_events_synced_version = profile.daily_events_version
+        profile.save(update_fields=['daily_events_json', 'daily_events_synced_version'])
+    return events
+
+
+def apply_task_changes(user_id, changes):
+    """
+    Patch {task id: Task or None (deleted)} into the user's snapshot and
+    advance its version once
+    """
+    try:
+        with transaction.atomic():
+            if any(task is not None for task in changes.values()):
+                profile, created = UserProfile.objects.select_for_update().get_or_create(user_id=user_id)
+            else:
+                # Deleting tasks never creates a profile (the user may be going too)
+                profile = UserProfile.objects.select_for_update().filter(user_id=user_id).first()
+                if profile is None:
+                    return
+            fresh = _rows_fresh(profile)
+            profile.daily_events_version += 1
+            update_fields = ['daily_events_version']
+
+            # Stale rows are left alone; the next read rebuilds them
+            if fresh:
+                removed = [task_id for task_id, task in changes.items() if task is None]
+                if removed:
+                    DailyEvent.objects.filter(task_id__in=removed).delete()
+                # Read back rather than serialized from the instances, whose
+                # fields may still hold what was assigned (e.g. date strings)
+                saved = [task_id for task_id, task in changes.items() if task is not None]
+                rows = [
+                    DailyEvent(task_id=row[ID], user_id=user_id, start_date=row[START_DATE],
+                               data=_dumps(task_event_row(row)))
+                    for row in Task.objects.filter(pk__in=saved).values_list(*TASK_COLUMNS)
+                ] if saved else []
+                DailyEvent.objects.bulk_create(rows, batch_size=500, update_conflicts=True,
+                                               unique_fields=['task'], update_fields=['user', 'start_date', 'data'])
+                profile.daily_events_json = None
+                profile.daily_events_synced_version = profile.daily_events_version
+                update_fields += ['daily_events_json', 'daily_events_synced_version']
+
+            profile.save(update_fields=update_fields)
+    except Exception:
+        # Don't fail the write, but make sure the snapshot is seen as stale
+        logger.exception("Error updating daily events snapshot for user %s", user_id)
+        UserProfile.objects.filter(user_id=user_id).update(daily_events_version=F('daily_events_version') + 1)
+
+
+@contextmanager
+def batched_task_events(user_id):
+    """
+    Collect the user's task changes made in the block and apply them once when
+    it exits without an error. Yields the {task id: Task or None} dict;
+    callers add tasks written without signals (bulk_create/bulk_update).
+    """
+    changes = {}
+    token = _batched_changes.set(changes)
+    try:
+        yield changes
+    finally:
+        _batched_changes.reset(token)
+    if changes:
+        apply_task_changes(user_id, changes)
+
+
+def _record(user_id, task_id, task):
+    changes = _batched_changes.get()
+    if changes is not None:
+        changes[task_id] = task
+    else:
+        apply_task_changes(user_id, {task_id: task})
+
+
+@receiver(post_save, sender=Task)
+def upsert_task_event(sender, instance, raw=False, **kwargs):
+    """Insert or replace a saved task's entry in its owner's snapshot"""
+    if not raw:
+        _record(instance.user_id, instance.pk, instance)
+
+
+@receiver(post_delete, sender=Task)
+def remove_task_event(sender, instance, origin=None, **kwargs):
+    """Drop a deleted task from its owner's snapshot"""
+    # Tasks removed along with their user (or anything else) leave no snapshot to patch
+    if isinstance(origin, Task) or (isinstance(origin, QuerySet) and origin.model is Task):
+        _record(instance.user_id, instance.pk, None)
+
+
+def get_daily_events(user):
+    """Return the user's events, rebuilding the snapshot only when it is stale"""
+    profile, created = UserProfile.objects.get_or_create(user=user)
+    if not _rows_fresh(profile):
+        return rebuild_daily_events(user)
+    if not profile.daily_events_json:
+        data = DailyEvent.objects.filter(user=user).order_by('start_date', 'task_id').values_list('data', flat=True)
+        profile.daily_events_json = '[' + ','.join(data) + ']'
+        # Skipped if a task changed meanwhile; that change cleared the document
+        UserProfile.objects.filter(
+            pk=profile.pk, daily_events_version=profile.daily_events_version
+        ).update(daily_events_json=profile.daily_events_json)
+    return json.loads(profile.daily_events_json)
@@ -0,0 +1,152 @@
+"""
+Config file downloads.
+
+Files are streamed in blocks rather than loaded into memory. Responses carry
+an ETag derived from the stored sha256 plus Last-Modified, so polling clients
+get 304 and resuming clients can send Range/If-Range and get 206.
+
+Settings (all optional):
+
+    FILE_DOWNLOADS = {
+        'SENDFILE': None,                  # None, 'x-accel-redirect' or 'x-sendfile'
+        'ACCEL_REDIRECT_PREFIX': '/protected-media/',  # internal nginx location for MEDIA_ROOT
+        'BLOCK_SIZE': 64 * 1024,
+    }
+
+With SENDFILE set, the response only carries headers and the front proxy
+serves the bytes (including ranges) itself.
+"""
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def download_options():
+    options = {
+        'SENDFILE': None,
+        'ACCEL_REDIRECT_PREFIX': '/protected-media/',
+        'BLOCK_SIZE': 64 * 1024,
+    }
+    options.update(getattr(settings, 'FILE_DOWNLOADS', {}))
+    return options
+
+
+def file_etag(config_file):
+    return f'"{config_file.sha256}"' if config_file.sha256 else None
+
+
+def parse_range(header, size):
+    """
+    Return (start, end) inclusive for a single byte range, None when the
+    header should be ignored, or False when it is unsatisfiable.
+    Multiple ranges are not supported and fall back to the full body.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes; an empty file has none
+        length = int(last)
+        if length == 0 or size == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        # Syntactically invalid (RFC 9110 14.1.1), so the header is ignored
+        return None
+    if start >= size:
+        return False
+    end = min(int(last), size - 1) if last else size - 1
+    return start, end
+
+
+def _if_range_matches(request, etag, last_modified):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        # Weak validators never match for ranges
+        return etag is not None and if_range == etag
+    return last_modified is not None and parse_http_date_safe(if_range) == last_modified
+
+
+def _iter_range(fileobj, start, length, block_size):
+    try:
+        fileobj.seek(start)
+        while length > 0:
+            chunk = fileobj.read(min(block_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+def config_file_response(request, config_file):
+    options = download_options()
+    etag = file_etag(config_file)
+    last_modified = int(config_file.uploaded_at.timestamp())
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _file_response(request, config_file, options, etag, last_modified)
+
+    if etag:
+        response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def _file_response(request, config_file, options, etag, last_modified):
+    disposition = content_disposition_header(True, config_file.name)
+
+    if options['SENDFILE']:
+        response = HttpResponse(content_type='text/plain')
+        if options['SENDFILE'] == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = options['ACCEL_REDIRECT_PREFIX'].rstrip('/') + '/' + config_file.file.name
+        else:
+            response['X-Sendfile'] = config_file.file.path
+        response['Content-Disposition'] = disposition
+        return response
+
+    size = config_file.size_bytes
+    if size is None:
+        size = config_file.file.size
+
+    byte_range = None
+    if 'HTTP_RANGE' in request.META and _if_range_matches(request, etag, last_modified):
+        byte_range = parse_range(request.META['HTTP_RANGE'], size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+    elif byte_range:
+        start, end = byte_range
+        fileobj = config_file.file.storage.open(config_file.file.name, 'rb')
+        response = StreamingHttpResponse(
+            _iter_range(fileobj, start, end - start + 1, options['BLOCK_SIZE']),
+            status=206,
+            content_type='text/plain'
+        )
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Disposition'] = disposition
+    else:
+        response = FileResponse(
+            config_file.file.storage.open(config_file.file.name, 'rb'),
+            as_attachment=True,
+            filename=config_file.name,
+            content_type='text/plain'
+        )
+        response.block_size = options['BLOCK_SIZE']
+    response['Accept-Ranges'] = 'bytes'
+    return response
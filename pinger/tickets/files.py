@@ -0,0 +1,107 @@
+"""
+Uploaded config file metadata.
+
+size_bytes, sha256 and line_count are computed in one streaming pass over the
+upload and stored on ConfigFile, so listings never have to stat or read the
+media storage. Rows saved before these fields existed are filled in by the
+backfill_config_file_metadata management command.
+
+The checksum also names the stored blob (tickets/storage.py), so repeat
+uploads share one file. A blob's reference count is the number of ConfigFile
+rows pointing at it; it is deleted once that reaches zero. Saves and releases
+are serialized by the storage's blob_lock() so a release never deletes a blob
+an identical upload has just skipped writing. Bulk deletes hand their blobs to
+a single background worker instead of releasing them in the request.
+"""
+import hashlib
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection, transaction
+from django.db.models.signals import post_delete
+
+from .ingestion import ingest_uploaded_file
+from .models import ConfigFile
+
+logger = logging.getLogger(__name__)
+
+FileStats = namedtuple('FileStats', ['size_bytes', 'sha256', 'line_count'])
+# Not a daemon: queued releases still run when the process exits
+blob_releaser = ThreadPoolExecutor(max_workers=1, thread_name_prefix='release-blobs')
+
+
+def scan_file(fileobj):
+    """Return FileStats for a Django File/UploadedFile, reading it once in chunks"""
+    digest = hashlib.sha256()
+    size = 0
+    lines = 0
+    last = b''
+    fileobj.seek(0)
+    for chunk in fileobj.chunks():
+        digest.update(chunk)
+        size += len(chunk)
+        lines += chunk.count(b'\n')
+        last = chunk[-1:] or last
+    fileobj.seek(0)
+    if last and last != b'\n':
+        # Final line without a trailing newline
+        lines += 1
+    return FileStats(size, digest.hexdigest(), lines)
+
+
+def create_config_file(uploaded_file, user):
+    """
+    Save an upload as a ConfigFile with its metadata filled in and extract its
+    configs. Must not be called inside a transaction: the row has to be
+    committed before the blob lock is let go.
+    """
+    stats = scan_file(uploaded_file)
+    config_file = ConfigFile(
+        name=uploaded_file.name,
+        file=uploaded_file,
+        uploaded_by=user,
+        **stats._asdict()
+    )
+    with config_file.file.storage.blob_lock(), transaction.atomic():
+        config_file.save()
+    ingest_uploaded_file(config_file)
+    return config_file
+
+
+def blob_refcount(name):
+    return ConfigFile.objects.filter(file=name).count()
+
+
+def release_blob(storage, name):
+    """Delete a stored file once no ConfigFile references it"""
+    if not name:
+        return
+    with storage.blob_lock():
+        if not blob_refcount(name):
+            storage.delete(name)
+
+
+def _release_blobs(storage, names):
+    try:
+        for name in names:
+            release_blob(storage, name)
+    except Exception:
+        logger.exception("Error releasing config file blobs")
+    finally:
+        # The worker's own connection would otherwise stay open
+        connection.close()
+
+
+def release_blobs_in_background(storage, names):
+    """Queue release_blob() for each name on the worker; call after commit"""
+    return blob_releaser.submit(_release_blobs, storage, list(names))
+
+
+def _release_blob_for_instance(sender, instance, **kwargs):
+    name, storage = instance.file.name, instance.file.storage
+    # Re-counted after commit, so a rolled-back delete or a concurrent identical upload keeps the blob
+    transaction.on_commit(lambda: release_blob(storage, name))
+
+
+post_delete.connect(_release_blob_for_instance, sender=ConfigFile, dispatch_uid='config_file_release_blob')
@@ -0,0 +1,139 @@
+"""
+Server-side extraction of V2Ray configs from uploaded files.
+
+An uploaded file is streamed once, at upload time, through config_scanner,
+the same single-pass scanner the desktop clients use, so both agree on what
+a file contains: vmess://, vless://, trojan:// and ss:// links and JSON
+configs (objects with inbounds/outbounds, at any nesting depth). Configs are
+deduplicated by a canonical key, within the file and against every config
+already stored (so uploading the same dump twice adds nothing), then
+bulk-inserted as V2RayConfig rows linked to the source ConfigFile. Clients read them with
+GET /tickets/api/config/?source_file=<id> instead of downloading and parsing
+the file themselves.
+
+Files uploaded before this existed are ingested by the ingest_config_files
+management command.
+"""
+import hashlib
+import json
+import logging
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit, urlunsplit
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import config_scanner
+from .models import ConfigFile, V2RayConfig
+from .revisions import bump_revision
+
+logger = logging.getLogger(__name__)
+
+INGEST_BATCH_SIZE = 500
+TITLE_MAX_LENGTH = V2RayConfig._meta.get_field('title').max_length
+
+
+def _key(kind, value):
+    return hashlib.sha256(f'{kind}:{value}'.encode()).hexdigest()
+
+
+def _title(remark, fallback):
+    return (remark or fallback).strip()[:TITLE_MAX_LENGTH]
+
+
+def parse_vmess(url):
+    """Return (canonical_key, remark) for a vmess link, or None if it does not decode"""
+    config = config_scanner.decode_vmess(url)
+    if config is None:
+        return None
+    remark = str(config.pop('ps', '') or '')
+    # The remark is display-only; the rest identifies the server
+    canonical = json.dumps({k: str(v) for k, v in config.items()}, sort_keys=True, separators=(',', ':'))
+    return _key('vmess', canonical), remark
+
+
+def parse_link(url):
+    """Return (canonical_key, remark) for a vless, trojan or ss link"""
+    parts = urlsplit(url)
+    # Only the host is case-insensitive; passwords and base64 user info are not
+    userinfo, at, host = parts.netloc.rpartition('@')
+    netloc = f'{userinfo}{at}{host.lower()}' if at else parts.netloc
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    canonical = urlunsplit((parts.scheme.lower(), netloc, parts.path, query, ''))
+    return _key(parts.scheme.lower(), canonical), unquote(parts.fragment)
+
+
+def parse_json_config(text):
+    """Return (canonical_key, remark) for a JSON config found by the scanner"""
+    canonical = json.dumps(json.loads(text), sort_keys=True, separators=(',', ':'))
+    return _key('json', canonical), ''
+
+
+PARSERS = {
+    'vmess': parse_vmess,
+    'vless': parse_link,
+    'trojan': parse_link,
+    'ss': parse_link,
+    'json': parse_json_config,
+}
+
+
+def iter_configs(chunks):
+    """
+    Yield {'title', 'text', 'canonical_key'} for each config found in an
+    iterable of text chunks, skipping duplicates.
+    """
+    seen = set()
+    counts = dict.fromkeys(PARSERS, 0)
+    for config in config_scanner.iter_configs(chunks):
+        text = config['text']
+        kind = 'json' if text.startswith('{') else text.split('://', 1)[0]
+        parsed = PARSERS[kind](text)
+        if parsed is None or parsed[0] in seen:
+            continue
+        key, remark = parsed
+        seen.add(key)
+        counts[kind] += 1
+        fallback = f'{config_scanner.TITLES[kind]} {counts[kind]}'
+        yield {'title': _title(remark, fallback), 'text': text, 'canonical_key': key}
+
+
+def _insert_new(batch):
+    """bulk_create the configs whose canonical key no stored config has; returns the number inserted"""
+    stored = set(V2RayConfig.objects.filter(
+        canonical_key__in=[config.canonical_key for config in batch]
+    ).values_list('canonical_key', flat=True))
+    new = [config for config in batch if config.canonical_key not in stored]
+    V2RayConfig.objects.bulk_create(new)
+    return len(new)
+
+
+def ingest_config_file(config_file):
+    """
+    Replace the V2RayConfig rows extracted from config_file.
+    Returns the number of configs stored.
+    """
+    created = 0
+    with config_file.file.open('rb') as fileobj, transaction.atomic():
+        V2RayConfig.objects.filter(source_file=config_file).delete()
+        batch = []
+        for entry in iter_configs(config_scanner.decode_chunks(fileobj.chunks())):
+            batch.append(V2RayConfig(source_file=config_file, **entry))
+            if len(batch) >= INGEST_BATCH_SIZE:
+                created += _insert_new(batch)
+                batch = []
+        if batch:
+            created += _insert_new(batch)
+        ConfigFile.objects.filter(pk=config_file.pk).update(ingested_at=timezone.now())
+    # bulk_create and update() send no post_save; the file list shows ingested_at
+    bump_revision('configs')
+    bump_revision('files')
+    return created
+
+
+def ingest_uploaded_file(config_file):
+    """Ingest right after upload; a parsing failure never fails the upload"""
+    try:
+        return ingest_config_file(config_file)
+    except Exception:
+        logger.exception("Config extraction failed for ConfigFile %s", config_file.pk)
+        return 0
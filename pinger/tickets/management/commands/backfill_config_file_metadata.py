@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from tickets.files import scan_file
+from tickets.models import ConfigFile
+from tickets.revisions import bump_revision
+
+
+class Command(BaseCommand):
+    help = "Fill in size_bytes, sha256 and line_count for uploaded config files"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Recompute rows that already have metadata")
+
+    def handle(self, *args, **options):
+        files = ConfigFile.objects.all() if options['all'] else ConfigFile.objects.filter(sha256='')
+        updated = missing = 0
+        for config_file in files.only('id', 'name', 'file').iterator():
+            try:
+                with config_file.file.open('rb') as fileobj:
+                    stats = scan_file(fileobj)
+            except (FileNotFoundError, ValueError):
+                self.stderr.write(f"Missing file for ConfigFile {config_file.id} ({config_file.name})")
+                missing += 1
+                continue
+            ConfigFile.objects.filter(pk=config_file.pk).update(**stats._asdict())
+            updated += 1
+        if updated:
+            # update() skips the post_save hook that normally bumps this
+            bump_revision('files')
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} file(s), {missing} missing"))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from tickets.ingestion import ingest_config_file
+from tickets.models import ConfigFile
+
+
+class Command(BaseCommand):
+    help = "Extract V2Ray configs from uploaded files into V2RayConfig rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Re-extract files that were already ingested")
+
+    def handle(self, *args, **options):
+        files = ConfigFile.objects.all() if options['all'] else ConfigFile.objects.filter(ingested_at__isnull=True)
+        total = 0
+        for config_file in files.iterator():
+            try:
+                created = ingest_config_file(config_file)
+            except (FileNotFoundError, ValueError):
+                self.stderr.write(f"Missing file for ConfigFile {config_file.id} ({config_file.name})")
+                continue
+            self.stdout.write(f"{config_file.name}: {created} config(s)")
+            total += created
+        self.stdout.write(self.style.SUCCESS(f"Extracted {total} config(s)"))
@@ -0,0 +1,94 @@
+import logging
+import random
+import time
+
+from django.utils.functional import SimpleLazyObject
+
+from .authentication import authenticate_token, get_token_key
+from .request_logging import REDACTED, meta_key, request_logging_options
+
+request_logger = logging.getLogger('tickets.requests')
+
+
+class TokenAuthenticationMiddleware:
+    """
+    Resolve 'Authorization: Token <key>' headers into request.user.
+    A logged-in session user still takes precedence. Must be placed after
+    django.contrib.auth.middleware.AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = get_token_key(request)
+        if key is not None:
+            session_user = request.user
+
+            def get_user():
+                if session_user.is_authenticated:
+                    return session_user
+                return authenticate_token(key) or session_user
+
+            request.user = SimpleLazyObject(get_user)
+
+        return self.get_response(request)
+
+
+class RequestLoggingMiddleware:
+    """
+    Log method, path, status and duration for a sample of requests.
+    Sensitive headers are replaced before the record is built, so their
+    values never reach a formatter.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        options = request_logging_options()
+        self.level = logging.getLevelName(options['LEVEL'])
+        self.sample_rate = options['SAMPLE_RATE']
+        self.endpoint_sample_rates = options['ENDPOINT_SAMPLE_RATES']
+        self.endpoint_levels = {
+            name: logging.getLevelName(level) for name, level in options['ENDPOINT_LEVELS'].items()
+        }
+        sensitive = {header.lower() for header in options['SENSITIVE_HEADERS']}
+        self.headers = [
+            (header, meta_key(header), header.lower() in sensitive) for header in options['HEADERS']
+        ]
+
+    def __call__(self, request):
+        start = time.monotonic()
+        response = self.get_response(request)
+        duration_ms = (time.monotonic() - start) * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        endpoint = match.url_name if match else None
+
+        if response.status_code >= 500:
+            level = logging.ERROR
+        else:
+            level = self.endpoint_levels.get(endpoint, self.level)
+            rate = self.endpoint_sample_rates.get(endpoint, self.sample_rate)
+            if rate < 1 and random.random() >= rate:
+                return response
+
+        if request_logger.isEnabledFor(level):
+            request_logger.log(
+                level, '%s %s %s %.1fms', request.method, request.path, response.status_code, duration_ms,
+                extra={
+                    'method': request.method,
+                    'path': request.path,
+                    'status': response.status_code,
+                    'duration_ms': round(duration_ms, 1),
+                    'endpoint': endpoint,
+                    'headers': self._headers(request),
+                },
+            )
+        return response
+
+    def _headers(self, request):
+        headers = {}
+        for header, key, sensitive in self.headers:
+            if key in request.META:
+                headers[header] = REDACTED if sensitive else request.META[key]
+        return headers
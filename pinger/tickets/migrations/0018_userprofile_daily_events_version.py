@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0017_alter_token_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='daily_events_synced_version',
+            field=models.PositiveIntegerField(default=0, help_text='Version reflected by daily_events_json'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='daily_events_version',
+            field=models.PositiveIntegerField(default=0, help_text='Bumped on every task change'),
+        ),
+    ]
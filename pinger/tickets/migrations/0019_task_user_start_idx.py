@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0018_userprofile_daily_events_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'start_date'], name='task_user_start_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0020_collectionrevision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configfile',
+            name='line_count',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='configfile',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='configfile',
+            name='size_bytes',
+            field=models.PositiveBigIntegerField(blank=True, help_text='Set at upload (see tickets/files.py)', null=True),
+        ),
+    ]
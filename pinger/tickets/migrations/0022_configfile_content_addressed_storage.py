@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:32
+
+import tickets.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0021_configfile_metadata'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='configfile',
+            name='file',
+            field=models.FileField(storage=tickets.storage.config_file_storage, upload_to=tickets.storage.config_file_upload_to),
+        ),
+    ]
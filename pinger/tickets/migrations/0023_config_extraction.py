@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0022_configfile_content_addressed_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configfile',
+            name='ingested_at',
+            field=models.DateTimeField(blank=True, help_text='When configs were extracted (see tickets/ingestion.py)', null=True),
+        ),
+        migrations.AddField(
+            model_name='v2rayconfig',
+            name='canonical_key',
+            field=models.CharField(blank=True, help_text='Normalized identity used for deduplication', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='v2rayconfig',
+            name='source_file',
+            field=models.ForeignKey(blank=True, help_text='Uploaded file this config was extracted from', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='extracted_configs', to='tickets.configfile'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:53
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0023_config_extraction'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConfigLatencyStats',
+            fields=[
+                ('config', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='latency_stats', serialize=False, to='tickets.v2rayconfig')),
+                ('recent', models.JSONField(default=list)),
+                ('p50_latency_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('p95_latency_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('success_rate', models.FloatField(default=0)),
+                ('last_success_at', models.DateTimeField(blank=True, null=True)),
+                ('last_probed_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ConfigProbeResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('success', models.BooleanField()),
+                ('latency_ms', models.PositiveIntegerField(blank=True, help_text='Empty when the test failed', null=True)),
+                ('status', models.CharField(blank=True, max_length=50)),
+                ('probed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('config', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='probe_results', to='tickets.v2rayconfig')),
+                ('reported_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='config_probe_results', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-probed_at'],
+                'indexes': [models.Index(fields=['config', '-probed_at'], name='tickets_con_config__f673aa_idx')],
+            },
+        ),
+    ]
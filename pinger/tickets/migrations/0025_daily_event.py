@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_snapshots_stale(apps, schema_editor):
+    # Existing snapshots have no DailyEvent rows yet; they are rebuilt on the next read
+    UserProfile = apps.get_model('tickets', 'UserProfile')
+    UserProfile.objects.update(daily_events_version=F('daily_events_version') + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0024_config_probe_results'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userprofile',
+            name='daily_events_synced_version',
+            field=models.PositiveIntegerField(default=0, help_text='Version reflected by the DailyEvent rows'),
+        ),
+        migrations.CreateModel(
+            name='DailyEvent',
+            fields=[
+                ('task', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='daily_event', serialize=False, to='tickets.task')),
+                ('start_date', models.DateTimeField()),
+                ('data', models.TextField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'start_date', 'task'], name='daily_event_user_start_idx')],
+            },
+        ),
+        migrations.RunPython(mark_snapshots_stale, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0025_daily_event'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='v2rayconfig',
+            name='canonical_key',
+            field=models.CharField(blank=True, db_index=True, help_text='Normalized identity used for deduplication', max_length=64),
+        ),
+    ]
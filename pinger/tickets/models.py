@@ -5,12 +5,16 @@ from django.dispatch import receiver
 from django.utils import timezone
 import secrets
 
+from .storage import config_file_storage, config_file_upload_to
+
 class UserProfile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='profile')
     profile_picture = models.ImageField(upload_to='profile_pics/', null=True, blank=True)
     is_v2ray_admin = models.BooleanField(default=False, help_text="User can manage V2Ray configurations")
     has_v2ray_access = models.BooleanField(default=True, help_text="User can access V2Ray page and features")
     daily_events_json = models.TextField(blank=True, null=True, help_text="JSON representation of user's daily calendar events")
+    daily_events_version = models.PositiveIntegerField(default=0, help_text="Bumped on every task change")
+    daily_events_synced_version = models.PositiveIntegerField(default=0, help_text="Version reflected by the DailyEvent rows")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -77,9 +81,13 @@ class Ticket(models.Model):
 
 class ConfigFile(models.Model):
     name = models.CharField(max_length=200)
-    file = models.FileField(upload_to='config_files/')
+    file = models.FileField(upload_to=config_file_upload_to, storage=config_file_storage)
     uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    size_bytes = models.PositiveBigIntegerField(null=True, blank=True, help_text="Set at upload (see tickets/files.py)")
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    line_count = models.PositiveIntegerField(null=True, blank=True)
+    ingested_at = models.DateTimeField(null=True, blank=True, help_text="When configs were extracted (see tickets/ingestion.py)")
     
     def __str__(self):
         return self.name
@@ -96,6 +104,11 @@ class V2RayConfig(models.Model):
     title = models.CharField(max_length=200)
     text = models.TextField()
     status = models.CharField(max_length=3, choices=STATUS_CHOICES, default='off')
+    source_file = models.ForeignKey(ConfigFile, null=True, blank=True, on_delete=models.CASCADE,
+                                    related_name='extracted_configs',
+                                    help_text="Uploaded file this config was extracted from")
+    canonical_key = models.CharField(max_length=64, blank=True, db_index=True,
+                                     help_text="Normalized identity used for deduplication")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -105,6 +118,39 @@ class V2RayConfig(models.Model):
     class Meta:
         ordering = ['-created_at']
 
+class ConfigProbeResult(models.Model):
+    """One latency test of a config reported by a desktop tester (see tickets/probes.py)"""
+    config = models.ForeignKey(V2RayConfig, on_delete=models.CASCADE, related_name='probe_results')
+    reported_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL,
+                                    related_name='config_probe_results')
+    success = models.BooleanField()
+    latency_ms = models.PositiveIntegerField(null=True, blank=True, help_text="Empty when the test failed")
+    status = models.CharField(max_length=50, blank=True)
+    probed_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.config_id}: {self.latency_ms if self.success else self.status}"
+    
+    class Meta:
+        ordering = ['-probed_at']
+        indexes = [models.Index(fields=['config', '-probed_at'])]
+
+class ConfigLatencyStats(models.Model):
+    """Rolling aggregates over the last probes of a config, updated per ingested batch"""
+    config = models.OneToOneField(V2RayConfig, on_delete=models.CASCADE, primary_key=True,
+                                  related_name='latency_stats')
+    # Latency of each of the last STATS_WINDOW probes, null for failures, oldest first
+    recent = models.JSONField(default=list)
+    p50_latency_ms = models.PositiveIntegerField(null=True, blank=True)
+    p95_latency_ms = models.PositiveIntegerField(null=True, blank=True)
+    success_rate = models.FloatField(default=0)
+    last_success_at = models.DateTimeField(null=True, blank=True)
+    last_probed_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.config_id}: p50 {self.p50_latency_ms}ms, {self.success_rate:.0%} success"
+
 class PermanentNote(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='permanent_notes')
     title = models.CharField(max_length=200, blank=True)
@@ -148,6 +194,22 @@ class Task(models.Model):
         ordering = ['start_date']
         verbose_name = "Task"
         verbose_name_plural = "Tasks"
+        indexes = [
+            models.Index(fields=['user', 'start_date'], name='task_user_start_idx'),
+        ]
+
+class DailyEvent(models.Model):
+    """A task's entry in its owner's daily events snapshot, patched per task change"""
+    task = models.OneToOneField(Task, on_delete=models.CASCADE, primary_key=True, related_name='daily_event')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='daily_events')
+    start_date = models.DateTimeField()
+    # The serialized event, joined into the snapshot document as is
+    data = models.TextField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'start_date', 'task'], name='daily_event_user_start_idx'),
+        ]
 
 class ChecklistItem(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='checklist_items')
@@ -212,3 +274,12 @@ class EventTemplate(models.Model):
 
     class Meta:
         ordering = ['created_at']
+
+class CollectionRevision(models.Model):
+    """Revision counter for a collection, bumped on every write (see tickets/revisions.py)"""
+    key = models.CharField(max_length=100, unique=True)
+    revision = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.key} @ {self.revision}"
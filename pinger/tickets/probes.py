@@ -0,0 +1,159 @@
+"""
+Latency results reported by the desktop testers.
+
+Testers post batches of probe outcomes; each one is stored as a
+ConfigProbeResult and folded into the config's ConfigLatencyStats row. That
+row keeps the latencies of the last STATS_WINDOW probes, so p50/p95 and the
+success rate are recomputed from at most that many values per config per
+batch instead of by scanning the probe history. api_config_list orders and
+filters on the stats row and lists its p50 and success rate, so the config
+list revision is only bumped by batches that change one of those.
+
+The stats never read the probe history back, so it is only kept for
+PROBE_RETENTION: each batch deletes the older results of the configs it
+reports on, which bounds the table by what testers send in that period.
+"""
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import ConfigLatencyStats, ConfigProbeResult, V2RayConfig
+from .revisions import bump_revision
+
+PROBE_MAX_RESULTS = 1000
+STATS_WINDOW = 100
+PROBE_RETENTION = timedelta(days=30)
+
+
+class ProbeError(Exception):
+    pass
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list, None if it is empty"""
+    if not values:
+        return None
+    return values[max(math.ceil(fraction * len(values)) - 1, 0)]
+
+
+def _parse_probed_at(value):
+    if value is None:
+        return timezone.now()
+    try:
+        probed_at = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        raise ProbeError('probed_at must be an ISO 8601 timestamp')
+    if timezone.is_naive(probed_at):
+        probed_at = timezone.make_aware(probed_at, dt_timezone.utc)
+    # Client clocks drift; never record a probe in the future
+    return min(probed_at, timezone.now())
+
+
+def _parse_result(entry, user):
+    if not isinstance(entry, dict):
+        raise ProbeError('Each result must be an object')
+    config_id = entry.get('config_id')
+    if not isinstance(config_id, int) or isinstance(config_id, bool):
+        raise ProbeError('config_id must be an integer')
+    latency_ms = entry.get('latency_ms')
+    if latency_ms is not None and (not isinstance(latency_ms, int) or isinstance(latency_ms, bool)):
+        raise ProbeError('latency_ms must be an integer')
+    success = entry.get('success', latency_ms is not None and latency_ms > 0)
+    if not isinstance(success, bool):
+        raise ProbeError('success must be a boolean')
+    if success and (latency_ms is None or latency_ms < 0):
+        raise ProbeError('latency_ms is required for successful results')
+    return ConfigProbeResult(
+        config_id=config_id,
+        reported_by=user,
+        success=success,
+        latency_ms=latency_ms if success else None,
+        status=str(entry.get('status') or '')[:50],
+        probed_at=_parse_probed_at(entry.get('probed_at')),
+    )
+
+
+def _fold(stats, results):
+    """Add results (oldest first) to the stats row and recompute its aggregates"""
+    recent = (list(stats.recent) + [r.latency_ms if r.success else None for r in results])[-STATS_WINDOW:]
+    latencies = sorted(latency for latency in recent if latency is not None)
+    stats.recent = recent
+    stats.p50_latency_ms = percentile(latencies, 0.5)
+    stats.p95_latency_ms = percentile(latencies, 0.95)
+    stats.success_rate = len(latencies) / len(recent)
+    successes = [r.probed_at for r in results if r.success]
+    if stats.last_success_at:
+        successes.append(stats.last_success_at)
+    if successes:
+        stats.last_success_at = max(successes)
+    probed = [r.probed_at for r in results] + ([stats.last_probed_at] if stats.last_probed_at else [])
+    stats.last_probed_at = max(probed)
+
+
+def _save_results(results):
+    by_config = {}
+    for result in results:
+        by_config.setdefault(result.config_id, []).append(result)
+
+    now = timezone.now()
+    with transaction.atomic():
+        ConfigProbeResult.objects.bulk_create(results)
+        ConfigProbeResult.objects.filter(
+            config_id__in=list(by_config), probed_at__lt=now - PROBE_RETENTION
+        ).delete()
+        existing = ConfigLatencyStats.objects.select_for_update().in_bulk(list(by_config))
+        created, updated = [], []
+        ranking_changed = False
+        for config_id, config_results in by_config.items():
+            stats = existing.get(config_id)
+            if stats is None:
+                stats = ConfigLatencyStats(config_id=config_id)
+                created.append(stats)
+                ranking = None
+            else:
+                # bulk_update does not apply auto_now
+                stats.updated_at = now
+                updated.append(stats)
+                ranking = (stats.p50_latency_ms, stats.success_rate)
+            _fold(stats, config_results)
+            ranking_changed = ranking_changed or ranking != (stats.p50_latency_ms, stats.success_rate)
+        ConfigLatencyStats.objects.bulk_create(created)
+        ConfigLatencyStats.objects.bulk_update(updated, [
+            'recent', 'p50_latency_ms', 'p95_latency_ms', 'success_rate', 'last_success_at', 'last_probed_at',
+            'updated_at',
+        ])
+        if ranking_changed:
+            bump_revision('configs')
+
+
+def record_probe_results(entries, user=None):
+    """
+    Store a batch of probe results and update the per-config aggregates.
+
+    Each entry is {"config_id": int, "success": bool, "latency_ms": int,
+    "status": str, "probed_at": ISO 8601}; success defaults to latency_ms > 0
+    and probed_at to now. The batch is validated as a whole. Results for
+    configs that no longer exist are skipped. Returns (accepted, ignored).
+    """
+    if not isinstance(entries, list) or not entries:
+        raise ProbeError('results must be a non-empty list')
+    if len(entries) > PROBE_MAX_RESULTS:
+        raise ProbeError(f'A batch may contain at most {PROBE_MAX_RESULTS} results')
+
+    parsed = [_parse_result(entry, user) for entry in entries]
+    known = set(V2RayConfig.objects.filter(id__in={r.config_id for r in parsed}).values_list('id', flat=True))
+    results = sorted((r for r in parsed if r.config_id in known), key=lambda r: r.probed_at)
+    if results:
+        for attempt in range(2):
+            try:
+                _save_results(results)
+                break
+            except IntegrityError:
+                # Another batch created a stats row first; it is updated on retry
+                if attempt:
+                    raise
+                for result in results:
+                    result.pk = None
+    return len(results), len(parsed) - len(results)
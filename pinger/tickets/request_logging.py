@@ -0,0 +1,77 @@
+"""
+Structured, sampled request logging.
+
+tickets.middleware.RequestLoggingMiddleware emits one record per sampled
+request on the 'tickets.requests' logger. NonBlockingQueueHandler hands
+records to a background thread, so request threads never write to (or wait
+on) stdout.
+
+Settings (all optional):
+
+    REQUEST_LOGGING = {
+        'LEVEL': 'INFO',                  # default level for request records
+        'SAMPLE_RATE': 1.0,               # fraction of requests logged
+        'ENDPOINT_SAMPLE_RATES': {},      # url name -> sample rate
+        'ENDPOINT_LEVELS': {},            # url name -> level name
+        'HEADERS': [],                    # request headers to include
+        'SENSITIVE_HEADERS': [...],       # always logged as '[redacted]'
+    }
+
+Server errors (5xx) are always logged at ERROR regardless of sampling.
+"""
+import atexit
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+from django.conf import settings
+
+REDACTED = '[redacted]'
+DEFAULT_SENSITIVE_HEADERS = ('Authorization', 'Cookie', 'X-Admin-Password')
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Queue records for a background listener that formats and writes them.
+    Records are dropped instead of blocking when the queue is full.
+    """
+
+    def __init__(self, stream=None, queue_size=10000):
+        super().__init__(queue.Queue(queue_size))
+        self.target = logging.StreamHandler(stream or sys.stdout)
+        self.dropped = 0
+        self.listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def setFormatter(self, fmt):
+        # Formatting happens on the listener thread
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Records stay in-process, so skip QueueHandler's eager formatting
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def request_logging_options():
+    options = {
+        'LEVEL': 'INFO',
+        'SAMPLE_RATE': 1.0,
+        'ENDPOINT_SAMPLE_RATES': {},
+        'ENDPOINT_LEVELS': {},
+        'HEADERS': [],
+        'SENSITIVE_HEADERS': DEFAULT_SENSITIVE_HEADERS,
+    }
+    options.update(getattr(settings, 'REQUEST_LOGGING', {}))
+    return options
+
+
+def meta_key(header):
+    return 'HTTP_' + header.upper().replace('-', '_')
@@ -0,0 +1,132 @@
+"""
+Collection revisions for conditional GET.
+
+Every write to a tracked model bumps a monotonically increasing revision for
+its collection (per user for planner data, global for V2Ray configs and
+files). Read endpoints derive their ETag/Last-Modified from that single row,
+so an unchanged collection is answered with 304 before any rows are loaded
+or serialized.
+
+Inside a transaction, bump_revision() only marks the collection dirty; each
+dirty collection is bumped once when the transaction commits, however many
+rows it wrote or deleted (a cascade of hundreds of configs is one UPDATE).
+Outside a transaction the bump happens at once.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from .models import (
+    ChecklistItem, CollectionRevision, ConfigFile, DailyGoal, EventTemplate, PermanentNote, Task, V2RayConfig,
+)
+
+# model -> (collection name, revision tracked per user)
+TRACKED_MODELS = {
+    Task: ('tasks', True),
+    ChecklistItem: ('checklist', True),
+    DailyGoal: ('daily_goals', True),
+    PermanentNote: ('notes', True),
+    EventTemplate: ('event_templates', True),
+    V2RayConfig: ('configs', False),
+    ConfigFile: ('files', False),
+}
+
+
+def revision_key(collection, user_id=None):
+    return f'{collection}:{user_id}' if user_id is not None else collection
+
+
+def _bump(key):
+    now = timezone.now()
+    if CollectionRevision.objects.filter(key=key).update(revision=F('revision') + 1, updated_at=now):
+        return
+    try:
+        with transaction.atomic():
+            CollectionRevision.objects.create(key=key, revision=1)
+    except IntegrityError:
+        # Created concurrently by another request
+        CollectionRevision.objects.filter(key=key).update(revision=F('revision') + 1, updated_at=now)
+
+
+class _PendingRevisions:
+    """Collection keys dirtied by the current transaction, bumped on commit"""
+
+    def __init__(self):
+        self.keys = set()
+
+    def __call__(self):
+        for key in sorted(self.keys):
+            _bump(key)
+
+
+def _pending_revisions(connection):
+    pending = getattr(connection, '_pending_revisions', None)
+    # A rollback discards the callback along with the writes; start over then
+    if pending is None or not any(entry[1] is pending for entry in connection.run_on_commit):
+        pending = connection._pending_revisions = _PendingRevisions()
+        transaction.on_commit(pending)
+    return pending
+
+
+def bump_revision(collection, user_id=None):
+    """Advance a collection's revision after a write, once per transaction"""
+    key = revision_key(collection, user_id)
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        _bump(key)
+        return
+    _pending_revisions(connection).keys.add(key)
+
+
+def get_revision(collection, user_id=None):
+    """Return (revision, updated_at) for a collection, (0, None) if never written"""
+    row = CollectionRevision.objects.filter(key=revision_key(collection, user_id)).values_list(
+        'revision', 'updated_at'
+    ).first()
+    return row or (0, None)
+
+
+def _bump_for_instance(sender, instance, **kwargs):
+    collection, per_user = TRACKED_MODELS[sender]
+    bump_revision(collection, instance.user_id if per_user else None)
+
+
+for _model in TRACKED_MODELS:
+    post_save.connect(_bump_for_instance, sender=_model, dispatch_uid=f'revision_save_{_model.__name__}')
+    post_delete.connect(_bump_for_instance, sender=_model, dispatch_uid=f'revision_delete_{_model.__name__}')
+
+
+def collection_condition(collection, per_user=True):
+    """
+    Decorate a list view so GET/HEAD carry ETag/Last-Modified for the
+    collection and If-None-Match/If-Modified-Since are answered with 304.
+    """
+
+    def lookup(request):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        cached = getattr(request, '_collection_revision', None)
+        if cached is not None:
+            return cached
+
+        user_id = None
+        if per_user:
+            if not request.user.is_authenticated:
+                return None
+            user_id = request.user.pk
+
+        revision, updated_at = get_revision(collection, user_id)
+        request._collection_revision = (revision_key(collection, user_id), revision, updated_at)
+        return request._collection_revision
+
+    def etag_func(request, *args, **kwargs):
+        found = lookup(request)
+        return f'"{found[0]}-{found[1]}"' if found else None
+
+    def last_modified_func(request, *args, **kwargs):
+        found = lookup(request)
+        return found[2] if found else None
+
+    return condition(etag_func=etag_func, last_modified_func=last_modified_func)
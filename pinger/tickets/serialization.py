@@ -0,0 +1,289 @@
+"""
+JSON encoding and row serializers for the tickets API.
+
+dumps() uses orjson when it is installed and falls back to the stdlib
+encoder. JsonResponse is a drop-in replacement for django.http.JsonResponse
+built on it and is used by every API view.
+
+List endpoints serialize straight from values_list() tuples so no model
+instances are built; the single-object helpers (task_data() etc.) run the
+same row functions over an instance so both paths emit identical payloads.
+Each *_COLUMNS tuple is the projection for its endpoint: exactly the columns
+the payload needs, with joined fields spelled as lookups (uploaded_by__username)
+so related rows come back in the same query.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+from .models import ConfigFile
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def dumps(data):
+    """Encode data as compact JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(data, default=DjangoJSONEncoder().default)
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+
+
+class JsonResponse(HttpResponse):
+    """django.http.JsonResponse encoded with dumps()"""
+
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                "In order to allow non-dict objects to be serialized set the "
+                "safe parameter to False."
+            )
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _instance_row(obj, columns):
+    return tuple(getattr(obj, column) for column in columns)
+
+
+def _rows(queryset, columns, row_func):
+    return [row_func(row) for row in queryset.values_list(*columns)]
+
+
+# Tasks
+
+TASK_COLUMNS = ('id', 'title', 'description', 'start_date', 'end_date', 'color', 'is_important',
+                'created_at', 'updated_at')
+
+
+def task_row(row):
+    task_id, title, description, start_date, end_date, color, is_important, created_at, updated_at = row
+    data = {
+        'id': task_id,
+        'title': title,
+        'startDate': start_date.isoformat(),
+        'endDate': end_date.isoformat(),
+        'color': color,
+        'isImportant': is_important,
+        'createdAt': _iso(created_at),
+        'updatedAt': _iso(updated_at)
+    }
+    if description:
+        data['description'] = description
+    return data
+
+
+def task_event_row(row):
+    """Daily events snapshot entry; same as task_row without the description"""
+    data = task_row(row)
+    data.pop('description', None)
+    return data
+
+
+def serialize_tasks(queryset):
+    return _rows(queryset, TASK_COLUMNS, task_row)
+
+
+def serialize_task_events(queryset):
+    return _rows(queryset, TASK_COLUMNS, task_event_row)
+
+
+def task_data(task):
+    return task_row(_instance_row(task, TASK_COLUMNS))
+
+
+# Checklist items
+
+CHECKLIST_COLUMNS = ('id', 'text', 'completed', 'created_at', 'updated_at')
+
+
+def checklist_item_row(row):
+    item_id, text, completed, created_at, updated_at = row
+    return {
+        'id': item_id,
+        'text': text,
+        'completed': completed,
+        'created_at': _iso(created_at),
+        'updated_at': _iso(updated_at)
+    }
+
+
+def serialize_checklist_items(queryset):
+    return _rows(queryset, CHECKLIST_COLUMNS, checklist_item_row)
+
+
+def checklist_item_data(item):
+    return checklist_item_row(_instance_row(item, CHECKLIST_COLUMNS))
+
+
+# Daily goals
+
+DAILY_GOAL_COLUMNS = ('id', 'text', 'completed', 'date', 'priority', 'category', 'color', 'notes', 'target_time')
+
+
+def daily_goal_row(row):
+    goal_id, text, completed, date, priority, category, color, notes, target_time = row
+    return {
+        'id': goal_id,
+        'text': text,
+        'completed': completed,
+        'date': date.isoformat(),
+        'priority': priority,
+        'category': category,
+        'color': color,
+        'notes': notes,
+        'targetTime': target_time
+    }
+
+
+def serialize_daily_goals(queryset):
+    return _rows(queryset, DAILY_GOAL_COLUMNS, daily_goal_row)
+
+
+def daily_goal_data(goal):
+    return daily_goal_row(_instance_row(goal, DAILY_GOAL_COLUMNS))
+
+
+# Permanent notes
+
+NOTE_COLUMNS = ('id', 'title', 'content', 'created_at', 'updated_at')
+
+
+def note_row(row):
+    note_id, title, content, created_at, updated_at = row
+    return {
+        'id': note_id,
+        'title': title,
+        'content': content,
+        'created_at': created_at.isoformat(),
+        'updated_at': updated_at.isoformat()
+    }
+
+
+def serialize_notes(queryset):
+    return _rows(queryset, NOTE_COLUMNS, note_row)
+
+
+def note_data(note):
+    return note_row(_instance_row(note, NOTE_COLUMNS))
+
+
+# Event templates
+
+EVENT_TEMPLATE_COLUMNS = ('id', 'name', 'title', 'color')
+
+
+def event_template_row(row):
+    template_id, name, title, color = row
+    return {'id': template_id, 'name': name, 'title': title, 'color': color}
+
+
+def serialize_event_templates(queryset):
+    return _rows(queryset, EVENT_TEMPLATE_COLUMNS, event_template_row)
+
+
+def event_template_data(template):
+    return event_template_row(_instance_row(template, EVENT_TEMPLATE_COLUMNS))
+
+
+# V2Ray configs
+
+CONFIG_COLUMNS = ('id', 'title', 'text', 'status', 'created_at', 'updated_at', 'latency_stats__p50_latency_ms',
+                  'latency_stats__success_rate')
+
+
+def config_row(row):
+    config_id, title, text, status, created_at, updated_at, p50_latency_ms, success_rate = row
+    return {
+        'id': config_id,
+        'title': title,
+        'text': text,
+        'status': status,
+        'created_at': created_at.isoformat(),
+        'updated_at': updated_at.isoformat(),
+        # Ranking aggregates of tester reports (tickets/probes.py); null until the first one.
+        # Only these are listed: the list revision is not bumped for the others
+        'p50_latency_ms': p50_latency_ms,
+        'success_rate': success_rate
+    }
+
+
+def serialize_configs(queryset):
+    return _rows(queryset, CONFIG_COLUMNS, config_row)
+
+
+def config_data(config_obj):
+    stats = getattr(config_obj, 'latency_stats', None)
+    return config_row(tuple(
+        getattr(stats, column.split('__')[1], None) if column.startswith('latency_stats__') else getattr(config_obj, column)
+        for column in CONFIG_COLUMNS
+    ))
+
+
+# Uploaded config files
+
+FILE_COLUMNS = ('id', 'name', 'file', 'size_bytes', 'sha256', 'line_count', 'uploaded_by__username', 'uploaded_at',
+                'ingested_at')
+
+
+def file_row(row):
+    file_id, name, path, size_bytes, sha256, line_count, uploaded_by, uploaded_at, ingested_at = row
+    storage = ConfigFile._meta.get_field('file').storage
+    if size_bytes is None and path:
+        # Not backfilled yet (manage.py backfill_config_file_metadata)
+        size_bytes = storage.size(path)
+    return {
+        'id': file_id,
+        'name': name,
+        'size': size_bytes or 0,
+        'sha256': sha256 or None,
+        'line_count': line_count,
+        'url': storage.url(path) if path else '',
+        'uploaded_by': uploaded_by,
+        'uploaded_at': uploaded_at.isoformat(),
+        'ingested_at': _iso(ingested_at)
+    }
+
+
+def serialize_files(queryset):
+    return _rows(queryset, FILE_COLUMNS, file_row)
+
+
+# Users
+
+USER_COLUMNS = ('id', 'username', 'email', 'first_name', 'last_name', 'is_staff', 'is_active', 'date_joined',
+                'profile__id', 'profile__is_v2ray_admin', 'profile__has_v2ray_access', 'profile__created_at',
+                'profile__updated_at')
+
+
+def user_row(row):
+    (user_id, username, email, first_name, last_name, is_staff, is_active, date_joined,
+     profile_id, is_v2ray_admin, has_v2ray_access, profile_created_at, profile_updated_at) = row
+    if profile_id is None:
+        # Same defaults as a fresh UserProfile
+        is_v2ray_admin, has_v2ray_access = False, True
+    return {
+        'id': user_id,
+        'username': username,
+        'email': email,
+        'first_name': first_name,
+        'last_name': last_name,
+        'is_staff': is_staff,
+        'is_active': is_active,
+        'is_v2ray_admin': is_v2ray_admin,
+        'has_v2ray_access': has_v2ray_access,
+        'date_joined': _iso(date_joined),
+        'profile_created_at': _iso(profile_created_at),
+        'profile_updated_at': _iso(profile_updated_at)
+    }
+
+
+def serialize_users(queryset):
+    return _rows(queryset, USER_COLUMNS, user_row)
@@ -0,0 +1,69 @@
+"""
+Content-addressed storage for uploaded config files.
+
+Uploads are stored under their sha256 (set on the ConfigFile by
+tickets.files.create_config_file before saving), so identical uploads resolve
+to the same name under config_files/blobs/ and share one blob; saving a blob
+name that already exists skips the write. Any other name (a file saved without
+a checksum, e.g. from the Django admin) is stored the FileSystemStorage way,
+with a suffix added when the name is taken. A blob is referenced by every ConfigFile row whose file points at
+it and is removed when the last one is deleted (see tickets/files.py).
+
+Skipping the write means an upload relies on a blob that a concurrent
+release may be about to delete, so both take blob_lock(): an upload holds it
+until its row is committed and a release holds it from counting the
+references to deleting the blob.
+"""
+import os
+from contextlib import contextmanager
+
+from django.core.files import locks
+from django.core.files.storage import FileSystemStorage
+
+LOCK_NAME = '.blobs.lock'
+BLOB_DIR = 'config_files/blobs/'
+
+
+def is_blob_name(name):
+    return name.replace('\\', '/').startswith(BLOB_DIR)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage where a blob name identifies its content"""
+
+    def get_available_name(self, name, max_length=None):
+        # Never suffix blob names: the same name means the same bytes
+        if is_blob_name(name):
+            return name
+        return super().get_available_name(name, max_length)
+
+    def _save(self, name, content):
+        if is_blob_name(name) and self.exists(name):
+            return name
+        return super()._save(name, content)
+
+    @contextmanager
+    def blob_lock(self):
+        """Exclusive lock across threads and processes sharing this storage"""
+        os.makedirs(self.location, exist_ok=True)
+        with open(os.path.join(self.location, LOCK_NAME), 'ab') as lock_file:
+            locks.lock(lock_file, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(lock_file)
+
+
+config_file_store = ContentAddressedStorage()
+
+
+def config_file_storage():
+    return config_file_store
+
+
+def config_file_upload_to(instance, filename):
+    """config_files/blobs/<aa>/<sha256><ext>, or the legacy path without a checksum"""
+    if not instance.sha256:
+        return os.path.join('config_files', filename)
+    ext = os.path.splitext(filename)[1].lower()
+    return os.path.join('config_files', 'blobs', instance.sha256[:2], instance.sha256 + ext)
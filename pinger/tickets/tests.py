@@ -1,12 +1,54 @@
-from django.test import TestCase, Client
+from django.conf import settings
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
+from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.urls import reverse
-from .models import ConfigFile
+from django.utils import timezone
+from . import bulk_delete, config_scanner
+from .authentication import authenticate_token, token_cache
+from .downloads import parse_range
+from .files import blob_releaser, release_blob
+from .serialization import daily_goal_data, serialize_daily_goals, serialize_tasks, task_data
+from .models import (
+    ChecklistItem, ConfigFile, ConfigLatencyStats, ConfigProbeResult, DailyEvent, DailyGoal, Task, Token,
+    UserProfile, V2RayConfig,
+)
+from .probes import PROBE_RETENTION, STATS_WINDOW, record_probe_results
+import base64
+import gzip
+import hashlib
+import io
+import json
 import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+class TemporaryMediaMixin:
+    """Stores uploads under a throwaway MEDIA_ROOT that is removed after each test"""
 
-class FileUploadTestCase(TestCase):
     def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.media_settings.enable()
+
+    def tearDown(self):
+        self.media_settings.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+        super().tearDown()
+
+
+class FileUploadTestCase(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
         self.client = Client()
         self.user = User.objects.create_user(
             username='testuser',
@@ -101,4 +143,836 @@ class FileUploadTestCase(TestCase):
         
         # Check that no file was saved in the database
         config_files = ConfigFile.objects.all()
-        self.assertEqual(config_files.count(), 0)
\ No newline at end of file
+        self.assertEqual(config_files.count(), 0)
+
+class DailyEventsSnapshotTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = get_user_model().objects.create_user(
+            username='planner',
+            password='plannerpass123'
+        )
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {Token.objects.get(user=self.user).key}'}
+
+    def create_task(self, title, start):
+        return self.client.post(reverse('task_api'), data={
+            'title': title,
+            'startDate': f'{start}T09:00:00Z',
+            'endDate': f'{start}T10:00:00Z'
+        }, content_type='application/json', **self.auth)
+
+    def snapshot(self):
+        profile = UserProfile.objects.get(user=self.user)
+        return profile, json.loads(profile.daily_events_json or '[]')
+
+    def test_task_writes_patch_snapshot(self):
+        """
+        Creating, updating and deleting tasks keeps the snapshot in sync
+        """
+        self.client.force_login(self.user)
+        self.client.get(reverse('user_daily_events_api'))
+        later = self.create_task('Later', '2025-01-02').json()
+        earlier = self.create_task('Earlier', '2025-01-01').json()
+
+        profile, events = self.snapshot()
+        self.assertEqual(profile.daily_events_synced_version, profile.daily_events_version)
+        self.assertEqual(DailyEvent.objects.filter(user=self.user).count(), 2)
+        events = self.client.get(reverse('user_daily_events_api')).json()['events']
+        self.assertEqual([e['id'] for e in events], [earlier['id'], later['id']])
+
+        self.client.put(reverse('task_detail_api', args=[later['id']]), data={'title': 'Renamed'},
+                        content_type='application/json', **self.auth)
+        self.client.delete(reverse('task_detail_api', args=[earlier['id']]), **self.auth)
+
+        profile, events = self.snapshot()
+        self.assertEqual(profile.daily_events_synced_version, profile.daily_events_version)
+        events = self.client.get(reverse('user_daily_events_api')).json()['events']
+        self.assertEqual([(e['id'], e['title']) for e in events], [(later['id'], 'Renamed')])
+        profile, events = self.snapshot()
+        self.assertEqual([(e['id'], e['title']) for e in events], [(later['id'], 'Renamed')])
+
+    def test_task_write_does_not_read_document(self):
+        """
+        A task change writes its own row and never decodes the whole document
+        """
+        self.client.force_login(self.user)
+        self.client.get(reverse('user_daily_events_api'))
+        UserProfile.objects.filter(user=self.user).update(daily_events_json='not json')
+        self.create_task('Task', '2025-01-01')
+
+        profile, events = self.snapshot()
+        self.assertEqual(profile.daily_events_synced_version, profile.daily_events_version)
+        self.assertEqual(DailyEvent.objects.filter(user=self.user).count(), 1)
+
+    def test_get_does_not_write_snapshot(self):
+        """
+        Listing tasks leaves the profile untouched
+        """
+        self.create_task('Task', '2025-01-01')
+        before = UserProfile.objects.get(user=self.user)
+        self.assertEqual(self.client.get(reverse('task_api'), **self.auth).status_code, 200)
+        after = UserProfile.objects.get(user=self.user)
+        self.assertEqual(before.daily_events_version, after.daily_events_version)
+        self.assertEqual(before.daily_events_json, after.daily_events_json)
+
+    def test_tasks_saved_outside_the_api_are_patched_in(self):
+        """
+        Tasks saved or deleted any other way (admin, shell) reach the snapshot too
+        """
+        self.client.force_login(get_user_model().objects.get(pk=self.user.pk))
+        self.create_task('Task', '2025-01-01')
+        self.client.get(reverse('user_daily_events_api'))
+        Task.objects.create(user=self.user, title='Imported', start_date='2025-01-03T09:00:00Z',
+                            end_date='2025-01-03T10:00:00Z')
+        Task.objects.filter(title='Task').delete()
+
+        response = self.client.get(reverse('user_daily_events_api'))
+        self.assertEqual([e['title'] for e in response.json()['events']], ['Imported'])
+        profile, events = self.snapshot()
+        self.assertEqual(profile.daily_events_synced_version, profile.daily_events_version)
+
+    def test_stale_snapshot_is_rebuilt_on_read(self):
+        """
+        A failed patch marks the snapshot stale and the next read rebuilds it
+        """
+        self.create_task('Task', '2025-01-01')
+        with mock.patch.object(DailyEvent.objects, 'bulk_create', side_effect=RuntimeError), \
+                self.assertLogs('tickets.daily_events', level='ERROR'):
+            self.create_task('Later', '2025-01-03')
+        profile, events = self.snapshot()
+        self.assertNotEqual(profile.daily_events_synced_version, profile.daily_events_version)
+
+        self.client.force_login(get_user_model().objects.get(pk=self.user.pk))
+        response = self.client.get(reverse('user_daily_events_api'))
+        self.assertEqual([e['title'] for e in response.json()['events']], ['Task', 'Later'])
+        profile, events = self.snapshot()
+        self.assertEqual(profile.daily_events_synced_version, profile.daily_events_version)
+
+
+class TokenAuthenticationTestCase(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username='tokenuser',
+            password='tokenpass123'
+        )
+        self.token = Token.objects.get(user=self.user)
+
+    def test_lookup_is_cached(self):
+        """
+        The token and its user are fetched in one query, then served from cache
+        """
+        with self.assertNumQueries(1):
+            self.assertEqual(authenticate_token(self.token.key), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(authenticate_token(self.token.key), self.user)
+
+    def test_rotated_token_is_rejected(self):
+        """
+        Rotating a token invalidates the cached old key
+        """
+        old_key = self.token.key
+        authenticate_token(old_key)
+        self.token.key = self.token.generate_key()
+        self.token.save()
+        self.assertIsNone(authenticate_token(old_key))
+        self.assertEqual(authenticate_token(self.token.key), self.user)
+
+    def test_deactivated_user_is_rejected(self):
+        """
+        Deactivating a user drops their cached token
+        """
+        authenticate_token(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(authenticate_token(self.token.key))
+
+    def test_revoked_admin_rights_are_seen(self):
+        """
+        Requests never share a user instance, so a revoked profile flag shows at once
+        """
+        profile = UserProfile.objects.get(user=self.user)
+        profile.is_v2ray_admin = True
+        profile.save()
+        headers = {'HTTP_AUTHORIZATION': f'Token {self.token.key}'}
+        response = Client().get(reverse('api_check_admin_status'), **headers)
+        self.assertTrue(response.json()['is_v2ray_admin'])
+        self.assertIsNot(authenticate_token(self.token.key), authenticate_token(self.token.key))
+
+        profile.is_v2ray_admin = False
+        profile.save()
+        response = Client().get(reverse('api_check_admin_status'), **headers)
+        self.assertFalse(response.json()['is_v2ray_admin'])
+
+    def test_api_view_accepts_token_header(self):
+        """
+        API views see the token user through request.user
+        """
+        response = Client().get(reverse('checklist_api'), HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, 200)
+        response = Client().get(reverse('checklist_api'), HTTP_AUTHORIZATION='Token invalid')
+        self.assertEqual(response.status_code, 401)
+
+
+class RequestLoggingTestCase(TestCase):
+    @override_settings(REQUEST_LOGGING={
+        'SAMPLE_RATE': 1.0,
+        'HEADERS': ['Origin', 'Authorization'],
+        'SENSITIVE_HEADERS': ['Authorization'],
+    })
+    def test_sensitive_headers_are_redacted(self):
+        """
+        Sensitive header values never make it into the log record
+        """
+        with self.assertLogs('tickets.requests', level='INFO') as logs:
+            Client().get(reverse('checklist_api'), HTTP_ORIGIN='http://localhost:5173',
+                         HTTP_AUTHORIZATION='Token secret-value')
+        record = logs.records[0]
+        self.assertEqual(record.status, 401)
+        self.assertEqual(record.endpoint, 'checklist_api')
+        self.assertEqual(record.headers, {'Origin': 'http://localhost:5173', 'Authorization': '[redacted]'})
+
+    @override_settings(REQUEST_LOGGING={
+        'SAMPLE_RATE': 1.0,
+        'ENDPOINT_SAMPLE_RATES': {'checklist_api': 0.0},
+    })
+    def test_endpoint_sample_rate(self):
+        """
+        Endpoints sampled at zero are not logged
+        """
+        with self.assertNoLogs('tickets.requests', level='INFO'):
+            Client().get(reverse('checklist_api'))
+
+
+class CorsPreflightTestCase(TestCase):
+    def test_preflight_short_circuits(self):
+        """
+        Preflight requests are answered by the middleware without touching the database
+        """
+        with self.assertNumQueries(0):
+            response = Client().options(
+                reverse('task_api'),
+                HTTP_ORIGIN='http://localhost:5173',
+                HTTP_ACCESS_CONTROL_REQUEST_METHOD='PUT',
+                HTTP_ACCESS_CONTROL_REQUEST_HEADERS='authorization, x-admin-password',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Access-Control-Allow-Origin'], 'http://localhost:5173')
+        self.assertEqual(response['Access-Control-Max-Age'], '86400')
+        self.assertIn('x-admin-password', response['Access-Control-Allow-Headers'])
+
+
+class TaskListPaginationTestCase(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='calendar',
+            password='calendarpass123'
+        )
+        self.client = Client()
+        self.client.force_login(get_user_model().objects.get(pk=self.user.pk))
+        for day in range(1, 6):
+            Task.objects.create(user=self.user, title=f'Day {day}',
+                                start_date=f'2025-01-0{day}T09:00:00Z', end_date=f'2025-01-0{day}T10:00:00Z')
+
+    def test_range_filter(self):
+        """
+        Only tasks overlapping [start, end) are returned
+        """
+        response = self.client.get(reverse('task_api'), {'start': '2025-01-02', 'end': '2025-01-04'})
+        self.assertEqual([t['title'] for t in response.json()['tasks']], ['Day 2', 'Day 3'])
+
+    def test_cursor_pagination(self):
+        """
+        Following next_cursor walks every task exactly once
+        """
+        titles, cursor = [], None
+        while True:
+            params = {'limit': 2}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.client.get(reverse('task_api'), params).json()
+            titles += [t['title'] for t in data['tasks']]
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(titles, [f'Day {day}' for day in range(1, 6)])
+
+    def test_invalid_cursor(self):
+        for raw in ('garbage', '[1,2]', '{"a":1}', '["2025-01-01T09:00:00Z"]', '["2025-01-01T09:00:00Z","1"]'):
+            cursor = base64.urlsafe_b64encode(raw.encode()).decode() if raw != 'garbage' else raw
+            response = self.client.get(reverse('task_api'), {'cursor': cursor})
+            self.assertEqual(response.status_code, 400, raw)
+
+
+class ConditionalGetTestCase(TemporaryMediaMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(
+            username='poller',
+            password='pollerpass123'
+        )
+        self.client = Client()
+        self.client.force_login(get_user_model().objects.get(pk=self.user.pk))
+        ChecklistItem.objects.create(user=self.user, text='Buy milk')
+
+    def test_unchanged_collection_returns_304(self):
+        """
+        A matching If-None-Match is answered without loading the rows
+        """
+        response = self.client.get(reverse('checklist_api'))
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        response = self.client.get(reverse('checklist_api'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_write_changes_etag(self):
+        """
+        Writes bump the revision, so the old ETag no longer matches
+        """
+        etag = self.client.get(reverse('checklist_api'))['ETag']
+        ChecklistItem.objects.create(user=self.user, text='Walk the dog')
+        response = self.client.get(reverse('checklist_api'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['checklist_items']), 2)
+
+    def test_global_collection(self):
+        """
+        V2Ray configs are versioned globally
+        """
+        etag = self.client.get(reverse('api_config_list'))['ETag']
+        self.assertEqual(self.client.get(reverse('api_config_list'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        V2RayConfig.objects.create(title='New', text='vless://example')
+        self.assertEqual(self.client.get(reverse('api_config_list'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_cascade_bumps_each_collection_once(self):
+        """
+        Deleting a file with many extracted configs costs one revision UPDATE per collection
+        """
+        config_file = ConfigFile.objects.create(name='dump.txt', file='config_files/dump.txt', uploaded_by=self.user)
+        V2RayConfig.objects.bulk_create(
+            V2RayConfig(title=f'Config {i}', text=f'vless://{i}', source_file=config_file) for i in range(50)
+        )
+        etag = self.client.get(reverse('api_config_list'))['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(reverse('api_delete_file', args=[config_file.pk]),
+                                          HTTP_X_ADMIN_PASSWORD='abbaswww')
+        self.assertEqual(response.status_code, 200)
+        bumps = [q['sql'] for q in queries.captured_queries
+                 if q['sql'].startswith('UPDATE "tickets_collectionrevision"')]
+        self.assertEqual(len(bumps), 2)
+        self.assertEqual(self.client.get(reverse('api_config_list'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_compressed_list(self):
+        """
+        List endpoints gzip their body for clients that accept it and still revalidate
+        """
+        for i in range(20):
+            V2RayConfig.objects.create(title=f'Config {i}', text='vless://example')
+        response = self.client.get(reverse('api_config_list'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))['configs']), 20)
+
+        response = self.client.get(reverse('api_config_list'), HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+class BatchApiTestCase(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='batcher',
+            password='batcherpass123'
+        )
+        self.client = Client()
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {Token.objects.get(user=self.user).key}'}
+        self.item = ChecklistItem.objects.create(user=self.user, text='Old')
+        self.task = Task.objects.create(user=self.user, title='Stale', start_date='2025-01-01T09:00:00Z',
+                                        end_date='2025-01-01T10:00:00Z')
+
+    def post(self, operations):
+        return self.client.post(reverse('batch_api'), data={'operations': operations},
+                                content_type='application/json', **self.auth)
+
+    def test_mixed_batch(self):
+        """
+        Creates, updates and deletes across models are applied together
+        """
+        version = UserProfile.objects.get(user=self.user).daily_events_version
+        response = self.post([
+            {'op': 'create', 'type': 'task', 'data': {
+                'title': 'New', 'startDate': '2025-01-02T09:00:00Z', 'endDate': '2025-01-02T10:00:00Z'}},
+            {'op': 'update', 'type': 'checklist', 'id': self.item.id, 'data': {'completed': True}},
+            {'op': 'create', 'type': 'daily_goal', 'data': {'text': 'Read', 'date': '2025-01-02'}},
+            {'op': 'delete', 'type': 'task', 'id': self.task.id},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['status'] for r in response.json()['results']], [201, 200, 201, 200])
+        self.assertEqual(list(Task.objects.filter(user=self.user).values_list('title', flat=True)), ['New'])
+        self.assertTrue(ChecklistItem.objects.get(id=self.item.id).completed)
+        self.assertEqual(DailyGoal.objects.filter(user=self.user).count(), 1)
+
+        # The snapshot is patched once for the batch, not rebuilt
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(profile.daily_events_version, version + 1)
+        self.assertEqual(profile.daily_events_synced_version, profile.daily_events_version)
+        self.assertEqual(list(DailyEvent.objects.filter(user=self.user).values_list('task__title', flat=True)), ['New'])
+        events = self.client.get(reverse('user_daily_events_api'), **self.auth).json()['events']
+        self.assertEqual([e['title'] for e in events], ['New'])
+
+    def test_invalid_operation_rolls_back_batch(self):
+        """
+        One bad operation means nothing is written
+        """
+        response = self.post([
+            {'op': 'update', 'type': 'checklist', 'id': self.item.id, 'data': {'text': 'Changed'}},
+            {'op': 'delete', 'type': 'task', 'id': 999999},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([r['status'] for r in response.json()['results']], [424, 404])
+        self.assertEqual(ChecklistItem.objects.get(id=self.item.id).text, 'Old')
+
+
+class SerializationTestCase(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='serializer', password='serializerpass123')
+
+    def test_row_and_instance_serializers_agree(self):
+        task = Task.objects.create(user=self.user, title='Write', description='Docs',
+                                   start_date='2025-01-01T09:00:00Z', end_date='2025-01-01T10:00:00Z')
+        task.refresh_from_db()
+        goal = DailyGoal.objects.create(user=self.user, text='Read', date='2025-01-01', target_time=30)
+        goal.refresh_from_db()
+
+        self.assertEqual(serialize_tasks(Task.objects.filter(user=self.user)), [task_data(task)])
+        self.assertEqual(serialize_daily_goals(DailyGoal.objects.filter(user=self.user)), [daily_goal_data(goal)])
+        self.assertEqual(task_data(task)['description'], 'Docs')
+
+    def test_list_response_is_compact_json(self):
+        DailyGoal.objects.create(user=self.user, text='Run', date='2025-01-02')
+        self.client.force_login(get_user_model().objects.get(pk=self.user.pk))
+
+        response = self.client.get(reverse('daily_goals_api'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertNotIn(b', ', response.content)
+        self.assertEqual(json.loads(response.content)[0]['targetTime'], None)
+
+
+class ListProjectionTestCase(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(3):
+            user = get_user_model().objects.create_user(username=f'uploader{i}', password='uploaderpass123')
+            ConfigFile.objects.create(
+                name=f'dump{i}.txt',
+                file=SimpleUploadedFile(f'dump{i}.txt', b'vmess://abc\n', content_type='text/plain'),
+                uploaded_by=user
+            )
+
+    def test_file_list_query_count_is_constant(self):
+        # Collection revision lookup plus the joined file listing
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('api_list_files'))
+        files = json.loads(response.content)['files']
+        self.assertEqual(sorted(f['uploaded_by'] for f in files), ['uploader0', 'uploader1', 'uploader2'])
+
+    def test_user_list_includes_profile_fields(self):
+        UserProfile.objects.filter(user__username='uploader1').update(is_v2ray_admin=True)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('api_get_users'))
+        users = {u['username']: u for u in json.loads(response.content)['users']}
+        self.assertTrue(users['uploader1']['is_v2ray_admin'])
+        self.assertFalse(users['uploader0']['is_v2ray_admin'])
+        self.assertTrue(users['uploader0']['has_v2ray_access'])
+
+
+class ConfigFileMetadataTestCase(TemporaryMediaMixin, TestCase):
+    def test_upload_records_size_checksum_and_lines(self):
+        content = b'vmess://one\nvless://two\nvless://three'
+        response = self.client.post(reverse('api_upload_file'), {
+            'file': SimpleUploadedFile('dump.txt', content, content_type='text/plain')
+        })
+        self.assertEqual(response.status_code, 200)
+
+        config_file = ConfigFile.objects.get(pk=json.loads(response.content)['file_id'])
+        self.assertEqual(config_file.size_bytes, len(content))
+        self.assertEqual(config_file.sha256, hashlib.sha256(content).hexdigest())
+        self.assertEqual(config_file.line_count, 3)
+
+    def test_backfill_command(self):
+        user = get_user_model().objects.create_user(username='legacy', password='legacypass123')
+        config_file = ConfigFile.objects.create(
+            name='old.txt',
+            file=SimpleUploadedFile('old.txt', b'a\nb\n', content_type='text/plain'),
+            uploaded_by=user
+        )
+        self.assertIsNone(config_file.size_bytes)
+
+        call_command('backfill_config_file_metadata', stdout=io.StringIO())
+        config_file.refresh_from_db()
+        self.assertEqual((config_file.size_bytes, config_file.line_count), (4, 2))
+        self.assertEqual(config_file.sha256, hashlib.sha256(b'a\nb\n').hexdigest())
+
+
+class DownloadFileTestCase(TemporaryMediaMixin, TestCase):
+    content = b'0123456789abcdef'
+
+    def setUp(self):
+        super().setUp()
+        response = self.client.post(reverse('api_upload_file'), {
+            'file': SimpleUploadedFile('dump.txt', self.content, content_type='text/plain')
+        })
+        self.config_file = ConfigFile.objects.get(pk=json.loads(response.content)['file_id'])
+        self.url = reverse('download_file', args=[self.config_file.pk])
+        self.etag = f'"{self.config_file.sha256}"'
+
+    def test_full_download_is_streamed(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['ETag'], self.etag)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_range_and_if_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=4-7', HTTP_IF_RANGE=self.etag)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 4-7/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), b'4567')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'def')
+
+        # Stale validator: the whole file is sent
+        response = self.client.get(self.url, HTTP_RANGE='bytes=4-7', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-')
+        self.assertEqual(response.status_code, 416)
+
+        # An invalid range is ignored rather than unsatisfiable
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5-3')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_suffix_range_of_empty_file(self):
+        self.assertIs(parse_range('bytes=-5', 0), False)
+        self.assertEqual(parse_range('bytes=-5', 3), (0, 2))
+
+    def test_not_modified(self):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(FILE_DOWNLOADS={'SENDFILE': 'x-accel-redirect', 'ACCEL_REDIRECT_PREFIX': '/protected/'})
+    def test_accel_redirect(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/' + self.config_file.file.name)
+        self.assertEqual(response.content, b'')
+
+
+class ContentAddressedStorageTestCase(TemporaryMediaMixin, TestCase):
+    def upload(self, name, content):
+        response = self.client.post(reverse('api_upload_file'), {
+            'file': SimpleUploadedFile(name, content, content_type='text/plain')
+        })
+        return ConfigFile.objects.get(pk=json.loads(response.content)['file_id'])
+
+    def delete(self, config_file):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(reverse('api_delete_file', args=[config_file.pk]),
+                                          HTTP_X_ADMIN_PASSWORD='abbaswww')
+        self.assertEqual(response.status_code, 200)
+
+    def test_identical_uploads_share_a_blob(self):
+        first = self.upload('monday.txt', b'vmess://same\n')
+        second = self.upload('tuesday.txt', b'vmess://same\n')
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertIn(first.sha256, first.file.name)
+        storage = first.file.storage
+
+        self.delete(first)
+        self.assertTrue(storage.exists(second.file.name))
+
+        self.delete(second)
+        self.assertFalse(storage.exists(second.file.name))
+
+    def test_files_without_checksum_keep_their_own_bytes(self):
+        """
+        Only blob names are shared; other names get Django's usual suffix
+        """
+        user = get_user_model().objects.create_user(username='admin-form', password='adminform123')
+        first = ConfigFile.objects.create(name='x.txt', file=SimpleUploadedFile('x.txt', b'first'), uploaded_by=user)
+        second = ConfigFile.objects.create(name='x.txt', file=SimpleUploadedFile('x.txt', b'second'),
+                                           uploaded_by=user)
+        self.assertEqual(first.file.name, 'config_files/x.txt')
+        self.assertNotEqual(second.file.name, first.file.name)
+        with second.file.open('rb') as f:
+            self.assertEqual(f.read(), b'second')
+
+    def test_release_waits_for_pending_upload(self):
+        """
+        A release cannot delete a blob while an upload that skipped writing it holds the lock
+        """
+        config_file = self.upload('monday.txt', b'vmess://same\n')
+        storage, name = config_file.file.storage, config_file.file.name
+        # Counted from the thread as if the upload's row were not committed yet
+        with mock.patch('tickets.files.blob_refcount', return_value=0):
+            with storage.blob_lock():
+                release = threading.Thread(target=release_blob, args=(storage, name))
+                release.start()
+                release.join(0.2)
+                self.assertTrue(storage.exists(name))
+            release.join()
+        self.assertFalse(storage.exists(name))
+
+
+class ConfigIngestionTestCase(TemporaryMediaMixin, TransactionTestCase):
+    def vmess(self, remark, host='1.2.3.4'):
+        payload = json.dumps({'v': '2', 'ps': remark, 'add': host, 'port': '443', 'id': 'abc'})
+        return 'vmess://' + base64.b64encode(payload.encode()).decode()
+
+    def test_upload_extracts_and_dedupes_configs(self):
+        content = '\n'.join([
+            'channel dump',
+            self.vmess('First'),
+            self.vmess('Same server, new name'),
+            'vless://uuid@example.com:443?type=ws&security=tls#Edge',
+            'vless://uuid@EXAMPLE.com:443?security=tls&type=ws#Edge again',
+            'trojan://Secret@example.org:443#Night',
+            'trojan://secret@example.org:443#Other%20password',
+            'ss://YWVzLTI1Ni1nY206cGFzcw@example.net:8388',
+            '{',
+            '  "outbounds": [{"protocol": "freedom"}]',
+            '}',
+            'vmess://not-base64!!',
+        ]).encode()
+        response = self.client.post(reverse('api_upload_file'), {
+            'file': SimpleUploadedFile('dump.txt', content, content_type='text/plain')
+        })
+        file_id = json.loads(response.content)['file_id']
+        self.assertIsNotNone(ConfigFile.objects.get(pk=file_id).ingested_at)
+
+        response = self.client.get(reverse('api_config_list'), {'source_file': file_id})
+        configs = json.loads(response.content)['configs']
+        self.assertEqual([c['title'] for c in configs],
+                         ['First', 'Edge', 'Night', 'Other password', 'Shadowsocks Config 1', 'V2Ray Config 1'])
+        self.assertTrue(configs[0]['text'].startswith('vmess://'))
+
+        # Extracted configs stay out of the manually managed list
+        V2RayConfig.objects.create(title='Manual', text='vless://manual')
+        response = self.client.get(reverse('api_config_list'))
+        self.assertEqual([c['title'] for c in json.loads(response.content)['configs']], ['Manual'])
+
+        ConfigFile.objects.filter(pk=file_id).update(ingested_at=None)
+        response = self.client.get(reverse('api_config_list'), {'source_file': file_id})
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.get(reverse('api_config_list'), {'source_file': 'abc'})
+        self.assertEqual(json.loads(response.content)['message'], 'source_file must be a file id')
+        response = self.client.get(reverse('v2ray_page'), {'source_file': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        self.assertNotEqual(response['Content-Type'], 'application/json')
+
+        # The file list carries ingested_at, so ingesting invalidates its ETag
+        etag = self.client.get(reverse('api_list_files'))['ETag']
+        call_command('ingest_config_files', stdout=io.StringIO())
+        response = self.client.get(reverse('api_list_files'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(json.loads(response.content)['files'][0]['ingested_at'])
+
+    def test_repeat_upload_adds_no_configs(self):
+        """
+        Configs already stored from another file are not extracted again
+        """
+        def upload(name, content):
+            response = self.client.post(reverse('api_upload_file'), {
+                'file': SimpleUploadedFile(name, content, content_type='text/plain')
+            })
+            return json.loads(response.content)['file_id']
+
+        content = '\n'.join(f'vless://uuid@host{i}.example:443#Server {i}' for i in range(5)).encode()
+        upload('monday.txt', content)
+        second = upload('tuesday.txt', content + b'\ntrojan://pw@new.example:443#New')
+        self.assertEqual(V2RayConfig.objects.count(), 6)
+        self.assertEqual(list(V2RayConfig.objects.filter(source_file=second).values_list('title', flat=True)),
+                         ['New'])
+
+        # Re-extracting a file keeps its own configs
+        call_command('ingest_config_files', '--all', stdout=io.StringIO())
+        self.assertEqual(V2RayConfig.objects.count(), 6)
+
+    def test_scanner_is_shared_with_the_client(self):
+        """
+        The server extracts configs with the same scanner the desktop clients use
+        """
+        client_copy = settings.BASE_DIR.parent / 'app.v.2' / 'config_scanner.py'
+        if not client_copy.exists():
+            self.skipTest('desktop client sources are not checked out')
+        server_copy = Path(config_scanner.__file__)
+        self.assertEqual(server_copy.read_bytes(), client_copy.read_bytes())
+
+
+class ConfigProbeResultTestCase(TransactionTestCase):
+    def setUp(self):
+        self.fast = V2RayConfig.objects.create(title='Fast', text='vless://fast')
+        self.slow = V2RayConfig.objects.create(title='Slow', text='vless://slow')
+        self.untested = V2RayConfig.objects.create(title='Untested', text='vless://untested')
+        tester = get_user_model().objects.create_user(username='tester', password='testerpass123')
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {Token.objects.get(user=tester).key}'}
+
+    def post(self, results, auth=True):
+        return self.client.post(reverse('api_config_probe_results'), json.dumps({'results': results}),
+                                content_type='application/json', **(self.auth if auth else {}))
+
+    def test_results_update_rolling_aggregates(self):
+        results = [{'config_id': self.fast.id, 'latency_ms': latency} for latency in (100, 120, 140, 160)]
+        results.append({'config_id': self.fast.id, 'success': False, 'status': 'Server unreachable'})
+        results.append({'config_id': 999999, 'latency_ms': 50})
+        response = self.post(results)
+        self.assertEqual(json.loads(response.content), {'status': 'success', 'accepted': 5, 'ignored': 1})
+        self.assertEqual(ConfigProbeResult.objects.filter(config=self.fast).count(), 5)
+
+        stats = ConfigLatencyStats.objects.get(config=self.fast)
+        self.assertEqual((stats.p50_latency_ms, stats.p95_latency_ms), (120, 160))
+        self.assertEqual(stats.success_rate, 0.8)
+        self.assertIsNotNone(stats.last_success_at)
+
+        # Later batches fold into the same window, which keeps the latest probes only
+        updated_at = stats.updated_at
+        self.post([{'config_id': self.fast.id, 'latency_ms': 500}] * STATS_WINDOW)
+        stats.refresh_from_db()
+        self.assertEqual((stats.p50_latency_ms, stats.success_rate, len(stats.recent)), (500, 1, STATS_WINDOW))
+        self.assertGreater(stats.updated_at, updated_at)
+
+    def test_old_results_are_pruned(self):
+        old = timezone.now() - PROBE_RETENTION - timedelta(days=1)
+        for config in (self.fast, self.slow):
+            ConfigProbeResult.objects.create(config=config, success=True, latency_ms=100, probed_at=old)
+        self.post([{'config_id': self.fast.id, 'latency_ms': 90}])
+        self.assertEqual(list(ConfigProbeResult.objects.filter(config=self.fast).values_list('latency_ms', flat=True)),
+                         [90])
+        # Configs that were not reported on are left for their next batch
+        self.assertEqual(ConfigProbeResult.objects.filter(config=self.slow).count(), 1)
+
+    def test_reports_require_authentication(self):
+        response = self.post([{'config_id': self.fast.id, 'latency_ms': 100}], auth=False)
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(ConfigProbeResult.objects.exists())
+
+    def test_list_revision_follows_ranking(self):
+        """
+        Only batches that change a listed aggregate invalidate the config list
+        """
+        self.post([{'config_id': self.fast.id, 'latency_ms': 80}])
+        etag = self.client.get(reverse('api_config_list'))['ETag']
+        self.post([{'config_id': self.fast.id, 'latency_ms': 80}])
+        self.assertEqual(self.client.get(reverse('api_config_list'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.post([{'config_id': self.fast.id, 'success': False}])
+        self.assertEqual(self.client.get(reverse('api_config_list'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_invalid_batch_is_rejected_whole(self):
+        response = self.post([{'config_id': self.fast.id, 'latency_ms': 100}, {'config_id': 'x'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.post([{'config_id': self.fast.id, 'success': True}]).status_code, 400)
+        self.assertFalse(ConfigProbeResult.objects.exists())
+
+    def test_config_list_ranked_by_latency(self):
+        self.post([{'config_id': self.fast.id, 'latency_ms': 80}, {'config_id': self.slow.id, 'latency_ms': 900},
+                   {'config_id': self.slow.id, 'success': False}])
+
+        response = self.client.get(reverse('api_config_list'), {'order': 'latency'})
+        configs = json.loads(response.content)['configs']
+        self.assertEqual([c['title'] for c in configs], ['Fast', 'Slow', 'Untested'])
+        self.assertEqual((configs[0]['p50_latency_ms'], configs[0]['success_rate']), (80, 1.0))
+        self.assertIsNone(configs[2]['p50_latency_ms'])
+
+        response = self.client.get(reverse('api_config_list'), {'order': 'latency', 'min_success': '0.75'})
+        self.assertEqual([c['title'] for c in json.loads(response.content)['configs']], ['Fast'])
+        self.assertEqual(self.client.get(reverse('api_config_list'), {'min_success': '2'}).status_code, 400)
+
+
+class BulkDeleteTestCase(TemporaryMediaMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dead = V2RayConfig.objects.create(title='Dead', text='vless://dead', status='off')
+        self.idle = V2RayConfig.objects.create(title='Idle', text='vless://idle', status='off')
+        self.live = V2RayConfig.objects.create(title='Live', text='vless://live', status='on')
+        record_probe_results([
+            {'config_id': self.dead.id, 'success': False}, {'config_id': self.live.id, 'latency_ms': 90},
+        ])
+
+    def post(self, name, data, password='abbaswww'):
+        headers = {'HTTP_X_ADMIN_PASSWORD': password} if password else {}
+        return self.client.post(reverse(name), json.dumps(data), content_type='application/json', **headers)
+
+    def test_delete_configs_by_filter(self):
+        etag = self.client.get(reverse('api_config_list'))['ETag']
+        response = self.post('api_config_bulk_delete', {'status': 'off', 'max_success_rate': 0.5, 'dry_run': True})
+        self.assertEqual(json.loads(response.content), {'status': 'success', 'matched': 1})
+        self.assertEqual(V2RayConfig.objects.count(), 3)
+
+        response = self.post('api_config_bulk_delete', {'status': 'off', 'max_success_rate': 0.5})
+        self.assertEqual(json.loads(response.content), {'status': 'success', 'deleted': 1})
+        self.assertEqual(set(V2RayConfig.objects.values_list('title', flat=True)), {'Idle', 'Live'})
+        self.assertFalse(ConfigProbeResult.objects.filter(config_id=self.dead.id).exists())
+        self.assertFalse(ConfigLatencyStats.objects.filter(config_id=self.dead.id).exists())
+        self.assertEqual(self.client.get(reverse('api_config_list'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        response = self.post('api_config_bulk_delete', {'ids': [self.idle.id, self.live.id, 999999]})
+        self.assertEqual(json.loads(response.content)['deleted'], 2)
+        self.assertFalse(ConfigLatencyStats.objects.exists())
+
+    def test_rejected_selections(self):
+        self.assertEqual(self.post('api_config_bulk_delete', {'ids': [self.dead.id]}, password=None).status_code, 401)
+        self.assertEqual(self.post('api_config_bulk_delete', {}).status_code, 400)
+        self.assertEqual(self.post('api_config_bulk_delete', {'dry_run': True}).status_code, 400)
+        # A misspelled filter must not widen the selection
+        self.assertEqual(self.post('api_config_bulk_delete', {'ids': [self.live.id], 'stauts': 'off'}).status_code, 400)
+        self.assertEqual(self.post('api_config_bulk_delete', {'older_than': 'yesterday'}).status_code, 400)
+        self.assertEqual(V2RayConfig.objects.count(), 3)
+
+    def test_delete_files_with_extracted_configs(self):
+        file_ids = [
+            json.loads(self.client.post(reverse('api_upload_file'), {
+                'file': SimpleUploadedFile(name, content, content_type='text/plain')
+            }).content)['file_id']
+            for name, content in (('a.txt', b'vless://uuid@a.example:443#A\n'), ('b.txt', b'vless://uuid@b.example:443#B\n'))
+        ]
+        blob = ConfigFile.objects.get(pk=file_ids[0]).file
+        storage, name = blob.storage, blob.name
+
+        etag = self.client.get(reverse('api_list_files'))['ETag']
+        response = self.post('api_files_bulk_delete', {'ids': file_ids})
+        self.assertEqual(json.loads(response.content), {'status': 'success', 'deleted': 2, 'configs_deleted': 2})
+        self.assertFalse(ConfigFile.objects.exists())
+        self.assertEqual(V2RayConfig.objects.count(), 3)
+        self.assertEqual(self.client.get(reverse('api_list_files'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        # Blobs are released on the background worker; wait for it
+        blob_releaser.submit(lambda: None).result()
+        self.assertFalse(storage.exists(name))
+
+    def test_delete_skips_per_row_work(self):
+        """
+        Rows are deleted a table at a time and the config list revision is bumped once
+        """
+        V2RayConfig.objects.bulk_create(V2RayConfig(title=f'Bulk {i}', text=f'vless://bulk{i}') for i in range(300))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post('api_config_bulk_delete', {'status': 'off'})
+        self.assertEqual(json.loads(response.content)['deleted'], 302)
+        self.assertLess(len(queries), 20)
+        bumps = [q for q in queries.captured_queries if q['sql'].startswith('UPDATE "tickets_collectionrevision"')]
+        self.assertEqual(len(bumps), 1)
+
+    def test_cascades_cover_every_relation(self):
+        for model, related in bulk_delete.CASCADES.items():
+            relations = {(r.related_model, r.field.name) for r in model._meta.related_objects}
+            self.assertEqual(relations, set(related), model)
+
+    def test_deletes_in_chunks(self):
+        V2RayConfig.objects.bulk_create(V2RayConfig(title=f'Bulk {i}', text=f'vless://bulk{i}', status='on') for i in range(7))
+        with mock.patch.object(bulk_delete, 'DELETE_CHUNK', 3):
+            response = self.post('api_config_bulk_delete', {'status': 'on'})
+        self.assertEqual(json.loads(response.content)['deleted'], 8)
+        self.assertEqual(V2RayConfig.objects.count(), 2)
@@ -15,9 +15,12 @@ urlpatterns = [
     path('upload/page/', views.file_upload_page, name='file_upload_page'),
     path('api/files/', views.api_list_files, name='api_list_files'),
     path('api/files/<int:file_id>/', views.api_delete_file, name='api_delete_file'),
+    path('api/files/bulk-delete/', views.api_files_bulk_delete, name='api_files_bulk_delete'),
     path('download/<int:file_id>/', views.download_file, name='download_file'),
     path('api/config/', views.api_config_list, name='api_config_list'),
     path('api/config/<int:config_id>/', views.api_config_detail, name='api_config_detail'),
+    path('api/config/probe-results/', views.api_config_probe_results, name='api_config_probe_results'),
+    path('api/config/bulk-delete/', views.api_config_bulk_delete, name='api_config_bulk_delete'),
     path('api/admin/check-status/', views.api_check_admin_status, name='api_check_admin_status'),                   
     path('api/admin/update-status/', views.api_update_admin_status, name='api_update_admin_status'),
     path('api/users/', views.api_get_users, name='api_get_users'),
@@ -28,6 +31,7 @@ urlpatterns = [
     path('api/tasks/', views.task_api, name='task_api'),
     path('api/tasks/<int:task_id>/', views.task_detail_api, name='task_detail_api'),
     path('api/daily-events/', views.user_daily_events_api, name='user_daily_events_api'),
+    path('api/batch/', views.batch_api, name='batch_api'),
     path('api/checklist/', views.checklist_api, name='checklist_api'),
     path('api/checklist/<int:item_id>/', views.checklist_item_api, name='checklist_item_api'),
     path('api/daily-goals/', views.daily_goals_api, name='daily_goals_api'),
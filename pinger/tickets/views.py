@@ -1,21 +1,43 @@
 from django.shortcuts import render, redirect
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import authenticate, get_user_model, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse, Http404
+from django.http import Http404, HttpResponseBadRequest
 from django.views.decorators.csrf import csrf_exempt
-from django.contrib.auth.models import User
+from django.views.decorators.gzip import gzip_page
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 from django.views.decorators.http import require_http_methods
 from django.utils.decorators import method_decorator
 from django.contrib.auth.hashers import make_password
 from django.db import IntegrityError
-from django.db.models import Q
+from django.db.models import F, Q
+from django.utils import timezone
+import base64
 import json
 import os
 from datetime import datetime
 from .models import Ticket, ConfigFile, V2RayConfig, UserProfile, PermanentNote, Task, Token, ChecklistItem, DailyGoal, EventTemplate
+from .authentication import authenticate_token, get_token_key
+from .batch import BatchError, apply_batch
+from .bulk_delete import BulkDeleteError, delete_configs, delete_files, select_configs, select_files
+from .daily_events import get_daily_events
+from .downloads import config_file_response
+from .files import create_config_file
+from .probes import ProbeError, record_probe_results
+from .revisions import collection_condition
+from .serialization import (
+    JsonResponse, checklist_item_data, config_data, daily_goal_data, event_template_data, note_data,
+    serialize_checklist_items, serialize_configs, serialize_daily_goals, serialize_event_templates,
+    serialize_files, serialize_notes, serialize_tasks, serialize_users, task_data,
+)
+
+User = get_user_model()
+
+
+def api_user(request):
+    """The session or token user (see TokenAuthenticationMiddleware), or None"""
+    return request.user if request.user.is_authenticated else None
 
 
 @csrf_exempt
@@ -107,21 +129,7 @@ def api_update_profile(request):
     if request.method != 'POST':
         return JsonResponse({'error': 'Method not allowed'}, status=405)
     
-    # Check if user is authenticated either via session or token
-    user = None
-    if request.user.is_authenticated:
-        user = request.user
-    else:
-        # Check for token authentication
-        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-        if auth_header.startswith('Token '):
-            token_key = auth_header.split(' ')[1]
-            # Validate token and get user
-            try:
-                token = Token.objects.get(key=token_key)
-                user = token.user
-            except Token.DoesNotExist:
-                pass
+    user = api_user(request)
     
     if not user:
         return JsonResponse({'error': 'Authentication required'}, status=401)
@@ -164,97 +172,76 @@ def api_update_profile(request):
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
-def add_cors_headers(view_func):
-    """Decorator to add CORS headers to API responses"""
-    def wrapper(request, *args, **kwargs):
-        # Debug: log incoming origin
-        try:
-            incoming_origin = request.META.get('HTTP_ORIGIN')
-            print(f'DEBUG add_cors_headers - incoming Origin: {incoming_origin}')
-        except Exception:
-            incoming_origin = None
-
-        response = view_func(request, *args, **kwargs)
-
-        # Get the origin from the request or use the development URL as fallback
-        origin = request.META.get('HTTP_ORIGIN', 'http://localhost:5173')
-        print(f'DEBUG add_cors_headers - setting Access-Control-Allow-Origin to: {origin}')
-
-        # Add CORS headers
-        response['Access-Control-Allow-Origin'] = origin
-        response['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
-        response['Access-Control-Allow-Headers'] = 'Content-Type, X-Admin-Password, Authorization'
-        response['Access-Control-Allow-Credentials'] = 'true'
-        
-        # Handle preflight OPTIONS requests
-        if request.method == 'OPTIONS':
-            response = JsonResponse({'status': 'ok'})
-            response['Access-Control-Allow-Origin'] = origin
-            response['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
-            response['Access-Control-Allow-Headers'] = 'Content-Type, X-Admin-Password, Authorization'
-            response['Access-Control-Allow-Credentials'] = 'true'
-            return response
-            
-        return response
-    return wrapper
-
 # Task API Endpoints
+TASK_PAGE_MAX = 500
+
+
+def parse_iso_datetime(value):
+    """Parse an ISO date or datetime from the client; naive values use the server time zone"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def encode_task_cursor(task):
+    """Cursor past a serialized task, from its startDate and id"""
+    raw = json.dumps([task['startDate'], task['id']])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_task_cursor(cursor):
+    """(start_date, id) from encode_task_cursor(); ValueError for anything else"""
+    decoded = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not (isinstance(decoded, list) and len(decoded) == 2
+            and isinstance(decoded[0], str) and type(decoded[1]) is int):
+        raise ValueError('Malformed cursor')
+    return parse_iso_datetime(decoded[0]), decoded[1]
+
+
 @csrf_exempt
-@add_cors_headers
+@collection_condition('tasks')
 def task_api(request):
     """API endpoint for task CRUD operations"""
     if request.method == 'OPTIONS':
         return JsonResponse({'status': 'ok'})
     
-    # Check if user is authenticated either via session or token
-    user = None
-    # Debug: log incoming auth header and cookies
-    try:
-        print('DEBUG task_api - HTTP_AUTHORIZATION:', request.META.get('HTTP_AUTHORIZATION'))
-        print('DEBUG task_api - HTTP_COOKIE:', request.META.get('HTTP_COOKIE'))
-    except Exception as _:
-        pass
-    if request.user.is_authenticated:
-        user = request.user
-    else:
-        # Check for token authentication
-        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-        if auth_header.startswith('Token '):
-            token_key = auth_header.split(' ')[1]
-            # Validate token and get user
-            try:
-                token = Token.objects.get(key=token_key)
-                user = token.user
-            except Token.DoesNotExist:
-                pass
+    user = api_user(request)
     
     if not user:
         return JsonResponse({'error': 'Authentication required'}, status=401)
     
-    # Get all tasks for the authenticated user
+    # Get the authenticated user's tasks
+    # ?start=&end= keep tasks overlapping the range,
+    # ?limit=&cursor= page through them ordered by (start_date, id)
     if request.method == 'GET':
-        tasks = Task.objects.filter(user=user)
-        tasks_data = []
-        
-        for task in tasks:
-            task_data = {
-                'id': task.id,
-                'title': task.title,
-                'startDate': task.start_date.isoformat(),
-                'endDate': task.end_date.isoformat(),
-                'color': task.color,
-                'isImportant': task.is_important,
-                'createdAt': task.created_at.isoformat() if task.created_at else None,
-                'updatedAt': task.updated_at.isoformat() if task.updated_at else None
-            }
-            if task.description:
-                task_data['description'] = task.description
-            tasks_data.append(task_data)
+        tasks = Task.objects.filter(user=user).order_by('start_date', 'id')
+        limit = None
+        try:
+            if request.GET.get('start'):
+                tasks = tasks.filter(end_date__gt=parse_iso_datetime(request.GET['start']))
+            if request.GET.get('end'):
+                tasks = tasks.filter(start_date__lt=parse_iso_datetime(request.GET['end']))
+            if request.GET.get('cursor'):
+                cursor_start, cursor_id = decode_task_cursor(request.GET['cursor'])
+                tasks = tasks.filter(
+                    Q(start_date__gt=cursor_start) | Q(start_date=cursor_start, id__gt=cursor_id)
+                )
+            if request.GET.get('limit'):
+                limit = min(max(int(request.GET['limit']), 1), TASK_PAGE_MAX)
+        except (ValueError, TypeError):
+            return JsonResponse({'error': 'Invalid start, end, limit or cursor'}, status=400)
         
-        # Update user's daily events JSON
-        update_user_daily_events_json(user)
+        next_cursor = None
+        if limit is not None:
+            tasks_data = serialize_tasks(tasks[:limit + 1])
+            if len(tasks_data) > limit:
+                tasks_data = tasks_data[:limit]
+                next_cursor = encode_task_cursor(tasks_data[-1])
+        else:
+            tasks_data = serialize_tasks(tasks)
         
-        return JsonResponse({'tasks': tasks_data})
+        return JsonResponse({'tasks': tasks_data, 'next_cursor': next_cursor})
     
     # Create a new task
     elif request.method == 'POST':
@@ -277,21 +264,7 @@ def task_api(request):
             
             task.save()
             
-            # Update user's daily events JSON
-            update_user_daily_events_json(user)
-            
-            task_data = {
-                'id': task.id,
-                'title': task.title,
-                'startDate': task.start_date.isoformat(),
-                'endDate': task.end_date.isoformat(),
-                'color': task.color,
-                'isImportant': task.is_important
-            }
-            if task.description:
-                task_data['description'] = task.description
-            
-            return JsonResponse(task_data, status=201)
+            return JsonResponse(task_data(task), status=201)
             
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=400)
@@ -300,27 +273,12 @@ def task_api(request):
     return JsonResponse({'error': 'Method not allowed'}, status=405)
 
 @csrf_exempt
-@add_cors_headers
 def task_detail_api(request, task_id):
     """API endpoint for individual task operations"""
     if request.method == 'OPTIONS':
         return JsonResponse({'status': 'ok'})
     
-    # Check if user is authenticated either via session or token
-    user = None
-    if request.user.is_authenticated:
-        user = request.user
-    else:
-        # Check for token authentication
-        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-        if auth_header.startswith('Token '):
-            token_key = auth_header.split(' ')[1]
-            # Validate token and get user
-            try:
-                token = Token.objects.get(key=token_key)
-                user = token.user
-            except Token.DoesNotExist:
-                pass
+    user = api_user(request)
     
     if not user:
         return JsonResponse({'error': 'Authentication required'}, status=401)
@@ -332,17 +290,7 @@ def task_detail_api(request, task_id):
     
     # Get task details
     if request.method == 'GET':
-        task_data = {
-            'id': task.id,
-            'title': task.title,
-            'startDate': task.start_date.isoformat(),
-            'endDate': task.end_date.isoformat(),
-            'color': task.color,
-            'isImportant': task.is_important
-        }
-        if task.description:
-            task_data['description'] = task.description
-        return JsonResponse(task_data)
+        return JsonResponse(task_data(task))
     
     # Update task
     elif request.method == 'PUT':
@@ -364,17 +312,7 @@ def task_detail_api(request, task_id):
             
             task.save()
             
-            # Update user's daily events JSON
-            update_user_daily_events_json(user)
-            
-            return JsonResponse({
-                'id': task.id,
-                'title': task.title,
-                'startDate': task.start_date.isoformat(),
-                'endDate': task.end_date.isoformat(),
-                'color': task.color,
-                'isImportant': task.is_important
-            })
+            return JsonResponse(task_data(task))
             
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=400)
@@ -383,51 +321,41 @@ def task_detail_api(request, task_id):
     elif request.method == 'DELETE':
         task.delete()
         
-        # Update user's daily events JSON
-        update_user_daily_events_json(user)
-        
         return JsonResponse({'status': 'success'})
     
     # Invalid method
     return JsonResponse({'error': 'Method not allowed'}, status=405)
 
-def update_user_daily_events_json(user):
+@csrf_exempt
+def batch_api(request):
     """
-    Update the user's daily events JSON in their profile.
-    This function collects all tasks for the user and stores them as JSON.
+    API endpoint for applying task, checklist item and daily goal changes in one request.
+    POST: {"operations": [{"op": "create|update|delete", "type": "task|checklist|daily_goal",
+           "id": ..., "data": {...}}, ...]}
+    Either every operation is applied or none is; results are returned per operation.
     """
+    user = api_user(request)
+    
+    if not user:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
     try:
-        # Get all tasks for the user
-        tasks = Task.objects.filter(user=user)
-        tasks_data = []
-        
-        for task in tasks:
-            tasks_data.append({
-                'id': task.id,
-                'title': task.title,
-                'startDate': task.start_date.isoformat(),
-                'endDate': task.end_date.isoformat(),
-                'color': task.color,
-                'isImportant': task.is_important,
-                'createdAt': task.created_at.isoformat() if task.created_at else None,
-                'updatedAt': task.updated_at.isoformat() if task.updated_at else None
-            })
-        
-        # Get or create user profile
-        user_profile, created = UserProfile.objects.get_or_create(user=user)
-        
-        # Update the JSON field
-        user_profile.daily_events_json = json.dumps(tasks_data, indent=2)
-        user_profile.save()
-        
-    except Exception as e:
-        # Log the error but don't fail the request
-        print(f"Error updating user daily events JSON: {e}")
-        pass
+        data = json.loads(request.body)
+        results, applied = apply_batch(user, data.get('operations'))
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    except BatchError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    except IntegrityError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    return JsonResponse({'results': results}, status=200 if applied else 400)
 
 
 @csrf_exempt
-@add_cors_headers
 def user_daily_events_api(request):
     """API endpoint to get user's daily events as JSON"""
     if request.method == 'OPTIONS':
@@ -437,15 +365,8 @@ def user_daily_events_api(request):
         return JsonResponse({'error': 'Authentication required'}, status=401)
     
     try:
-        # Get or create user profile
-        user_profile, created = UserProfile.objects.get_or_create(user=request.user)
-        
-        # If there's no JSON data, create it
-        if not user_profile.daily_events_json:
-            update_user_daily_events_json(request.user)
-        
-        # Parse the JSON data
-        events_data = json.loads(user_profile.daily_events_json) if user_profile.daily_events_json else []
+        # Served from the snapshot; only rebuilt when it is stale
+        events_data = get_daily_events(request.user)
         
         return JsonResponse({'events': events_data})
         
@@ -486,7 +407,6 @@ def dashboard_view(request):
     })
 
 @csrf_exempt
-@add_cors_headers
 def create_ticket(request):
     if request.method == 'POST':
         try:
@@ -546,13 +466,8 @@ def upload_file_view(request):
         
         # Check if file is a .txt file
         if uploaded_file.name.endswith('.txt'):
-            # Save the file using the ConfigFile model
-            config_file = ConfigFile(
-                name=uploaded_file.name,
-                file=uploaded_file,
-                uploaded_by=request.user
-            )
-            config_file.save()
+            # Save the file with its size/checksum/line count
+            create_config_file(uploaded_file, request.user)
             
             messages.success(request, 'File uploaded successfully!')
             return redirect('dashboard')
@@ -562,7 +477,6 @@ def upload_file_view(request):
     return redirect('dashboard')
 
 @csrf_exempt
-@add_cors_headers
 def api_upload_file(request):
     """
     API endpoint for uploading files without CSRF token requirement
@@ -580,13 +494,8 @@ def api_upload_file(request):
                 defaults={'email': 'api@example.com'}
             )
             
-            # Save the file using the ConfigFile model
-            config_file = ConfigFile(
-                name=uploaded_file.name,
-                file=uploaded_file,
-                uploaded_by=user
-            )
-            config_file.save()
+            # Save the file with its size/checksum/line count
+            config_file = create_config_file(uploaded_file, user)
             
             return JsonResponse({
                 'status': 'success',
@@ -613,27 +522,16 @@ def file_upload_page(request):
     return render(request, 'tickets/file_upload.html')
 
 @csrf_exempt
-@add_cors_headers
+@gzip_page
+@collection_condition('files', per_user=False)
 def api_list_files(request):
     """
     API endpoint for listing all uploaded files
     """
     if request.method == 'GET':
         try:
-            # Get all config files
-            config_files = ConfigFile.objects.all()
-            
-            # Format the response
-            files_data = []
-            for file in config_files:
-                files_data.append({
-                    'id': file.id,
-                    'name': file.name,
-                    'size': file.file.size if file.file else 0,
-                    'url': file.file.url if file.file else '',
-                    'uploaded_by': file.uploaded_by.username,
-                    'uploaded_at': file.uploaded_at.isoformat()
-                })
+            # One query; the uploader's username comes from the join
+            files_data = serialize_files(ConfigFile.objects.all())
             
             return JsonResponse({
                 'status': 'success',
@@ -651,7 +549,6 @@ def api_list_files(request):
     }, status=405)
 
 @csrf_exempt
-@add_cors_headers
 def api_register(request):
     """
     API endpoint for user registration
@@ -747,7 +644,6 @@ def api_register(request):
     }, status=405)
 
 @csrf_exempt
-@add_cors_headers
 def api_update_profile(request):
     """
     API endpoint for updating user profile
@@ -755,20 +651,16 @@ def api_update_profile(request):
     if request.method == 'POST' or request.method == 'PATCH':
         try:
             # Get token from Authorization header
-            auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-            if not auth_header.startswith('Token '):
+            token_key = get_token_key(request)
+            if not token_key:
                 return JsonResponse({
                     'status': 'error',
                     'message': 'Authentication required'
                 }, status=401)
             
-            token_key = auth_header.split(' ')[1]
-            
             # Validate token and get user
-            try:
-                token = Token.objects.get(key=token_key)
-                user = token.user
-            except Token.DoesNotExist:
+            user = authenticate_token(token_key)
+            if user is None:
                 return JsonResponse({
                     'status': 'error',
                     'message': 'Invalid token'
@@ -824,34 +716,73 @@ def download_file(request, file_id):
     """
     try:
         config_file = ConfigFile.objects.get(id=file_id)
-        response = HttpResponse(config_file.file, content_type='text/plain')
-        response['Content-Disposition'] = f'attachment; filename="{config_file.name}"'
-        return response
+        # Streamed, with Range/If-Range and 304 support (tickets/downloads.py)
+        return config_file_response(request, config_file)
     except ConfigFile.DoesNotExist:
         raise Http404("File not found")
 
+def configs_for_source(source_file):
+    """
+    V2RayConfig queryset for a ?source_file= value: the configs extracted from
+    that file in file order, or the manually managed ones when it is empty.
+    Raises ValueError when the value is not a file id.
+    """
+    if not source_file:
+        return V2RayConfig.objects.filter(source_file__isnull=True)
+    if not source_file.isdigit():
+        raise ValueError('source_file must be a file id')
+    return V2RayConfig.objects.filter(source_file_id=int(source_file)).order_by('id')
+
 @csrf_exempt
-@add_cors_headers
+@gzip_page
+@collection_condition('configs', per_user=False)
 def api_config_list(request):
     """
     API endpoint for listing and creating v2ray configurations
     """
     if request.method == 'GET':
         try:
-            # Get all v2ray configurations
-            configs = V2RayConfig.objects.all()
+            source_file = request.GET.get('source_file')
+            try:
+                configs = configs_for_source(source_file)
+            except ValueError as e:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': str(e)
+                }, status=400)
+            if source_file and not ConfigFile.objects.filter(pk=source_file, ingested_at__isnull=False).exists():
+                # Unknown file or not processed yet; clients parse it themselves
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'File has not been processed'
+                }, status=404)
+            
+            # Ranking by tester reports (tickets/probes.py)
+            min_success = request.GET.get('min_success')
+            if min_success:
+                try:
+                    min_success = float(min_success)
+                except ValueError:
+                    min_success = -1
+                if not 0 <= min_success <= 1:
+                    return JsonResponse({
+                        'status': 'error',
+                        'message': 'min_success must be a number between 0 and 1'
+                    }, status=400)
+                configs = configs.filter(latency_stats__success_rate__gte=min_success)
+            order = request.GET.get('order')
+            if order == 'latency':
+                # Fastest median first; configs nobody has reported on last
+                configs = configs.order_by(F('latency_stats__p50_latency_ms').asc(nulls_last=True),
+                                           '-latency_stats__success_rate', 'id')
+            elif order:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'order must be "latency"'
+                }, status=400)
             
             # Format the response
-            configs_data = []
-            for config_obj in configs:
-                configs_data.append({
-                    'id': config_obj.id,
-                    'title': config_obj.title,
-                    'text': config_obj.text,
-                    'status': config_obj.status,
-                    'created_at': config_obj.created_at.isoformat(),
-                    'updated_at': config_obj.updated_at.isoformat()
-                })
+            configs_data = serialize_configs(configs)
             
             return JsonResponse({
                 'status': 'success',
@@ -888,14 +819,7 @@ def api_config_list(request):
             return JsonResponse({
                 'status': 'success',
                 'message': 'V2Ray config created successfully',
-                'config': {
-                    'id': config_obj.id,
-                    'title': config_obj.title,
-                    'text': config_obj.text,
-                    'status': config_obj.status,
-                    'created_at': config_obj.created_at.isoformat(),
-                    'updated_at': config_obj.updated_at.isoformat()
-                }
+                'config': config_data(config_obj)
             })
         except Exception as e:
             return JsonResponse({
@@ -909,15 +833,120 @@ def api_config_list(request):
     }, status=405)
 
 @csrf_exempt
-@add_cors_headers
+def api_config_probe_results(request):
+    """
+    API endpoint for testers to report config latency results in bulk; requires authentication.
+    POST: {"results": [{"config_id": 1, "success": true, "latency_ms": 120, "status": "Success",
+           "probed_at": "2025-01-01T09:00:00Z"}, ...]}
+    Results for configs that no longer exist are ignored.
+    """
+    if request.method != 'POST':
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Invalid request method'
+        }, status=405)
+    
+    if not request.user.is_authenticated:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Authentication required'
+        }, status=401)
+    
+    try:
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            raise ProbeError('Expected a JSON object')
+        accepted, ignored = record_probe_results(data.get('results'), request.user)
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Invalid JSON'
+        }, status=400)
+    except ProbeError as e:
+        return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status=400)
+    
+    return JsonResponse({
+        'status': 'success',
+        'accepted': accepted,
+        'ignored': ignored
+    })
+
+def has_admin_password(request):
+    return request.META.get('HTTP_X_ADMIN_PASSWORD') == 'abbaswww'
+
+def bulk_delete(request, select, delete):
+    """
+    Delete the rows select(data) picks from the JSON body; delete() returns
+    the counts to report. "dry_run": true only counts the matching rows.
+    """
+    if not has_admin_password(request):
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Authentication required'
+        }, status=401)
+    if request.method != 'POST':
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Invalid request method'
+        }, status=405)
+
+    try:
+        data = json.loads(request.body)
+        dry_run = data.pop('dry_run', False) if isinstance(data, dict) else False
+        selected = select(data)
+        if dry_run:
+            return JsonResponse({
+                'status': 'success',
+                'matched': selected.count()
+            })
+        counts = delete(selected)
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Invalid JSON'
+        }, status=400)
+    except BulkDeleteError as e:
+        return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status=400)
+
+    return JsonResponse({'status': 'success', **counts})
+
+@csrf_exempt
+def api_config_bulk_delete(request):
+    """
+    API endpoint for deleting many v2ray configurations in one request.
+    POST: {"ids": [1, 2, ...]} and/or filters {"status": "off", "older_than": "2025-01-01T00:00:00Z",
+           "max_success_rate": 0.1, "source_file": 3 or null}, combined with AND
+    Requires the X-Admin-Password header.
+    """
+    return bulk_delete(request, select_configs, lambda configs: {'deleted': delete_configs(configs)})
+
+@csrf_exempt
+def api_files_bulk_delete(request):
+    """
+    API endpoint for deleting many uploaded files, and the configs extracted from them, in one request.
+    POST: {"ids": [1, 2, ...]} and/or {"older_than": "2025-01-01T00:00:00Z"}
+    Requires the X-Admin-Password header.
+    """
+    def delete(files):
+        deleted, configs_deleted = delete_files(files)
+        return {'deleted': deleted, 'configs_deleted': configs_deleted}
+
+    return bulk_delete(request, select_files, delete)
+
+@csrf_exempt
 def api_config_detail(request, config_id):
     """
     API endpoint for retrieving, updating, or deleting a specific v2ray configuration
     """
     # Check for admin password in headers for DELETE requests
     if request.method == 'DELETE':
-        admin_password = request.META.get('HTTP_X_ADMIN_PASSWORD')
-        if admin_password != 'abbaswww':
+        if not has_admin_password(request):
             return JsonResponse({
                 'status': 'error',
                 'message': 'Authentication required'
@@ -935,14 +964,7 @@ def api_config_detail(request, config_id):
         # Return config details
         return JsonResponse({
             'status': 'success',
-            'config': {
-                'id': config_obj.id,
-                'title': config_obj.title,
-                'text': config_obj.text,
-                'status': config_obj.status,
-                'created_at': config_obj.created_at.isoformat(),
-                'updated_at': config_obj.updated_at.isoformat()
-            }
+            'config': config_data(config_obj)
         })
     
     elif request.method == 'PUT':
@@ -969,14 +991,7 @@ def api_config_detail(request, config_id):
             return JsonResponse({
                 'status': 'success',
                 'message': 'V2Ray config updated successfully',
-                'config': {
-                    'id': config_obj.id,
-                    'title': config_obj.title,
-                    'text': config_obj.text,
-                    'status': config_obj.status,
-                    'created_at': config_obj.created_at.isoformat(),
-                    'updated_at': config_obj.updated_at.isoformat()
-                }
+                'config': config_data(config_obj)
             })
         except Exception as e:
             return JsonResponse({
@@ -998,14 +1013,12 @@ def api_config_detail(request, config_id):
     }, status=405)
 
 @csrf_exempt
-@add_cors_headers
 def api_delete_file(request, file_id):
     """
     API endpoint for deleting a specific file with password authentication
     """
     # Check for admin password in headers
-    admin_password = request.META.get('HTTP_X_ADMIN_PASSWORD')
-    if admin_password != 'abbaswww':
+    if not has_admin_password(request):
         return JsonResponse({
             'status': 'error',
             'message': 'Authentication required'
@@ -1033,7 +1046,6 @@ def api_delete_file(request, file_id):
     }, status=405)
 
 @csrf_exempt
-@add_cors_headers
 def api_check_admin_status(request):
     """
     API endpoint for checking if current user is V2Ray admin
@@ -1069,45 +1081,14 @@ def api_check_admin_status(request):
     }, status=405)
 
 @csrf_exempt
-@add_cors_headers
 def api_get_users(request):
     """
     API endpoint for retrieving user data
     """
     if request.method == 'GET':
         try:
-            # Get all users with their profiles
-            users = User.objects.all().select_related('profile')
-            
-            # Format the response
-            users_data = []
-            for user in users:
-                # Get profile data if exists
-                is_v2ray_admin = False
-                has_v2ray_access = True
-                created_at = None
-                updated_at = None
-                
-                if hasattr(user, 'profile'):
-                    is_v2ray_admin = user.profile.is_v2ray_admin
-                    has_v2ray_access = user.profile.has_v2ray_access
-                    created_at = user.profile.created_at.isoformat() if user.profile.created_at else None
-                    updated_at = user.profile.updated_at.isoformat() if user.profile.updated_at else None
-                
-                users_data.append({
-                    'id': user.id,
-                    'username': user.username,
-                    'email': user.email,
-                    'first_name': user.first_name,
-                    'last_name': user.last_name,
-                    'is_staff': user.is_staff,
-                    'is_active': user.is_active,
-                    'is_v2ray_admin': is_v2ray_admin,
-                    'has_v2ray_access': has_v2ray_access,
-                    'date_joined': user.date_joined.isoformat() if user.date_joined else None,
-                    'profile_created_at': created_at,
-                    'profile_updated_at': updated_at
-                })
+            # Users and profiles in one LEFT JOIN query
+            users_data = serialize_users(User.objects.order_by('id'))
             
             return JsonResponse({
                 'status': 'success',
@@ -1126,7 +1107,6 @@ def api_get_users(request):
     }, status=405)
 
 @csrf_exempt
-@add_cors_headers
 def api_update_admin_status(request):
     """
     API endpoint for updating user's V2Ray admin status
@@ -1182,7 +1162,6 @@ def api_update_admin_status(request):
 
 
 @csrf_exempt
-@add_cors_headers
 def v2ray_page(request):
     """V2Ray configuration page"""
     if request.method == 'GET':
@@ -1195,8 +1174,10 @@ def v2ray_page(request):
             if not has_v2ray_access:
                 return render(request, 'tickets/no_v2ray_access.html')
             
-            # Get all v2ray configurations
-            configs = V2RayConfig.objects.all()
+            try:
+                configs = configs_for_source(request.GET.get('source_file'))
+            except ValueError as e:
+                return HttpResponseBadRequest(str(e))
             
             return render(request, 'tickets/v2ray_page.html', {
                 'configs': configs,
@@ -1209,7 +1190,6 @@ def v2ray_page(request):
 
 
 @csrf_exempt
-@add_cors_headers
 def debug_v2ray(request):
     """Debug V2Ray configuration page"""
     if request.method == 'GET':
@@ -1220,8 +1200,10 @@ def debug_v2ray(request):
             if not is_admin:
                 return render(request, 'tickets/no_v2ray_access.html')
             
-            # Get all v2ray configurations
-            configs = V2RayConfig.objects.all()
+            try:
+                configs = configs_for_source(request.GET.get('source_file'))
+            except ValueError as e:
+                return HttpResponseBadRequest(str(e))
             
             return render(request, 'tickets/debug_v2ray.html', {
                 'configs': configs,
@@ -1233,42 +1215,21 @@ def debug_v2ray(request):
     return JsonResponse({'error': 'Method not allowed'}, status=405)
 
 @csrf_exempt
-@add_cors_headers
+@collection_condition('notes')
 def api_permanent_notes(request):
     """
     API endpoint for managing permanent notes.
     GET: Retrieve all notes for the authenticated user
     POST: Create a new note for the authenticated user
     """
-    user = None
-    if request.user.is_authenticated:
-        user = request.user
-    else:
-        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-        if auth_header.startswith('Token '):
-            token_key = auth_header.split(' ')[1]
-            try:
-                token = Token.objects.get(key=token_key)
-                user = token.user
-            except Token.DoesNotExist:
-                pass
+    user = api_user(request)
 
     if not user:
         return JsonResponse({'error': 'Authentication required'}, status=401)
     
     if request.method == 'GET':
         try:
-            notes = PermanentNote.objects.filter(user=user)
-            notes_data = [
-                {
-                    'id': note.id,
-                    'title': note.title,
-                    'content': note.content,
-                    'created_at': note.created_at.isoformat(),
-                    'updated_at': note.updated_at.isoformat()
-                }
-                for note in notes
-            ]
+            notes_data = serialize_notes(PermanentNote.objects.filter(user=user))
             return JsonResponse({'notes': notes_data})
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
@@ -1288,13 +1249,7 @@ def api_permanent_notes(request):
                 content=content
             )
             
-            return JsonResponse({
-                'id': note.id,
-                'title': note.title,
-                'content': note.content,
-                'created_at': note.created_at.isoformat(),
-                'updated_at': note.updated_at.isoformat()
-            }, status=201)
+            return JsonResponse(note_data(note), status=201)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
     
@@ -1302,7 +1257,6 @@ def api_permanent_notes(request):
 
 
 @csrf_exempt
-@add_cors_headers
 def api_permanent_note_detail(request, note_id):
     """
     API endpoint for managing a specific permanent note.
@@ -1310,18 +1264,7 @@ def api_permanent_note_detail(request, note_id):
     PUT: Update a specific note
     DELETE: Delete a specific note
     """
-    user = None
-    if request.user.is_authenticated:
-        user = request.user
-    else:
-        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-        if auth_header.startswith('Token '):
-            token_key = auth_header.split(' ')[1]
-            try:
-                token = Token.objects.get(key=token_key)
-                user = token.user
-            except Token.DoesNotExist:
-                pass
+    user = api_user(request)
 
     if not user:
         return JsonResponse({'error': 'Authentication required'}, status=401)
@@ -1332,13 +1275,7 @@ def api_permanent_note_detail(request, note_id):
         return JsonResponse({'error': 'Note not found'}, status=404)
     
     if request.method == 'GET':
-        return JsonResponse({
-            'id': note.id,
-            'title': note.title,
-            'content': note.content,
-            'created_at': note.created_at.isoformat(),
-            'updated_at': note.updated_at.isoformat()
-        })
+        return JsonResponse(note_data(note))
     
     elif request.method == 'PUT':
         try:
@@ -1347,13 +1284,7 @@ def api_permanent_note_detail(request, note_id):
             note.content = data.get('content', note.content)
             note.save()
             
-            return JsonResponse({
-                'id': note.id,
-                'title': note.title,
-                'content': note.content,
-                'created_at': note.created_at.isoformat(),
-                'updated_at': note.updated_at.isoformat()
-            })
+            return JsonResponse(note_data(note))
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
     
@@ -1364,45 +1295,21 @@ def api_permanent_note_detail(request, note_id):
     return JsonResponse({'error': 'Method not allowed'}, status=405)
 
 @csrf_exempt
-@add_cors_headers
+@collection_condition('checklist')
 def checklist_api(request):
     """
     API endpoint for checklist items.
     GET: Retrieve all checklist items for the authenticated user
     POST: Create a new checklist item for the authenticated user
     """
-    # Check if user is authenticated either via session or token
-    user = None
-    if request.user.is_authenticated:
-        user = request.user
-    else:
-        # Check for token authentication
-        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-        if auth_header.startswith('Token '):
-            token_key = auth_header.split(' ')[1]
-            # Validate token and get user
-            try:
-                token = Token.objects.get(key=token_key)
-                user = token.user
-            except Token.DoesNotExist:
-                pass
+    user = api_user(request)
 
     if not user:
         return JsonResponse({'error': 'Authentication required'}, status=401)
 
     # Get all checklist items for the authenticated user
     if request.method == 'GET':
-        checklist_items = ChecklistItem.objects.filter(user=user)
-        items_data = []
-        
-        for item in checklist_items:
-            items_data.append({
-                'id': item.id,
-                'text': item.text,
-                'completed': item.completed,
-                'created_at': item.created_at.isoformat() if item.created_at else None,
-                'updated_at': item.updated_at.isoformat() if item.updated_at else None
-            })
+        items_data = serialize_checklist_items(ChecklistItem.objects.filter(user=user))
         
         return JsonResponse({'checklist_items': items_data})
     
@@ -1420,13 +1327,7 @@ def checklist_api(request):
             
             checklist_item.save()
             
-            item_data = {
-                'id': checklist_item.id,
-                'text': checklist_item.text,
-                'completed': checklist_item.completed,
-                'created_at': checklist_item.created_at.isoformat() if checklist_item.created_at else None,
-                'updated_at': checklist_item.updated_at.isoformat() if checklist_item.updated_at else None
-            }
+            item_data = checklist_item_data(checklist_item)
             
             return JsonResponse(item_data, status=201)
             
@@ -1437,7 +1338,6 @@ def checklist_api(request):
     return JsonResponse({'error': 'Method not allowed'}, status=405)
 
 @csrf_exempt
-@add_cors_headers
 def checklist_item_api(request, item_id):
     """
     API endpoint for individual checklist item operations.
@@ -1445,21 +1345,7 @@ def checklist_item_api(request, item_id):
     PUT: Update a specific checklist item
     DELETE: Delete a specific checklist item
     """
-    # Check if user is authenticated either via session or token
-    user = None
-    if request.user.is_authenticated:
-        user = request.user
-    else:
-        # Check for token authentication
-        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-        if auth_header.startswith('Token '):
-            token_key = auth_header.split(' ')[1]
-            # Validate token and get user
-            try:
-                token = Token.objects.get(key=token_key)
-                user = token.user
-            except Token.DoesNotExist:
-                pass
+    user = api_user(request)
 
     if not user:
         return JsonResponse({'error': 'Authentication required'}, status=401)
@@ -1471,13 +1357,7 @@ def checklist_item_api(request, item_id):
     
     # Get checklist item details
     if request.method == 'GET':
-        item_data = {
-            'id': checklist_item.id,
-            'text': checklist_item.text,
-            'completed': checklist_item.completed,
-            'created_at': checklist_item.created_at.isoformat() if checklist_item.created_at else None,
-            'updated_at': checklist_item.updated_at.isoformat() if checklist_item.updated_at else None
-        }
+        item_data = checklist_item_data(checklist_item)
         return JsonResponse(item_data)
     
     # Update checklist item
@@ -1492,13 +1372,7 @@ def checklist_item_api(request, item_id):
             
             checklist_item.save()
             
-            return JsonResponse({
-                'id': checklist_item.id,
-                'text': checklist_item.text,
-                'completed': checklist_item.completed,
-                'created_at': checklist_item.created_at.isoformat() if checklist_item.created_at else None,
-                'updated_at': checklist_item.updated_at.isoformat() if checklist_item.updated_at else None
-            })
+            return JsonResponse(checklist_item_data(checklist_item))
             
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=400)
@@ -1512,33 +1386,20 @@ def checklist_item_api(request, item_id):
     return JsonResponse({'error': 'Method not allowed'}, status=405)
 
 @csrf_exempt
-@add_cors_headers
+@collection_condition('daily_goals')
 def daily_goals_api(request):
-    user = None
-    if request.user.is_authenticated:
-        user = request.user
-    else:
-        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-        if auth_header.startswith('Token '):
-            token_key = auth_header.split(' ')[1]
-            try:
-                token = Token.objects.get(key=token_key)
-                user = token.user
-            except Token.DoesNotExist:
-                pass
+    user = api_user(request)
 
     if not user:
         return JsonResponse({'error': 'Authentication required'}, status=401)
 
     if request.method == 'GET':
-        goals = DailyGoal.objects.filter(user=user)
-        data = [{'id': goal.id, 'text': goal.text, 'completed': goal.completed, 'date': goal.date.isoformat()} for goal in goals]
+        data = serialize_daily_goals(DailyGoal.objects.filter(user=user))
         return JsonResponse(data, safe=False)
 
     elif request.method == 'POST':
         try:
             data = json.loads(request.body)
-            print(f"Received data for daily goal creation: {data}")  # Debug log
             
             # Validate required fields
             if 'text' not in data or not data['text'].strip():
@@ -1575,17 +1436,7 @@ def daily_goals_api(request):
                 notes=data.get('notes', '') or '',
                 target_time=target_time
             )
-            return JsonResponse({
-                'id': goal.id, 
-                'text': goal.text, 
-                'completed': goal.completed, 
-                'date': goal.date.isoformat(),
-                'priority': goal.priority,
-                'category': goal.category,
-                'color': goal.color,
-                'notes': goal.notes,
-                'targetTime': goal.target_time
-            }, status=201)
+            return JsonResponse(daily_goal_data(goal), status=201)
         except json.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON data'}, status=400)
         except KeyError as e:
@@ -1594,20 +1445,8 @@ def daily_goals_api(request):
             return JsonResponse({'error': str(e)}, status=400)
 
 @csrf_exempt
-@add_cors_headers
 def daily_goal_detail_api(request, goal_id):
-    user = None
-    if request.user.is_authenticated:
-        user = request.user
-    else:
-        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-        if auth_header.startswith('Token '):
-            token_key = auth_header.split(' ')[1]
-            try:
-                token = Token.objects.get(key=token_key)
-                user = token.user
-            except Token.DoesNotExist:
-                pass
+    user = api_user(request)
 
     if not user:
         return JsonResponse({'error': 'Authentication required'}, status=401)
@@ -1640,17 +1479,7 @@ def daily_goal_detail_api(request, goal_id):
             goal.target_time = target_time if target_time is not None else goal.target_time
             goal.save()
             
-            return JsonResponse({
-                'id': goal.id,
-                'text': goal.text,
-                'completed': goal.completed,
-                'date': goal.date.isoformat(),
-                'priority': goal.priority,
-                'category': goal.category,
-                'color': goal.color,
-                'notes': goal.notes,
-                'targetTime': goal.target_time
-            })
+            return JsonResponse(daily_goal_data(goal))
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=400)
 
@@ -1659,27 +1488,15 @@ def daily_goal_detail_api(request, goal_id):
         return JsonResponse({'status': 'success'}, status=204)
 
 @csrf_exempt
-@add_cors_headers
+@collection_condition('event_templates')
 def event_templates_api(request):
-    user = None
-    if request.user.is_authenticated:
-        user = request.user
-    else:
-        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-        if auth_header.startswith('Token '):
-            token_key = auth_header.split(' ')[1]
-            try:
-                token = Token.objects.get(key=token_key)
-                user = token.user
-            except Token.DoesNotExist:
-                pass
+    user = api_user(request)
 
     if not user:
         return JsonResponse({'error': 'Authentication required'}, status=401)
 
     if request.method == 'GET':
-        templates = EventTemplate.objects.filter(user=user)
-        data = [{'id': t.id, 'name': t.name, 'title': t.title, 'color': t.color} for t in templates]
+        data = serialize_event_templates(EventTemplate.objects.filter(user=user))
         return JsonResponse(data, safe=False)
 
     elif request.method == 'POST':
@@ -1691,25 +1508,13 @@ def event_templates_api(request):
                 title=data['title'],
                 color=data.get('color', 'blue')
             )
-            return JsonResponse({'id': template.id, 'name': template.name, 'title': template.title, 'color': template.color}, status=201)
+            return JsonResponse(event_template_data(template), status=201)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=400)
 
 @csrf_exempt
-@add_cors_headers
 def event_template_detail_api(request, template_id):
-    user = None
-    if request.user.is_authenticated:
-        user = request.user
-    else:
-        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-        if auth_header.startswith('Token '):
-            token_key = auth_header.split(' ')[1]
-            try:
-                token = Token.objects.get(key=token_key)
-                user = token.user
-            except Token.DoesNotExist:
-                pass
+    user = api_user(request)
 
     if not user:
         return JsonResponse({'error': 'Authentication required'}, status=401)
@@ -1731,6 +1536,6 @@ def event_template_detail_api(request, template_id):
             template.title = data.get('title', template.title)
             template.color = data.get('color', template.color)
             template.save()
-            return JsonResponse({'id': template.id, 'name': template.name, 'title': template.title, 'color': template.color})
+            return JsonResponse(event_template_data(template))
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=400)
\ No newline at end of file